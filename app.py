@@ -1,6 +1,6 @@
 # app.py
-from flask import Flask, render_template, request, redirect, url_for, session, flash, get_flashed_messages
-from config import SessionLocal, close_tunnels, mongo_db  
+from flask import Flask, render_template, request, redirect, url_for, session, flash, get_flashed_messages, g, Response, stream_with_context, send_file, make_response
+from config import SessionLocal, get_mongo_db, start_tunnels
 from models.worker_model import Worker
 from services.auth_service import verify_password, verify_2fa_code, hash_password, generate_2fa_secret, generate_qr_code
 from forms import LoginForm, SignupForm
@@ -12,19 +12,39 @@ import secrets
 import os
 from datetime import datetime
 from bson.objectid import ObjectId  # Import to handle ObjectId conversion
-from services.digitalocean_space_service import upload_file_to_space, delete_file_from_space
+from bson.errors import InvalidId
+from services.search_service import search_cases
+from services.export_service import iter_export_csv, parse_date, EXPORTS
+from services.case_service import paginate_cases, load_case_detail, create_case_with_document, DEFAULT_PAGE_SIZE
+from services.identity_service import get_current_worker
+from models.case_repository import get_case, CASE_DETAIL, CASE_DELETE, LIVE_CASES
+from services.document_service import store_document_file, release_blobs
+from services.archiver_service import request_archive, start_archiver_thread, ARCHIVER_ENABLED
+from services.digitalocean_space_service import get_download_url, open_file_from_space, file_url_to_key, DOWNLOAD_CHUNK_SIZE
+from services import metrics_service, profiler_service
+from services.page_version_service import dashboard_version, case_version, not_modified, add_version_headers
+from services.fragment_cache_service import (
+    cached_fragment, get_fragment, store_fragment, invalidate, invalidate_case,
+    worker_namespace, case_namespace, ALL_CASES_NAMESPACE
+)
 import dotenv
 import logging
 from flask import url_for
-from models.case_history_model import CaseHistory
-from models.client_history_model import ClientHistory
 
 dotenv.load_dotenv()
-DO_SPACE_ENDPOINT = os.getenv("DO_SPACE_ENDPOINT")
+DOCUMENT_DOWNLOAD_MODE = os.getenv("DOCUMENT_DOWNLOAD_MODE", "redirect")  # "redirect" to a presigned URL or "stream"
 
 app = Flask(__name__)
 app.secret_key = secrets.token_hex(16)
 
+# Request latency, per-store call timings and /metrics (only with METRICS_ENABLED)
+metrics_service.init_app(app)
+# Sampled cProfile of requests into a bounded directory (only with PROFILER_ENABLED)
+profiler_service.init_app(app)
+# Archive deleted cases in the background (otherwise run database/run_archiver.py)
+if ARCHIVER_ENABLED:
+    start_archiver_thread()
+
 # Default route
 @app.route('/')
 def index():
@@ -43,45 +63,72 @@ def list_routes():
 
 @app.route('/view_case/<int:case_id>')
 def view_case_details(case_id):
-    db_session = SessionLocal()
-    user = db_session.query(Worker).get(session['user'])
+    user = get_current_worker()
+    if not user:
+        return redirect(url_for('login'))
 
-    case = db_session.query(Case).get(case_id)
-    if not case:
-        flash("Case not found.", "danger")
-        return redirect(url_for('dashboard'))
+    # Answer an unchanged page with 304 before loading anything
+    version = case_version(user, case_id)
+    unchanged = not_modified(version)
+    if unchanged:
+        return unchanged
+
+    # A cached document list spares the MongoDB query
+    fragment_key, document_list = get_fragment('document_list', [case_namespace(case_id)], user.role)
 
-    # Check if user has permission to view this case
-    if user.role != 'admin' and case.worker_id != user.id:
+    # Fetch the case (MySQL) and its documents (MongoDB) in parallel
+    try:
+        case, documents = load_case_detail(user, case_id, with_documents=document_list is None)
+    except PermissionError:
         flash("You do not have permission to view this case.", "danger")
         return redirect(url_for('dashboard'))
+    if not case:
+        flash("Case not found.", "danger")
+        return redirect(url_for('dashboard'))
 
-    # Fetch documents associated with the case from MongoDB and convert _id to string
-    documents = []
-    for doc in mongo_db.documents.find({"case_id": case_id}):
-        doc["_id"] = str(doc["_id"])  # Convert ObjectId to string
-        documents.append(doc)
+    if document_list is None:
+        document_list = store_fragment(fragment_key, render_template('_document_list.html', documents=documents, current_user=user))
 
-    db_session.close()
-    return render_template('view_case_details.html', case=case, documents=documents, current_user=user)
+    response = make_response(render_template('view_case_details.html', case=case, document_list=document_list, current_user=user))
+    return add_version_headers(response, version)
 
 
 @app.route('/dashboard')
 def dashboard():
-    if 'user' in session:
+    user = get_current_worker()
+    if user:
         with SessionLocal() as db_session:  # Use a context manager to ensure session cleanup
-            user = db_session.query(Worker).get(session['user'])
 
-            # Retrieve cases based on user role
-            if user.role == 'admin':
-                cases = db_session.query(Case).all()
-            elif user.role == 'lawyer':
-                cases = db_session.query(Case).filter(Case.worker_id == user.id).all()
-            else:  # For assistants, show only their assigned cases
-                # Assistants don't interact with the Client.worker_id; use Case.worker_id
-                cases = db_session.query(Case).filter(Case.worker_id == user.id).all()
+            # Answer an unchanged page with 304 before loading the cases
+            version = dashboard_version(db_session, user)
+            unchanged = not_modified(version)
+            if unchanged:
+                return unchanged
+
+            sort = request.args.get('sort', 'created_at')
+            page_size = request.args.get('page_size', type=int)
+
+            # Retrieve one page of cases based on user role (admins see every case),
+            # only when the rendered list is not cached
+            def render_case_list():
+                cases, next_cursor = paginate_cases(
+                    db_session,
+                    user,
+                    sort=sort,
+                    cursor=request.args.get('after'),
+                    page_size=page_size or DEFAULT_PAGE_SIZE
+                )
+                return render_template('_case_list.html', cases=cases, sort=sort, next_cursor=next_cursor, page_size=page_size)
+
+            scope = ALL_CASES_NAMESPACE if user.role == 'admin' else worker_namespace(user.id)
+            case_list = cached_fragment(
+                'case_list', [scope], (sort, request.args.get('after'), page_size), render_case_list
+            )
 
-            return render_template('dashboard.html', current_user=user, cases=cases)
+            response = make_response(render_template(
+                'dashboard.html', current_user=user, case_list=case_list, sort=sort, page_size=page_size
+            ))
+            return add_version_headers(response, version)
 
     return redirect(url_for('login'))
 
@@ -171,97 +218,45 @@ def logout():
 @app.route('/add_case', methods=['GET', 'POST'])
 def add_case():
     form = CaseForm()
-    db_session = SessionLocal()
 
     # Fetch the current user from the Flask session
-    user = db_session.query(Worker).get(session['user'])
+    user = get_current_worker()
+    if not user:
+        return redirect(url_for('login'))
 
-    # Load workers for lawyer and assistant selection
-    form.lawyer_id.choices = [(w.id, w.name) for w in db_session.query(Worker).filter_by(role='lawyer').all()]
-    form.assistant_id.choices = [(0, 'None')] + [(w.id, w.name) for w in db_session.query(Worker).filter_by(role='assistant').all()]
+    # Load workers for lawyer and assistant selection in one query
+    with SessionLocal() as db_session:
+        staff = db_session.query(Worker.id, Worker.name, Worker.role).filter(Worker.role.in_(['lawyer', 'assistant'])).all()
+    form.lawyer_id.choices = [(w.id, w.name) for w in staff if w.role == 'lawyer']
+    form.assistant_id.choices = [(0, 'None')] + [(w.id, w.name) for w in staff if w.role == 'assistant']
 
     # Fetch only the attributes needed for the template
-    user_data = {"name": user.name, "role": user.role} if user else None
+    user_data = {"name": user.name, "role": user.role}
 
     if form.validate_on_submit():
         try:
-            # Check if client exists or create a new one
-            client = db_session.query(Client).filter_by(email=form.client_email.data).first()
-            if not client:
-                client = Client(
-                    name=form.client_name.data,
-                    second_name=form.client_second_name.data,
-                    last_name=form.client_last_name.data,
-                    second_last_name=form.client_second_last_name.data,
-                    email=form.client_email.data,
-                    phone=form.client_phone.data,
-                    curp=form.client_curp.data,
-                    address=form.client_address.data
-                )
-                db_session.add(client)
-                db_session.commit()
-
-            # Upload document to DigitalOcean Spaces
-            uploaded_file = request.files.get("document")
-            if uploaded_file:
-                file_url = upload_file_to_space(uploaded_file)
-            else:
-                file_url = None
-
-            # Insert document metadata into MongoDB
-            document_data = {
-                "case_id": None,  # Placeholder to update after MySQL insertion
-                "client_id": client.id,
-                "worker_id": form.lawyer_id.data,
-                "document_title": form.document_title.data,
-                "document_description": form.document_description.data,
-                "file_url": file_url,
-                "uploaded_by": "Admin",
-                "uploaded_at": datetime.utcnow(),
-                "last_modified": datetime.utcnow(),
-                "file_type": uploaded_file.content_type if uploaded_file else "application/octet-stream",
-                "document_tags": ["tag1", "tag2"]
-            }
-            document_id = mongo_db.documents.insert_one(document_data).inserted_id
-
-            # Create the case entry in MySQL and link it with MongoDB document
-            new_case = Case(
-                client_id=client.id,
-                worker_id=form.lawyer_id.data,
-                case_title=form.case_title.data,
-                case_description=form.case_description.data,
-                case_type=form.case_type.data,
-                court_date=form.court_date.data,
-                judge_name=form.judge_name.data
-            )
-            db_session.add(new_case)
-            db_session.commit()
-
-            # Update MongoDB document with the actual MySQL case_id
-            mongo_db.documents.update_one(
-                {"_id": document_id},
-                {"$set": {"case_id": new_case.id}}
-            )
+            # Client upsert, case insert and document write in a single pipeline (rolls back on failure)
+            with SessionLocal() as db_session:
+                case = create_case_with_document(db_session, form, request.files.get("document"))
+                invalidate_case(case.id, case.worker_id)
 
             flash("Case created successfully and linked with document in DigitalOcean Spaces.", "success")
             return redirect(url_for('dashboard'))
 
         except Exception as e:
-            db_session.rollback()  # Rollback MySQL transaction
             flash(f"Error creating case: {e}", "danger")
-        finally:
-            db_session.close()
-    
+
     return render_template('add_case.html', form=form, current_user=user_data)
 
 
 @app.route('/edit_document/<document_id>', methods=['GET', 'POST'])
 def edit_document(document_id):
-    db_session = SessionLocal()
-    user = db_session.query(Worker).get(session['user'])
+    user = get_current_worker()
+    if not user:
+        return redirect(url_for('login'))
 
     # Convert document_id to ObjectId
-    document = mongo_db.documents.find_one({"_id": ObjectId(document_id)})
+    document = get_mongo_db().documents.find_one({"_id": ObjectId(document_id)})
     if not document:
         flash("Document not found.", "danger")
         return redirect(url_for('dashboard'))
@@ -278,7 +273,7 @@ def edit_document(document_id):
         updated_tags = request.form.get('document_tags').split(',')
 
         # Update the document in MongoDB
-        mongo_db.documents.update_one(
+        get_mongo_db().documents.update_one(
             {"_id": ObjectId(document_id)},
             {"$set": {
                 "document_title": updated_title,
@@ -287,10 +282,10 @@ def edit_document(document_id):
                 "last_modified": datetime.utcnow()
             }}
         )
+        invalidate(case_namespace(document['case_id']))
         flash("Document updated successfully.", "success")
         return redirect(url_for('view_case_details', case_id=document['case_id']))
 
-    db_session.close()
     return render_template('edit_document.html', document=document)
 
 @app.route('/upload_document/<int:case_id>', methods=['POST'])
@@ -304,19 +299,36 @@ def upload_document(case_id):
         if not document_title or not uploaded_file:
             flash("Document title and file are required.", "danger")
             return redirect(url_for('view_case_details', case_id=case_id))
+
+        # The document carries its case's client and worker like the ones created with the case
+        with SessionLocal() as db_session:
+            owner = db_session.query(Case.client_id, Case.worker_id).filter(Case.id == case_id, LIVE_CASES).first()
+        if not owner:
+            flash("Case not found.", "danger")
+            return redirect(url_for('dashboard'))
         
-        # Save the file to DigitalOcean Spaces
-        file_url = upload_file_to_space(uploaded_file)
+        # Save the file to DigitalOcean Spaces (skipped if the same file is already stored)
+        file_fields = store_document_file(uploaded_file)
         
         # Insert document metadata into MongoDB
-        mongo_db.documents.insert_one({
-            "case_id": case_id,
-            "title": document_title,
-            "description": document_description,
-            "file_url": file_url,
-            "uploaded_by": session['user'],
-            "uploaded_at": datetime.utcnow()
-        })
+        now = datetime.utcnow()
+        try:
+            get_mongo_db().documents.insert_one({
+                "case_id": case_id,
+                "client_id": owner.client_id,
+                "worker_id": owner.worker_id,
+                "document_title": document_title,
+                "document_description": document_description,
+                **file_fields,
+                "uploaded_by": session['user'],
+                "uploaded_at": now,
+                "last_modified": now  # Part of the case page's ETag
+            })
+        except Exception:
+            # No document holds the file's reference, drop it so the file can be deleted
+            release_blobs([file_fields["content_hash"]])
+            raise
+        invalidate(case_namespace(case_id))
         
         flash("Document uploaded successfully.", "success")
     except Exception as e:
@@ -326,10 +338,141 @@ def upload_document(case_id):
     return redirect(url_for('view_case_details', case_id=case_id))  # Update the endpoint name here
 
 
+@app.route('/documents/<document_id>/download')
+def download_document(document_id):
+    user = get_current_worker()
+    if not user:
+        return redirect(url_for('login'))
+
+    try:
+        document = get_mongo_db().documents.find_one(
+            {"_id": ObjectId(document_id)},
+            {"case_id": 1, "file_key": 1, "file_url": 1, "file_name": 1, "file_type": 1}
+        )
+    except InvalidId:
+        document = None
+    if not document or not (document.get("file_key") or document.get("file_url")):
+        flash("Document not found.", "danger")
+        return redirect(url_for('dashboard'))
+
+    # Same permission check as view_case_details
+    with SessionLocal() as db_session:
+        case_worker_id = db_session.query(Case.worker_id).filter(Case.id == document["case_id"], LIVE_CASES).scalar()
+    if case_worker_id is None or (user.role != 'admin' and case_worker_id != user.id):
+        flash("You do not have permission to view this document.", "danger")
+        return redirect(url_for('dashboard'))
+
+    file_path = document.get("file_key") or file_url_to_key(document["file_url"])
+    if DOCUMENT_DOWNLOAD_MODE != 'stream':
+        return redirect(get_download_url(file_path, document.get("file_name")))
+
+    # Stream the object through the worker chunk by chunk, honouring Range and conditional GETs
+    status, obj = open_file_from_space(
+        file_path,
+        byte_range=request.headers.get('Range'),
+        if_none_match=request.headers.get('If-None-Match'),
+        if_modified_since=request.if_modified_since
+    )
+    if obj is None:
+        if status == 404:
+            flash("Document file not found.", "danger")
+            return redirect(url_for('dashboard'))
+        return Response(status=status)
+
+    response = Response(
+        stream_with_context(obj["Body"].iter_chunks(DOWNLOAD_CHUNK_SIZE)),
+        status=status,
+        mimetype=obj.get("ContentType") or document.get("file_type") or "application/octet-stream",
+        direct_passthrough=True
+    )
+    response.headers['Content-Length'] = str(obj["ContentLength"])
+    response.headers['Accept-Ranges'] = 'bytes'
+    if obj.get("ContentRange"):
+        response.headers['Content-Range'] = obj["ContentRange"]
+    if obj.get("ETag"):
+        response.headers['ETag'] = obj["ETag"]
+    if obj.get("LastModified"):
+        response.last_modified = obj["LastModified"]
+    if document.get("file_name"):
+        response.headers['Content-Disposition'] = f'inline; filename="{document["file_name"]}"'
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@app.route('/search')
+def search():
+    user = get_current_worker()
+    if not user:
+        return redirect(url_for('login'))
+    query_text = request.args.get('q', '').strip()
+    if not query_text:
+        return redirect(url_for('dashboard'))
+    with SessionLocal() as db_session:
+        results = search_cases(db_session, user, query_text, page=request.args.get('page', 1, type=int))
+        return render_template('search.html', current_user=user, q=query_text, **results)
+
+
+@app.route('/export/<kind>.csv')
+def export_csv(kind):
+    user = get_current_worker()
+    if not user:
+        return redirect(url_for('login'))
+    if kind not in EXPORTS:
+        flash("Unknown export.", "danger")
+        return redirect(url_for('dashboard'))
+    try:
+        date_from = parse_date(request.args.get('date_from'))
+        date_to = parse_date(request.args.get('date_to'))
+    except ValueError:
+        flash("Dates must be in YYYY-MM-DD format.", "danger")
+        return redirect(url_for('dashboard'))
+
+    # Admins may export everything or one worker's rows, everyone else only their own
+    worker_id = request.args.get('worker_id', type=int) if user.role == 'admin' else user.id
+    rows = iter_export_csv(
+        kind,
+        worker_id=worker_id,
+        status=request.args.get('status') or None,
+        case_type=request.args.get('case_type') or None,
+        date_from=date_from,
+        date_to=date_to
+    )
+    response = Response(stream_with_context(rows), mimetype='text/csv')
+    response.headers['Content-Disposition'] = f'attachment; filename="{kind}-{datetime.utcnow():%Y%m%d}.csv"'
+    return response
+
+
 @app.route('/profile')
 def profile():
     return render_template('profile.html')
 
+
+@app.route('/admin/profiles')
+def list_profiles():
+    user = get_current_worker()
+    if not user or user.role != 'admin':
+        flash("You do not have permission to view profiles.", "danger")
+        return redirect(url_for('dashboard'))
+    return render_template(
+        'profiles.html',
+        profiles=profiler_service.list_profiles(),
+        enabled=profiler_service.PROFILER_ENABLED,
+        current_user={"name": user.name, "role": user.role}
+    )
+
+
+@app.route('/admin/profiles/<name>')
+def download_profile(name):
+    user = get_current_worker()
+    if not user or user.role != 'admin':
+        flash("You do not have permission to view profiles.", "danger")
+        return redirect(url_for('dashboard'))
+    path = profiler_service.profile_path(name)
+    if path is None:
+        flash("Profile not found.", "danger")
+        return redirect(url_for('list_profiles'))
+    return send_file(path, mimetype='application/octet-stream', as_attachment=True, download_name=name)
+
 from sqlalchemy.sql import text  # Import the text module for raw SQL
 
 
@@ -338,91 +481,25 @@ def delete_case(case_id):
     try:
         with SessionLocal() as db_session:
             # Retrieve the logged-in user
-            user = db_session.query(Worker).get(session.get('user'))
+            user = get_current_worker()
             if not user:
                 flash("You must be logged in to perform this action.", "danger")
                 return redirect(url_for('login'))
 
-            # Retrieve the case
-            case = db_session.query(Case).get(case_id)
+            case = get_case(db_session, case_id, CASE_DELETE)
             if not case:
                 flash("Case not found.", "danger")
                 return redirect(url_for('dashboard'))
 
-            # Archive the case into `case_history`
-            try:
-                case_history = CaseHistory(
-                    case_id=case.id,
-                    client_id=case.client_id,
-                    worker_id=case.worker_id,
-                    case_title=case.case_title,
-                    case_description=case.case_description,
-                    case_status=case.case_status,
-                    case_type=case.case_type,
-                    court_date=case.court_date,
-                    judge_name=case.judge_name
-                )
-                db_session.add(case_history)
-                logging.info(f"Archived case ID {case_id} to case_history.")
-            except Exception as e:
-                logging.error(f"Failed to archive case ID {case_id}: {e}")
-                flash(f"Error archiving case: {e}", "danger")
-                return redirect(url_for('dashboard'))
-
-            # Check if the client has other active cases
-            try:
-                client = db_session.query(Client).get(case.client_id)
-                active_cases = db_session.query(Case).filter(Case.client_id == client.id).count()
-
-                # Archive the client into `client_history` if no active cases remain
-                if active_cases <= 1:  # The current case is the only one
-                    client_history = ClientHistory(
-                        client_id=client.id,
-                        name=client.name,
-                        second_name=client.second_name,
-                        last_name=client.last_name,
-                        second_last_name=client.second_last_name,
-                        email=client.email,
-                        phone=client.phone,
-                        address=client.address,
-                        curp=client.curp
-                    )
-                    db_session.add(client_history)
-                    logging.info(f"Archived client ID {client.id} to client_history.")
-
-                    # Delete client from client_history
-                    try:
-                        archived_client = db_session.query(ClientHistory).filter_by(client_id=client.id).first()
-                        if archived_client:
-                            db_session.delete(archived_client)
-                            logging.info(f"Deleted archived client ID {client.id} from client_history.")
-                    except Exception as e:
-                        logging.error(f"Failed to delete archived client ID {client.id}: {e}")
-                        db_session.rollback()
-                        flash(f"Error deleting archived client: {e}", "danger")
-                        return redirect(url_for('dashboard'))
-
-            except Exception as e:
-                logging.error(f"Failed to archive client ID {client.id}: {e}")
-                flash(f"Error archiving client: {e}", "danger")
-                return redirect(url_for('dashboard'))
-
-            # Remove associated documents in MongoDB
-            documents = mongo_db.documents.find({"case_id": case_id})
-            for document in documents:
-                file_url = document.get("file_url")
-                if file_url:
-                    file_path = file_url.replace(f"{DO_SPACE_ENDPOINT}/", "")
-                    try:
-                        delete_file_from_space(file_path)
-                    except Exception as e:
-                        logging.error(f"Failed to delete file {file_path} from DigitalOcean Spaces: {e}")
-                mongo_db.documents.delete_one({"_id": document["_id"]})
-
-            # Delete the case from the `cases` table
-            db_session.delete(case)
+            # Only flag the case, the archiver copies it (and its client, if this was
+            # the client's last case) into the history tables and removes its documents
+            case.is_deleted = True
+            case.deleted_at = datetime.utcnow()
             db_session.commit()
-            flash(f"Case '{case.case_title}' has been deleted and archived successfully.", "success")
+            invalidate_case(case_id, case.worker_id)
+            request_archive()
+            logging.info(f"Case ID {case_id} flagged for archiving.")
+            flash(f"Case '{case.case_title}' has been deleted and will be archived.", "success")
 
     except SQLAlchemyError as e:
         logging.error(f"SQLAlchemy error: {e}")
@@ -439,14 +516,14 @@ def confirm_delete(case_id):
     try:
         with SessionLocal() as db_session:
             # Retrieve the logged-in user
-            user = db_session.query(Worker).get(session.get('user'))
+            user = get_current_worker()
 
             if not user:
                 flash("You do not have permission to delete this case.", "danger")
                 return redirect(url_for('dashboard'))
 
             # Retrieve the case
-            case = db_session.query(Case).get(case_id)
+            case = get_case(db_session, case_id, CASE_DETAIL)
             if not case:
                 flash("Case not found.", "danger")
                 return redirect(url_for('dashboard'))
@@ -463,15 +540,15 @@ def edit_case(case_id):
 
     try:
         # Get the currently logged-in user
-        user = db_session.query(Worker).get(session.get('user'))
+        user = get_current_worker()
 
         # Ensure the user exists and has the appropriate role
         if not user or user.role not in ['admin', 'lawyer']:
             flash("You are not authorized to edit this case", "danger")
             return redirect(url_for('dashboard'))
 
-        # Retrieve the case
-        case = db_session.query(Case).get(case_id)
+        # Retrieve the case, eagerly loaded so it can be rendered after the session closes
+        case = get_case(db_session, case_id, CASE_DETAIL)
         if not case:
             flash("Case not found", "danger")
             return redirect(url_for('dashboard'))
@@ -495,7 +572,7 @@ def edit_case(case_id):
 @app.route('/cases/<int:case_id>/update', methods=['POST'])
 def update_case(case_id):
     db_session = SessionLocal()
-    case = db_session.query(Case).get(case_id)
+    case = get_case(db_session, case_id, CASE_DETAIL)
     if not case:
         flash("Case not found", "danger")
         return redirect(url_for('dashboard'))
@@ -506,6 +583,7 @@ def update_case(case_id):
     case.case_status = request.form['case_status']
     try:
         db_session.commit()
+        invalidate_case(case_id, case.worker_id)
         flash("Case updated successfully", "success")
     except Exception as e:
         db_session.rollback()
@@ -515,10 +593,21 @@ def update_case(case_id):
     return redirect(url_for('view_case_details', case_id=case_id))
 
 
-# Close session and SSH tunnel on teardown
-@app.teardown_appcontext
-def shutdown_session(exception=None):
-    close_tunnels()  # Corrected function call to close_tunnels
+# Make sure the long-lived SSH tunnel is up before handling the request. The
+# tunnel is only closed at process shutdown (see config.close_tunnels).
+@app.before_request
+def ensure_tunnels():
+    g.tunnel_overhead = start_tunnels()
+
+# Report how long this request waited on the tunnel
+@app.after_request
+def report_tunnel_overhead(response):
+    overhead = g.get('tunnel_overhead')
+    if overhead is not None:
+        response.headers.add('Server-Timing', f"tunnel;dur={overhead * 1000:.2f}")
+        if overhead > 0.1:
+            logging.warning(f"Request {request.path} waited {overhead:.3f}s on the SSH tunnel.")
+    return response
 
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,277 @@
+"""
+Benchmarks the app end to end against local stand-ins of its backends, see
+benchmarks/stand_ins.py. Run from the project root:
+
+    pip install -r benchmarks/requirements.txt
+    python -m benchmarks.run_benchmarks --cases 10000 --iterations 200
+    python -m benchmarks.run_benchmarks --json results.json
+    python -m benchmarks.run_benchmarks --compare results.json   # exits 1 on a p95 regression
+
+Each scenario drives one route through the Flask test client: login (password
+plus TOTP), dashboard, case detail, add_case, upload and delete_case. The report
+gives throughput, latency percentiles and, single-threaded, SQL statements per request.
+The stand-ins are not the real services (mongomock scans instead of using
+indexes, moto has no network), so compare runs with each other rather than
+reading the numbers as production latencies.
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SCENARIOS = ["login", "dashboard", "case_detail", "add_case", "upload", "delete_case"]
+
+
+def percentile(sorted_values, fraction):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+class Context:
+    def __init__(self, app, data, rng):
+        self.app = app
+        self.data = data
+        self.rng = rng
+        self.rng_lock = threading.Lock()
+        self.counter = itertools.count(1)
+        # Cases delete_case may consume, newest first so the others keep their ids
+        self.deletable = list(reversed(data["case_ids"]))
+        self.local = threading.local()
+
+    def choice(self, values):
+        with self.rng_lock:
+            return self.rng.choice(values)
+
+    def logged_in_client(self, worker_id):
+        clients = getattr(self.local, "clients", None)
+        if clients is None:
+            clients = self.local.clients = {}
+        if worker_id not in clients:
+            client = self.app.test_client()
+            with client.session_transaction() as sess:
+                sess['user'] = worker_id
+            clients[worker_id] = client
+        return clients[worker_id]
+
+
+def run_login(ctx):
+    import pyotp
+    from benchmarks.seed import BENCHMARK_PASSWORD
+
+    worker_id = ctx.choice(ctx.data["lawyer_ids"])
+    client = ctx.app.test_client()
+    response = client.post('/login', data={
+        "email": f"worker{worker_id}@bench.example.com",
+        "password": BENCHMARK_PASSWORD,
+        "two_factor_code": pyotp.TOTP(ctx.data["two_fa_secret"]).now(),
+    })
+    return client, response, response.status_code == 302 and '/dashboard' in response.location
+
+
+def run_dashboard(ctx):
+    worker_id = ctx.choice([ctx.data["admin_id"]] + ctx.data["lawyer_ids"])
+    client = ctx.logged_in_client(worker_id)
+    response = client.get('/dashboard', query_string={"sort": ctx.choice(["created_at", "court_date", "status"])})
+    return client, response, response.status_code == 200
+
+
+def run_case_detail(ctx):
+    client = ctx.logged_in_client(ctx.data["admin_id"])
+    response = client.get(f'/view_case/{ctx.choice(ctx.data["case_ids"])}')
+    return client, response, response.status_code == 200
+
+
+def run_add_case(ctx):
+    n = next(ctx.counter)
+    client = ctx.logged_in_client(ctx.data["admin_id"])
+    response = client.post('/add_case', content_type='multipart/form-data', data={
+        "client_name": "New",
+        "client_last_name": "Client",
+        "client_email": f"new-client-{n}@bench.example.com",
+        "client_phone": f"888{n:07d}",
+        "client_curp": f"NCURP{n:010d}",
+        "client_address": f"{n} New Street",
+        "lawyer_id": str(ctx.choice(ctx.data["lawyer_ids"])),
+        "assistant_id": "0",
+        "case_title": f"New case {n}",
+        "case_description": "Created by the benchmark",
+        "case_type": "civil",
+        "court_date": "2026-01-15",
+        "judge_name": "Judge Bench",
+        "document_title": "Initial filing",
+        "document_description": "Created by the benchmark",
+        "document": (io.BytesIO(os.urandom(32 * 1024)), "filing.pdf"),
+    })
+    return client, response, response.status_code == 302
+
+
+def run_upload(ctx):
+    client = ctx.logged_in_client(ctx.data["admin_id"])
+    case_id = ctx.choice(ctx.data["case_ids"])
+    # One upload in four repeats an existing file, exercising deduplication
+    body = b"duplicate evidence\n" * 4096 if ctx.choice([True, False, False, False]) else os.urandom(64 * 1024)
+    response = client.post(f'/upload_document/{case_id}', content_type='multipart/form-data', data={
+        "document_title": "Evidence",
+        "document_description": "Uploaded by the benchmark",
+        "document": (io.BytesIO(body), "evidence.bin"),
+    })
+    return client, response, response.status_code == 302
+
+
+def run_delete_case(ctx):
+    client = ctx.logged_in_client(ctx.data["admin_id"])
+    try:
+        case_id = ctx.deletable.pop()
+    except IndexError:
+        return client, None, False
+    ctx.data["case_ids"].remove(case_id)
+    response = client.post(f'/delete_case/{case_id}')
+    return client, response, response.status_code == 302
+
+
+RUNNERS = {name: globals()[f"run_{name}"] for name in SCENARIOS}
+
+
+def _flashed_error(client):
+    # Routes report failures as "danger" flashes on a redirect, not as status codes
+    with client.session_transaction() as sess:
+        flashes = sess.pop('_flashes', [])
+    return any(category == 'danger' for category, _ in flashes)
+
+
+def run_scenario(ctx, name, iterations, threads, count_sql):
+    from tests.support import count_statements
+
+    runner = RUNNERS[name]
+    latencies = []
+    statement_counts = []
+    errors = 0
+    results_lock = threading.Lock()
+
+    def one_request(_):
+        nonlocal errors
+        with count_statements() if count_sql else contextlib.nullcontext([]) as statements:
+            started = time.perf_counter()
+            client, response, ok = runner(ctx)
+            elapsed = time.perf_counter() - started
+        ok = ok and not _flashed_error(client)
+        with results_lock:
+            latencies.append(elapsed)
+            statement_counts.append(len(statements))
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    if threads == 1:
+        for i in range(iterations):
+            one_request(i)
+    else:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(one_request, range(iterations)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": iterations,
+        "errors": errors,
+        "throughput": iterations / wall if wall else 0.0,
+        "mean_ms": sum(latencies) / len(latencies) * 1000 if latencies else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p90_ms": percentile(latencies, 0.90) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": latencies[-1] * 1000 if latencies else 0.0,
+        "sql_per_request": sum(statement_counts) / len(statement_counts) if count_sql and statement_counts else None,
+    }
+
+
+def print_report(results):
+    header = f"{'scenario':<12} {'reqs':>6} {'errs':>5} {'req/s':>8} {'mean':>8} {'p50':>8} {'p90':>8} {'p95':>8} {'p99':>8} {'max':>8} {'sql':>5}"
+    print(header)
+    print("-" * len(header))
+    for name, r in results.items():
+        sql = f"{r['sql_per_request']:.1f}" if r["sql_per_request"] is not None else "-"
+        print(f"{name:<12} {r['requests']:>6} {r['errors']:>5} {r['throughput']:>8.1f} {r['mean_ms']:>8.2f} "
+              f"{r['p50_ms']:>8.2f} {r['p90_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f} {r['max_ms']:>8.2f} {sql:>5}")
+    print("Latencies in ms.")
+
+
+def compare(results, baseline_path, tolerance):
+    """
+    Returns the scenarios whose p95 got more than `tolerance` slower than the baseline.
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+    regressions = []
+    for name, r in results.items():
+        before = baseline.get(name)
+        if before and before["p95_ms"] > 0 and r["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {before['p95_ms']:.2f}ms -> {r['p95_ms']:.2f}ms")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the app against local backend stand-ins.")
+    parser.add_argument("--database-url", help="SQLAlchemy URL, e.g. a local MySQL (default: a fresh SQLite file)")
+    parser.add_argument("--workers", type=int, default=20)
+    parser.add_argument("--clients", type=int, default=2000)
+    parser.add_argument("--cases", type=int, default=10000)
+    parser.add_argument("--documents-per-case", type=int, default=3)
+    parser.add_argument("--iterations", type=int, default=200, help="Requests per scenario")
+    parser.add_argument("--warmup", type=int, default=10, help="Untimed requests per scenario")
+    parser.add_argument("--threads", type=int, default=1, help="Concurrent clients per scenario")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated subset of " + ", ".join(SCENARIOS))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--compare", help="Results file from an earlier run to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed p95 slowdown vs. --compare (default 20%%)")
+    parser.add_argument("--verbose", action="store_true", help="Show the app's own output")
+    args = parser.parse_args(argv)
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    from benchmarks.stand_ins import boot
+    app = boot(args.database_url)
+    from benchmarks.seed import seed
+    data = seed(args.workers, args.clients, args.cases, args.documents_per_case, seed_value=args.seed)
+    ctx = Context(app, data, random.Random(args.seed))
+
+    results = {}
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with quiet:
+        for name in scenarios:
+            if args.warmup:
+                run_scenario(ctx, name, args.warmup, 1, False)
+            results[name] = run_scenario(ctx, name, args.iterations, args.threads, args.threads == 1)
+    print_report(results)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+        print(f"Results written to {args.json}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""
+Seeds the benchmark databases with realistic volumes of workers, clients, cases
+and documents. Rows are inserted in bulk through SQLAlchemy Core, documents with
+insert_many, and the documents share a pool of content-addressed files in the
+Space, as they would after deduplication.
+"""
+import hashlib
+import random
+from datetime import date, datetime, timedelta
+import pyotp
+from sqlalchemy import insert
+from config import Base, SessionLocal, get_engine, get_mongo_db
+from models.worker_model import Worker
+from models.client_model import Client
+from models.case_model import Case
+import models.case_history_model  # noqa: F401  (registers the history tables)
+import models.client_history_model  # noqa: F401
+from services.auth_service import hash_password
+from services.document_service import ensure_document_indexes
+from services.digitalocean_space_service import get_s3_client, content_key, file_url_for_key, DO_SPACE_NAME
+
+BENCHMARK_PASSWORD = "benchmark-password"
+CASE_TYPES = ["civil", "criminal", "family", "labor", "corporate"]
+CASE_STATUSES = ["open", "in progress", "closed", None]
+BATCH_SIZE = 1000
+
+
+def _batches(rows):
+    for start in range(0, len(rows), BATCH_SIZE):
+        yield rows[start:start + BATCH_SIZE]
+
+
+def seed(workers=20, clients=2000, cases=10000, documents_per_case=3, distinct_files=50, seed_value=42):
+    """
+    Creates the schema and fills it. Cases are spread over the lawyers and get
+    explicit, distinct created_at values so keyset pagination behaves as on MySQL.
+
+    Returns:
+        dict: ids the scenarios draw from (admin, lawyers, cases) and the 2FA secret
+              shared by every seeded worker.
+    """
+    rng = random.Random(seed_value)
+    Base.metadata.create_all(get_engine())
+    ensure_document_indexes()
+
+    two_fa_secret = pyotp.random_base32()
+    hashed_password = hash_password(BENCHMARK_PASSWORD)
+    worker_rows = [{
+        "id": i,
+        "name": f"Worker{i}",
+        "last_name": "Bench",
+        "email": f"worker{i}@bench.example.com",
+        "phone": f"555{i:07d}",
+        "curp": f"WCURP{i:010d}",
+        "role": "admin" if i == 1 else ("assistant" if i % 5 == 0 else "lawyer"),
+        "company_id": f"LR-{i:04d}",
+        "hashed_password": hashed_password,
+        "two_fa_secret": two_fa_secret,
+        "two_fa_enabled": True,
+    } for i in range(1, workers + 1)]
+    lawyer_ids = [row["id"] for row in worker_rows if row["role"] == "lawyer"]
+
+    client_rows = [{
+        "id": i,
+        "name": f"Client{i}",
+        "last_name": "Bench",
+        "email": f"client{i}@bench.example.com",
+        "phone": f"777{i:07d}",
+        "curp": f"CCURP{i:010d}",
+        "address": f"{i} Benchmark Street",
+    } for i in range(1, clients + 1)]
+
+    start = datetime(2020, 1, 1)
+    case_rows = [{
+        "id": i,
+        "client_id": rng.randint(1, clients),
+        "worker_id": rng.choice(lawyer_ids),
+        "case_title": f"Case {i}",
+        "case_description": f"Benchmark case {i} " + "lorem ipsum " * rng.randint(5, 40),
+        "case_status": rng.choice(CASE_STATUSES),
+        "case_type": rng.choice(CASE_TYPES),
+        "court_date": date(2025, 1, 1) + timedelta(days=rng.randint(0, 365)) if rng.random() < 0.8 else None,
+        "judge_name": f"Judge {rng.randint(1, 50)}",
+        "created_at": start + timedelta(minutes=i),
+        "updated_at": start + timedelta(minutes=i),
+    } for i in range(1, cases + 1)]
+
+    with get_engine().begin() as connection:
+        for model, rows in ((Worker, worker_rows), (Client, client_rows), (Case, case_rows)):
+            for batch in _batches(rows):
+                connection.execute(insert(model), batch)
+
+    # A pool of files in the Space, referenced by many documents each
+    s3 = get_s3_client()
+    files = []
+    for n in range(distinct_files):
+        body = f"benchmark file {n}\n".encode("utf-8") * rng.randint(100, 5000)
+        digest = hashlib.sha256(body).hexdigest()
+        s3.put_object(Bucket=DO_SPACE_NAME, Key=content_key(digest), Body=body, ContentType="text/plain")
+        files.append((digest, len(body)))
+    sizes = dict(files)
+
+    references = {}
+    documents = []
+    for row in case_rows:
+        for d in range(documents_per_case):
+            digest, size = rng.choice(files)
+            references[digest] = references.get(digest, 0) + 1
+            uploaded_at = row["created_at"] + timedelta(hours=d)
+            documents.append({
+                "case_id": row["id"],
+                "client_id": row["client_id"],
+                "worker_id": row["worker_id"],
+                "document_title": f"Document {d + 1} of case {row['id']}",
+                "document_description": "Benchmark document",
+                "file_url": file_url_for_key(content_key(digest)),
+                "file_key": content_key(digest),
+                "file_name": f"document-{d + 1}.txt",
+                "file_size": size,
+                "content_hash": digest,
+                "uploaded_by": "Benchmark",
+                "uploaded_at": uploaded_at,
+                "last_modified": uploaded_at,
+                "file_type": "text/plain",
+                "document_tags": ["benchmark"],
+            })
+
+    db = get_mongo_db()
+    for batch in _batches(documents):
+        db.documents.insert_many(batch)
+    if references:
+        db.blobs.insert_many([
+            {"_id": digest, "ref_count": count, "key": content_key(digest), "size": sizes[digest], "created_at": start}
+            for digest, count in references.items()
+        ])
+
+    with SessionLocal() as db_session:
+        print(f"Seeded {db_session.query(Worker).count()} workers, {db_session.query(Client).count()} clients, "
+              f"{db_session.query(Case).count()} cases and {db.documents.count_documents({})} documents.")
+
+    return {
+        "admin_id": 1,
+        "lawyer_ids": lawyer_ids,
+        "case_ids": [row["id"] for row in case_rows],
+        "two_fa_secret": two_fa_secret,
+    }
@@ -0,0 +1,75 @@
+"""
+Local stand-ins for the remote backends, so the app can be benchmarked without
+the SSH host: SQLite (or any DATABASE_URL, e.g. a local MySQL), an in-process
+MongoDB mock (mongomock) and an in-process S3 mock (moto) in place of Spaces.
+
+boot() must run before anything imports app, config or the services, because
+they read their settings from the environment at import time.
+"""
+import os
+import tempfile
+
+BENCHMARK_SPACE = "benchmark-space"
+
+
+def boot(database_url=None):
+    """
+    Points the app at the stand-ins and returns the Flask app.
+
+    Args:
+        database_url: SQLAlchemy URL to use, defaults to a fresh SQLite file.
+
+    Returns:
+        Flask: The app, with CSRF disabled so forms can be posted directly.
+    """
+    if database_url is None:
+        path = os.path.join(tempfile.mkdtemp(prefix="law-firm-bench-"), "benchmark.db")
+        database_url = f"sqlite:///{path}"
+
+    # Direct URLs make config skip the SSH tunnel entirely
+    os.environ["DATABASE_URL"] = database_url
+    os.environ["MONGO_URI"] = "mongodb://stand-in"
+    os.environ.update(
+        DO_SPACE_ACCESS_KEY="benchmark",
+        DO_SPACE_SECRET_KEY="benchmark",
+        DO_SPACE_REGION="us-east-1",
+        DO_SPACE_NAME=BENCHMARK_SPACE,
+        DO_SPACE_ENDPOINT="https://s3.amazonaws.com",
+    )
+
+    from moto import mock_aws
+    mock_aws().start()
+
+    import mongomock
+    import config
+    _without_text_search(mongomock)
+    config._mongo_client = mongomock.MongoClient()
+
+    from services.digitalocean_space_service import get_s3_client
+    get_s3_client().create_bucket(Bucket=BENCHMARK_SPACE)
+
+    from app import app
+    app.config['WTF_CSRF_ENABLED'] = False
+    return app
+
+
+def _without_text_search(mongomock):
+    """
+    mongomock cannot run $text queries and raises NotImplementedError. A real
+    server without the text index fails with OperationFailure instead, which
+    the search service answers with its regex fallback, so raise that.
+    """
+    from pymongo.errors import OperationFailure
+
+    def text_unsupported(method):
+        def wrapper(*args, **kwargs):
+            try:
+                return method(*args, **kwargs)
+            except NotImplementedError as e:
+                if "$text" not in str(e):
+                    raise
+                raise OperationFailure("text index required for $text query", code=27) from e
+        return wrapper
+
+    for name in ("aggregate", "find", "find_one", "count_documents"):
+        setattr(mongomock.collection.Collection, name, text_unsupported(getattr(mongomock.collection.Collection, name)))
@@ -13,5 +13,15 @@ db.documents.insertOne({
   document_tags: ["contract", "legal", "confidential"]
 });
 
+// Indexes used by the case pages (createIndex is a no-op if the index exists)
+db.documents.createIndex({ case_id: 1, uploaded_at: 1 }, { name: "case_id_uploaded_at" });
+db.documents.createIndex({ worker_id: 1 }, { name: "worker_id" });
+db.documents.createIndex({ content_hash: 1 }, { name: "content_hash" });
+db.documents.createIndex({ case_id: 1, last_modified: -1 }, { name: "case_id_last_modified" });
+db.documents.createIndex(
+  { document_title: "text", document_description: "text", document_tags: "text" },
+  { name: "document_text", weights: { document_title: 10, document_tags: 5, document_description: 1 } }
+);
+
 rs.initiate()
 rs.status()
\ No newline at end of file
@@ -52,13 +52,39 @@ CREATE TABLE cases (
     judge_name VARCHAR(100),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    is_deleted BOOLEAN NOT NULL DEFAULT FALSE,
+    deleted_at TIMESTAMP NULL,
     FOREIGN KEY (client_id) REFERENCES clients(id) ON DELETE CASCADE,
     FOREIGN KEY (worker_id) REFERENCES workers(id) ON DELETE CASCADE
 );
 
+-- Keyset pagination indexes for the dashboard (admin and per-worker scopes)
+CREATE INDEX ix_cases_created_at_id ON cases (created_at, id);
+CREATE INDEX ix_cases_worker_created_at_id ON cases (worker_id, created_at, id);
+CREATE INDEX ix_cases_court_date_id ON cases (court_date, id);
+CREATE INDEX ix_cases_worker_court_date_id ON cases (worker_id, court_date, id);
+CREATE INDEX ix_cases_status_id ON cases (case_status, id);
+CREATE INDEX ix_cases_worker_status_id ON cases (worker_id, case_status, id);
+
+-- Full-text search over cases (MATCH ... AGAINST in services/search_service.py)
+CREATE FULLTEXT INDEX ft_cases_title_description_judge ON cases (case_title, case_description, judge_name);
+
+-- Soft-deleted cases waiting to be moved to case_history by the archiver
+CREATE INDEX ix_cases_is_deleted_id ON cases (is_deleted, id);
+
+-- Newest change per scope, for the dashboard ETag (services/page_version_service.py)
+CREATE INDEX ix_cases_updated_at ON cases (updated_at);
+CREATE INDEX ix_cases_worker_updated_at ON cases (worker_id, updated_at);
+CREATE INDEX ix_clients_updated_at ON clients (updated_at);
+
 -- Create the case_history table
+-- Range-partitioned by archive date: monthly partitions are created ahead, merged into yearly
+-- ones and finally moved to cold storage by database/history_retention.py (run it once after
+-- this script, then daily from cron). Every unique key must contain the partitioning column,
+-- hence the (id, archived_at) primary key. History tables created unpartitioned by an older
+-- version of this script are converted once with database/history_retention.py --partition-existing.
 CREATE TABLE case_history (
-    id INT AUTO_INCREMENT PRIMARY KEY,
+    id INT AUTO_INCREMENT,
     case_id INT NOT NULL,
     client_id INT NOT NULL,
     worker_id INT NOT NULL,
@@ -68,12 +94,22 @@ CREATE TABLE case_history (
     case_type VARCHAR(50),
     court_date DATE,
     judge_name VARCHAR(100),
-    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    archived_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, archived_at)
+)
+PARTITION BY RANGE (UNIX_TIMESTAMP(archived_at)) (
+    PARTITION p_future VALUES LESS THAN MAXVALUE
 );
 
--- Create the client_history table
+-- Per case/client/worker history lookups, and range scans by archive date
+CREATE INDEX ix_case_history_case_id_archived_at ON case_history (case_id, archived_at);
+CREATE INDEX ix_case_history_client_id_archived_at ON case_history (client_id, archived_at);
+CREATE INDEX ix_case_history_worker_id_archived_at ON case_history (worker_id, archived_at);
+CREATE INDEX ix_case_history_archived_at ON case_history (archived_at);
+
+-- Create the client_history table (partitioned like case_history)
 CREATE TABLE client_history (
-    id INT AUTO_INCREMENT PRIMARY KEY,
+    id INT AUTO_INCREMENT,
     client_id INT NOT NULL,
     name VARCHAR(100),
     second_name VARCHAR(100),
@@ -83,5 +119,12 @@ CREATE TABLE client_history (
     phone VARCHAR(25),
     address TEXT,
     curp VARCHAR(20),
-    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
\ No newline at end of file
+    archived_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, archived_at)
+)
+PARTITION BY RANGE (UNIX_TIMESTAMP(archived_at)) (
+    PARTITION p_future VALUES LESS THAN MAXVALUE
+);
+
+CREATE INDEX ix_client_history_client_id_archived_at ON client_history (client_id, archived_at);
+CREATE INDEX ix_client_history_archived_at ON client_history (archived_at);
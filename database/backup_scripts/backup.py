@@ -0,0 +1,75 @@
+"""
+Backs up MySQL (law_firm) and MongoDB (legal_documents) in parallel.
+
+    python database/backup_scripts/backup.py full
+    python database/backup_scripts/backup.py incremental
+    python database/backup_scripts/backup.py verify [name]
+    python database/backup_scripts/backup.py rotate --keep 7
+    python database/backup_scripts/backup.py list
+
+A full backup streams mysqldump --single-transaction and mongodump --archive
+through gzip. An incremental backup copies the MySQL binary logs and MongoDB
+oplog entries written since the previous backup (MySQL needs log_bin enabled and
+a user with REPLICATION CLIENT/SLAVE, MongoDB a replica set). Each backup gets a
+manifest.json with the sha256 of its files; full and incremental backups are
+verified, then old ones rotated, unless --no-verify/--no-rotate are given.
+Restore with database/backup_scripts/restore.py.
+"""
+import sys
+import os
+
+# Calculate the path to the project root directory and add it to sys.path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(project_root)
+
+import argparse
+from config import close_tunnels
+from services.backup_service import (
+    create_backup, verify_backup, rotate_backups, list_backups, BACKUP_DIR, BACKUP_KEEP_FULL
+)
+
+
+def _verify(name, backup_dir):
+    problems = verify_backup(name, backup_dir)
+    for problem in problems:
+        print(f"{name}: {problem}")
+    print(f"{name}: {'FAILED' if problems else 'OK'}")
+    return not problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Back up MySQL and MongoDB.")
+    parser.add_argument("command", choices=("full", "incremental", "verify", "rotate", "list"))
+    parser.add_argument("name", nargs="?", help="Backup to verify (default: all)")
+    parser.add_argument("--dir", default=BACKUP_DIR, help="Backup folder")
+    parser.add_argument("--keep", type=int, default=BACKUP_KEEP_FULL, help="Full backups kept by rotation")
+    parser.add_argument("--no-verify", action="store_true", help="Skip the checksum verification of a new backup")
+    parser.add_argument("--no-rotate", action="store_true", help="Keep old backups after a new one")
+    args = parser.parse_args()
+
+    ok = True
+    try:
+        if args.command in ("full", "incremental"):
+            manifest = create_backup(args.command, args.dir)
+            size = sum(info["bytes"] for info in manifest["files"].values())
+            print(f"Backup {manifest['name']}: {len(manifest['files'])} files, "
+                  f"{size / (1024 * 1024):.1f} MB in {manifest['seconds']:.1f}s")
+            if not args.no_verify:
+                ok = _verify(manifest["name"], args.dir)
+            if ok and not args.no_rotate:
+                for name in rotate_backups(args.keep, args.dir):
+                    print(f"Deleted old backup {name}")
+        elif args.command == "verify":
+            names = [args.name] if args.name else [manifest["name"] for manifest in list_backups(args.dir)]
+            ok = all([_verify(name, args.dir) for name in names])
+        elif args.command == "rotate":
+            for name in rotate_backups(args.keep, args.dir):
+                print(f"Deleted old backup {name}")
+        else:
+            for manifest in list_backups(args.dir):
+                size = sum(info["bytes"] for info in manifest["files"].values())
+                print(f"{manifest['name']:<32} {manifest['type']:<12} base={manifest['base']} "
+                      f"{size / (1024 * 1024):.1f} MB")
+    finally:
+        close_tunnels()
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,75 @@
+"""
+Restores MySQL and MongoDB from the backups made by backup.py, in parallel,
+optionally to a point in time. The databases in .env (DATABASE_URL/MONGO_URI or
+the SSH tunnel) are overwritten, so --yes is required.
+
+    python database/backup_scripts/restore.py --yes
+    python database/backup_scripts/restore.py --yes --until "2026-10-18 14:30:00"
+    python database/backup_scripts/restore.py --yes --backup full-20261018T020000Z --no-replay
+
+MySQL tables are created without their secondary indexes, loaded in chunks by
+several mysql clients, then indexed; MongoDB is restored with --noIndexRestore
+and indexed once with ensure_document_indexes. The binlog and oplog of the
+incrementals are then replayed, up to --until (UTC) if given.
+
+Pointed at a local MySQL/MongoDB, --benchmark prints the time of every phase,
+--json keeps them and --rto makes the run fail when the restore is slower than
+the recovery-time objective.
+"""
+import sys
+import os
+
+# Calculate the path to the project root directory and add it to sys.path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(project_root)
+
+import argparse
+import json
+from config import close_tunnels
+from services.backup_service import BACKUP_DIR
+from services.restore_service import restore_backup, restore_plan, parse_time, RESTORE_THREADS
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Restore MySQL and MongoDB from a backup.")
+    parser.add_argument("--dir", default=BACKUP_DIR, help="Backup folder")
+    parser.add_argument("--backup", help="Full backup to restore (default: the newest, or the newest before --until)")
+    parser.add_argument("--until", help="Recover up to this time, ISO 8601 in UTC (default: the last incremental)")
+    parser.add_argument("--no-replay", action="store_true", help="Restore the full backup only")
+    parser.add_argument("--threads", type=int, default=RESTORE_THREADS, help="Parallel loaders per database")
+    parser.add_argument("--work-dir", help="Folder for temporary files (default: inside --dir)")
+    parser.add_argument("--dry-run", action="store_true", help="Only show the backups that would be used")
+    parser.add_argument("--yes", action="store_true", help="Confirm overwriting the configured databases")
+    parser.add_argument("--benchmark", action="store_true", help="Print the time taken by every phase")
+    parser.add_argument("--json", help="Write the timings to this file")
+    parser.add_argument("--rto", type=float, help="Exit with 1 if the restore takes longer than this many seconds")
+    args = parser.parse_args()
+
+    if args.no_replay and args.until:
+        parser.error("--until needs the binlog/oplog replay")
+
+    try:
+        if args.dry_run or not args.yes:
+            full, incrementals = restore_plan(args.dir, args.backup, parse_time(args.until) if args.until else None)
+            print(f"Full backup: {full['name']}")
+            for manifest in ([] if args.no_replay else incrementals):
+                print(f"Incremental: {manifest['name']}")
+            if not args.dry_run:
+                print("The configured databases would be overwritten, run again with --yes.")
+            sys.exit(0 if args.dry_run else 2)
+
+        result = restore_backup(args.dir, args.backup, args.until, args.threads, args.work_dir,
+                                replay=not args.no_replay)
+    finally:
+        close_tunnels()
+
+    print(f"Restored {result['full']} + {len(result['incrementals'])} incrementals in {result['seconds']:.1f}s")
+    if args.benchmark:
+        for phase, seconds in sorted(result["phases"].items(), key=lambda item: -item[1]):
+            print(f"  {phase:<30} {seconds:8.1f}s")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as stream:
+            json.dump(result, stream, indent=2)
+    if args.rto is not None and result["seconds"] > args.rto:
+        print(f"Restore took {result['seconds']:.1f}s, over the {args.rto:.0f}s recovery-time objective")
+        sys.exit(1)
@@ -3,12 +3,22 @@ Database set up for connecting to the database with ssh keys, to the remote serv
 Refer to the config.py file, localted in the root of the project config.py
 Along with proper .env file set up refer to the template_env file in the root of the project.
 """
-from config import Base, engine, close_tunnel
+from config import Base, get_engine, close_tunnels
+from services.document_service import ensure_document_indexes
+from services.history_retention_service import ensure_history_partitions
 
 def init_db():
-    Base.metadata.create_all(bind=engine)
+    Base.metadata.create_all(bind=get_engine())
+    # Monthly partitions of the history tables (MySQL only), kept up by database/history_retention.py
+    ensure_history_partitions()
     print("Database Initilialize correctly.")
 
+def init_mongo_indexes():
+    # Idempotent, can be re-run on every deploy
+    names = ensure_document_indexes()
+    print(f"MongoDB indexes ensured: {', '.join(names)}")
+
 if __name__ == "__main__":
     init_db()
-    close_tunnel()  # At the end of the code we close the SSH tunnel
+    init_mongo_indexes()
+    close_tunnels()  # At the end of the code we close the SSH tunnel
@@ -0,0 +1,58 @@
+"""
+Maintains the monthly partitions of case_history and client_history (MySQL only).
+Run it from cron, e.g. once a day:
+
+    python database/history_retention.py
+    python database/history_retention.py --ensure-only
+    python database/history_retention.py --retention-months 60 --compact-after-months 6
+    python database/history_retention.py --partition-existing
+
+Each run moves partitions older than --retention-months to the Space as gzipped
+CSV (history-archive/<table>/<partition>.csv.gz) and drops them, merges the
+months older than --compact-after-months into yearly partitions, and creates
+the partitions of the next --months-ahead months.
+
+Only tables created by the current models are partitioned. History tables that
+existed before are skipped with a message until --partition-existing is passed
+once: it changes their primary key to (id, archived_at) and partitions them,
+copying each table, so run it off-hours.
+"""
+import sys
+import os
+
+# Calculate the path to the project root directory and add it to sys.path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(project_root)
+
+import argparse
+import time
+from config import close_tunnels
+from services.history_retention_service import (
+    run_retention, ensure_history_partitions,
+    HISTORY_PARTITIONS_AHEAD, HISTORY_COMPACT_AFTER_MONTHS, HISTORY_RETENTION_MONTHS
+)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create, compact and expire history table partitions.")
+    parser.add_argument("--months-ahead", type=int, default=HISTORY_PARTITIONS_AHEAD,
+                        help="Monthly partitions created in advance")
+    parser.add_argument("--compact-after-months", type=int, default=HISTORY_COMPACT_AFTER_MONTHS,
+                        help="Merge monthly partitions older than this into yearly ones")
+    parser.add_argument("--retention-months", type=int, default=HISTORY_RETENTION_MONTHS,
+                        help="Move partitions older than this to cold storage (0 keeps everything)")
+    parser.add_argument("--ensure-only", action="store_true", help="Only create the upcoming partitions")
+    parser.add_argument("--partition-existing", action="store_true",
+                        help="First partition the history tables created before partitioning (copies them)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    try:
+        if args.ensure_only:
+            ensure_history_partitions(args.months_ahead, partition_existing=args.partition_existing)
+        else:
+            run_retention(args.months_ahead, args.compact_after_months, args.retention_months,
+                          partition_existing=args.partition_existing)
+    finally:
+        close_tunnels()
+    print(f"History retention finished in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,380 @@
+"""
+Bulk import of clients and cases from CSV or JSONL files, e.g. when onboarding a new office.
+
+    python database/import_data.py clients clients.csv
+    python database/import_data.py cases cases.jsonl --batch-size 2000
+
+Files are streamed, never loaded whole, and written in chunked transactions of
+--batch-size rows: one SELECT to match the chunk against existing rows, then one
+executemany INSERT (PyMySQL sends it as a single multi-row INSERT) and one
+executemany UPDATE, so a chunk costs a handful of round trips over the tunnel.
+
+clients: name, last_name, email, phone, curp are required; second_name,
+    second_last_name and address are optional. A row whose email or CURP matches
+    an existing client updates it, otherwise a client is inserted.
+cases: case_title, case_type and a client (client_email or client_curp) and
+    worker (worker_email, worker_company_id or worker_id) are required;
+    case_description, case_status, court_date (YYYY-MM-DD) and judge_name are
+    optional. A case can reference an already stored file with file_key plus
+    document_title (and optionally file_name, document_description and
+    document_tags separated by ";"), which is recorded as its first document.
+
+Rows that cannot be imported are written with the reason to a rejects file
+(<input>.rejects.jsonl by default) and the import carries on.
+"""
+import sys
+import os
+
+# Calculate the path to the project root directory and add it to sys.path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(project_root)
+
+import argparse
+import csv
+import json
+import time
+from abc import ABC, abstractmethod
+from datetime import date, datetime
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+from sqlalchemy import insert, update, or_
+from sqlalchemy.exc import SQLAlchemyError
+from config import SessionLocal, get_mongo_db, close_tunnels
+from models.client_model import Client
+from models.case_model import Case
+from models.worker_model import Worker
+from services.digitalocean_space_service import file_url_for_key
+from services.fragment_cache_service import invalidate_all
+
+CLIENT_REQUIRED = ("name", "last_name", "email", "phone", "curp")
+CLIENT_OPTIONAL = ("second_name", "second_last_name", "address")
+CASE_REQUIRED = ("case_title", "case_type")
+CASE_OPTIONAL = ("case_description", "case_status", "judge_name")
+CONTENT_ADDRESSED_PREFIX = "documents/sha256/"
+
+
+class RejectedRow(Exception):
+    pass
+
+
+def read_rows(path, file_format=None):
+    """
+    Yields (line number, row dict) from a CSV (with a header) or JSONL file, one row at a time.
+    """
+    file_format = file_format or ("csv" if path.lower().endswith(".csv") else "jsonl")
+    with open(path, newline='', encoding='utf-8') as f:
+        if file_format == "csv":
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, {key.strip(): value for key, value in row.items() if key}
+        else:
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield line_number, json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield line_number, {"_error": f"Invalid JSON: {e}"}
+
+
+def chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _value(row, key):
+    value = row.get(key)
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _require(row, keys):
+    missing = [key for key in keys if not _value(row, key)]
+    if missing:
+        raise RejectedRow(f"Missing required field(s): {', '.join(missing)}")
+    return {key: _value(row, key) for key in keys}
+
+
+class Importer(ABC):
+    def __init__(self, kind, rejects_path, batch_size):
+        self.kind = kind
+        self.batch_size = batch_size
+        self.rejects_path = rejects_path
+        self.rejects_file = None
+        self.counts = {"rows": 0, "inserted": 0, "updated": 0, "rejected": 0}
+        self.started = time.perf_counter()
+
+    def reject(self, line_number, row, reason):
+        if self.rejects_file is None:
+            self.rejects_file = open(self.rejects_path, "w", encoding="utf-8")
+        self.rejects_file.write(json.dumps({"line": line_number, "error": str(reason), "row": row}, default=str) + "\n")
+        self.counts["rejected"] += 1
+
+    def report(self, final=False):
+        elapsed = time.perf_counter() - self.started
+        rate = self.counts["rows"] / elapsed * 60 if elapsed else 0
+        print(f"{'Done' if final else 'Progress'} {self.kind}: {self.counts['rows']} rows "
+              f"({self.counts['inserted']} inserted, {self.counts['updated']} updated, {self.counts['rejected']} rejected) "
+              f"in {elapsed:.1f}s, {rate:.0f} rows/min")
+
+    def close(self):
+        if self.rejects_file is not None:
+            self.rejects_file.close()
+            print(f"Rejected rows written to {self.rejects_path}")
+
+    def run(self, rows):
+        with SessionLocal() as db_session:
+            self.prepare(db_session)
+            for chunk in chunks(rows, self.batch_size):
+                self.counts["rows"] += len(chunk)
+                try:
+                    result = self.write_chunk(db_session, chunk)
+                    db_session.commit()
+                    self.record(result)
+                except SQLAlchemyError as e:
+                    # Retry the chunk row by row to find the rows the database refuses
+                    db_session.rollback()
+                    print(f"Chunk ending at line {chunk[-1][0]} failed ({e.__class__.__name__}), retrying row by row.")
+                    for line_number, row in chunk:
+                        try:
+                            result = self.write_chunk(db_session, [(line_number, row)])
+                            db_session.commit()
+                            self.record(result)
+                        except SQLAlchemyError as row_error:
+                            db_session.rollback()
+                            self.reject(line_number, row, getattr(row_error, "orig", row_error))
+                self.report()
+        self.report(final=True)
+
+    def record(self, result):
+        inserted, updated, rejects, after_commit = result
+        self.counts["inserted"] += inserted
+        self.counts["updated"] += updated
+        for line_number, row, reason in rejects:
+            self.reject(line_number, row, reason)
+        if after_commit:
+            after_commit()
+
+    def prepare(self, db_session):
+        pass
+
+    @abstractmethod
+    def write_chunk(self, db_session, chunk):
+        """
+        Writes a chunk without committing it.
+
+        Returns:
+            tuple: (inserted, updated, rejected rows as (line, row, reason),
+                    callable to run once the chunk is committed or None)
+        """
+
+
+class ClientImporter(Importer):
+    def write_chunk(self, db_session, chunk):
+        parsed = {}
+        rejects = []
+        for line_number, row in chunk:
+            try:
+                if "_error" in row:
+                    raise RejectedRow(row["_error"])
+                values = _require(row, CLIENT_REQUIRED)
+                values.update({key: _value(row, key) for key in CLIENT_OPTIONAL if key in row})
+                values["email"] = values["email"].lower()
+                values["curp"] = values["curp"].upper()
+                # A later row in the same file wins over an earlier one for the same client
+                parsed[values["email"]] = (line_number, row, values)
+            except RejectedRow as e:
+                rejects.append((line_number, row, e))
+        if not parsed:
+            return 0, 0, rejects, None
+
+        emails = [values["email"] for _, _, values in parsed.values()]
+        curps = [values["curp"] for _, _, values in parsed.values()]
+        existing = db_session.query(Client.id, Client.email, Client.curp).filter(
+            or_(Client.email.in_(emails), Client.curp.in_(curps))
+        ).all()
+        by_email = {email.lower(): client_id for client_id, email, _ in existing}
+        by_curp = {curp.upper(): client_id for client_id, _, curp in existing}
+
+        inserts, updates = [], []
+        for line_number, row, values in parsed.values():
+            email_match, curp_match = by_email.get(values["email"]), by_curp.get(values["curp"])
+            if email_match and curp_match and email_match != curp_match:
+                rejects.append((line_number, row, "Email and CURP belong to two different existing clients"))
+            elif email_match or curp_match:
+                updates.append({"id": email_match or curp_match, **values})
+            else:
+                inserts.append(values)
+
+        if inserts:
+            db_session.execute(insert(Client), inserts)
+        if updates:
+            db_session.execute(update(Client), updates)  # executemany UPDATE ... WHERE id = ?
+        return len(inserts), len(updates), rejects, None
+
+
+class CaseImporter(Importer):
+    def prepare(self, db_session):
+        # Workers are few, resolve them from memory instead of per chunk
+        self.workers = {}
+        for worker_id, email, company_id in db_session.query(Worker.id, Worker.email, Worker.company_id):
+            self.workers[("worker_id", str(worker_id))] = worker_id
+            self.workers[("worker_email", email.lower())] = worker_id
+            self.workers[("worker_company_id", company_id)] = worker_id
+
+    def _worker_id(self, row):
+        for key in ("worker_id", "worker_email", "worker_company_id"):
+            value = _value(row, key)
+            if value:
+                worker_id = self.workers.get((key, value.lower() if key == "worker_email" else value))
+                if worker_id is None:
+                    raise RejectedRow(f"Unknown worker {key}={value}")
+                return worker_id
+        raise RejectedRow("Missing worker (worker_email, worker_company_id or worker_id)")
+
+    def write_chunk(self, db_session, chunk):
+        parsed = []
+        rejects = []
+        client_emails, client_curps = set(), set()
+        for line_number, row in chunk:
+            try:
+                if "_error" in row:
+                    raise RejectedRow(row["_error"])
+                values = _require(row, CASE_REQUIRED)
+                values.update({key: _value(row, key) for key in CASE_OPTIONAL})
+                values["worker_id"] = self._worker_id(row)
+                court_date = _value(row, "court_date")
+                try:
+                    values["court_date"] = date.fromisoformat(court_date) if court_date else None
+                except ValueError:
+                    raise RejectedRow(f"Invalid court_date {court_date!r}, expected YYYY-MM-DD")
+                email, curp = _value(row, "client_email"), _value(row, "client_curp")
+                if not email and not curp:
+                    raise RejectedRow("Missing client (client_email or client_curp)")
+                if email:
+                    client_emails.add(email.lower())
+                if curp:
+                    client_curps.add(curp.upper())
+                if _value(row, "file_key") and not _value(row, "document_title"):
+                    raise RejectedRow("file_key given without document_title")
+                parsed.append((line_number, row, values, email, curp))
+            except RejectedRow as e:
+                rejects.append((line_number, row, e))
+        if not parsed:
+            return 0, 0, rejects, None
+
+        clients = db_session.query(Client.id, Client.email, Client.curp).filter(
+            or_(Client.email.in_(client_emails), Client.curp.in_(client_curps))
+        ).all()
+        by_email = {email.lower(): client_id for client_id, email, _ in clients}
+        by_curp = {curp.upper(): client_id for client_id, _, curp in clients}
+
+        plain, with_documents = [], []
+        for line_number, row, values, email, curp in parsed:
+            client_id = (email and by_email.get(email.lower())) or (curp and by_curp.get(curp.upper()))
+            if not client_id:
+                rejects.append((line_number, row, "Unknown client, import clients first"))
+                continue
+            values["client_id"] = client_id
+            (with_documents if _value(row, "file_key") else plain).append((line_number, row, values))
+
+        if plain:
+            db_session.execute(insert(Case), [values for _, _, values in plain])
+
+        # Cases with a document need their id, so they are inserted through the ORM.
+        # The documents are written once the cases are committed.
+        after_commit = None
+        if with_documents:
+            cases = [Case(**values) for _, _, values in with_documents]
+            db_session.add_all(cases)
+            db_session.flush()
+            documents = [(line_number, row, case.id, case.client_id, case.worker_id)
+                         for (line_number, row, _), case in zip(with_documents, cases)]
+            after_commit = lambda: self.record_documents(documents)
+        return len(plain) + len(with_documents), 0, rejects, after_commit
+
+    def record_documents(self, rows):
+        now = datetime.utcnow()
+        documents = []
+        references = {}
+        for _, row, case_id, client_id, worker_id in rows:
+            file_key = _value(row, "file_key")
+            tags = _value(row, "document_tags")
+            document = {
+                "case_id": case_id,
+                "client_id": client_id,
+                "worker_id": worker_id,
+                "document_title": _value(row, "document_title"),
+                "document_description": _value(row, "document_description"),
+                "file_url": file_url_for_key(file_key),
+                "file_key": file_key,
+                "file_name": _value(row, "file_name") or os.path.basename(file_key),
+                "uploaded_by": "Import",
+                "uploaded_at": now,
+                "last_modified": now,
+                "file_type": _value(row, "file_type") or "application/octet-stream",
+                "document_tags": [tag.strip() for tag in tags.split(";") if tag.strip()] if tags else [],
+            }
+            # Content-addressed files are shared, take a reference like an upload does
+            if file_key.startswith(CONTENT_ADDRESSED_PREFIX):
+                digest = file_key[len(CONTENT_ADDRESSED_PREFIX):]
+                document["content_hash"] = digest
+                references[digest] = references.get(digest, 0) + 1
+            documents.append(document)
+
+        db = get_mongo_db()
+        try:
+            if references:
+                db.blobs.bulk_write([
+                    UpdateOne({"_id": digest}, {"$inc": {"ref_count": count},
+                                                "$setOnInsert": {"key": CONTENT_ADDRESSED_PREFIX + digest, "created_at": now}}, upsert=True)
+                    for digest, count in references.items()
+                ])
+            db.documents.insert_many(documents)
+        except PyMongoError as e:
+            for line_number, row, case_id, _, _ in rows:
+                self.reject(line_number, row, f"Case {case_id} was imported but its document was not recorded: {e}")
+
+
+IMPORTERS = {"clients": ClientImporter, "cases": CaseImporter}
+
+
+def import_file(kind, path, batch_size=1000, file_format=None, rejects_path=None):
+    """
+    Imports a clients or cases file.
+
+    Returns:
+        dict: Row counts (rows, inserted, updated, rejected).
+    """
+    rows = read_rows(path, file_format)
+    importer = IMPORTERS[kind](kind, rejects_path or f"{path}.rejects.jsonl", batch_size)
+    try:
+        importer.run(rows)
+    finally:
+        importer.close()
+    # Imported rows can appear in any case list or document list
+    invalidate_all()
+    return importer.counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import clients or cases from a CSV or JSONL file.")
+    parser.add_argument("kind", choices=sorted(IMPORTERS))
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="Default: from the file extension")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows per transaction (default 1000)")
+    parser.add_argument("--rejects", help="Where to write rejected rows (default <path>.rejects.jsonl)")
+    args = parser.parse_args()
+    try:
+        counts = import_file(args.kind, args.path, args.batch_size, args.format, args.rejects)
+    finally:
+        close_tunnels()
+    sys.exit(1 if counts["rejected"] else 0)
@@ -0,0 +1,42 @@
+"""
+Moves soft-deleted cases into case_history/client_history and removes their
+documents, in batches. Run it from cron, or as a long-running process:
+
+    python database/run_archiver.py --once
+    python database/run_archiver.py --interval 300
+
+Alternatively set ARCHIVER_ENABLED=true to run it in a thread of the app.
+"""
+import sys
+import os
+
+# Calculate the path to the project root directory and add it to sys.path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(project_root)
+
+import argparse
+import logging
+import time
+from config import close_tunnels
+from services.archiver_service import archive_deleted_cases, run_forever, ARCHIVE_BATCH_SIZE, ARCHIVER_INTERVAL
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive soft-deleted cases.")
+    parser.add_argument("--once", action="store_true", help="Archive everything pending, then exit")
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE, help="Cases per transaction")
+    parser.add_argument("--interval", type=float, default=ARCHIVER_INTERVAL, help="Seconds between runs")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    try:
+        if args.once:
+            started = time.perf_counter()
+            archived = archive_deleted_cases(args.batch_size)
+            print(f"Archived {archived} cases in {time.perf_counter() - started:.1f}s")
+        else:
+            run_forever(args.interval, args.batch_size)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        close_tunnels()
@@ -1,8 +1,16 @@
-from sqlalchemy import Column, Integer, String, Text, TIMESTAMP, ForeignKey, func
+# models/case_history_model.py
+from sqlalchemy import Column, Integer, String, Text, TIMESTAMP, func, Index, DDL, event
 from config import Base
 
 class CaseHistory(Base):
     __tablename__ = 'case_history'
+    __table_args__ = (
+        # Per case/client/worker history lookups, and range scans by archive date
+        Index('ix_case_history_case_id_archived_at', 'case_id', 'archived_at'),
+        Index('ix_case_history_client_id_archived_at', 'client_id', 'archived_at'),
+        Index('ix_case_history_worker_id_archived_at', 'worker_id', 'archived_at'),
+        Index('ix_case_history_archived_at', 'archived_at'),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     case_id = Column(Integer, nullable=False)
@@ -14,7 +22,20 @@ class CaseHistory(Base):
     case_type = Column(String(50), nullable=True)
     court_date = Column(TIMESTAMP, nullable=True)
     judge_name = Column(String(100), nullable=True)
-    archived_at = Column(TIMESTAMP, server_default=func.now())
+    archived_at = Column(TIMESTAMP, nullable=False, server_default=func.now())
 
     def __repr__(self):
         return f"<CaseHistory(id={self.id}, case_title='{self.case_title}', archived_at={self.archived_at})>"
+
+
+# On MySQL the table is range-partitioned by archived_at (monthly partitions are
+# added, compacted and moved to cold storage by services/history_retention_service.py).
+# Every unique key must contain the partitioning column, so the primary key becomes
+# (id, archived_at) there; other databases keep the plain id key.
+event.listen(CaseHistory.__table__, "after_create", DDL(
+    "ALTER TABLE case_history DROP PRIMARY KEY, ADD PRIMARY KEY (id, archived_at)"
+).execute_if(dialect="mysql"))
+event.listen(CaseHistory.__table__, "after_create", DDL(
+    "ALTER TABLE case_history PARTITION BY RANGE (UNIX_TIMESTAMP(archived_at)) "
+    "(PARTITION p_future VALUES LESS THAN MAXVALUE)"
+).execute_if(dialect="mysql"))
@@ -1,11 +1,27 @@
 # models/case_model.py
-from sqlalchemy import Column, Integer, String, Date, ForeignKey, TIMESTAMP, func, Text
+from sqlalchemy import Column, Integer, String, Date, ForeignKey, TIMESTAMP, func, Text, Index, Boolean, false
 from sqlalchemy.orm import relationship
 from config import Base
 
 class Case(Base):
     __tablename__ = 'cases'
-    
+    __table_args__ = (
+        # Keyset pagination indexes for the dashboard, see services/case_service.py
+        Index('ix_cases_created_at_id', 'created_at', 'id'),
+        Index('ix_cases_worker_created_at_id', 'worker_id', 'created_at', 'id'),
+        Index('ix_cases_court_date_id', 'court_date', 'id'),
+        Index('ix_cases_worker_court_date_id', 'worker_id', 'court_date', 'id'),
+        Index('ix_cases_status_id', 'case_status', 'id'),
+        Index('ix_cases_worker_status_id', 'worker_id', 'case_status', 'id'),
+        # Full-text search, see services/search_service.py (a plain index elsewhere than MySQL)
+        Index('ft_cases_title_description_judge', 'case_title', 'case_description', 'judge_name', mysql_prefix='FULLTEXT'),
+        # Soft-deleted cases waiting for the archiver, see services/archiver_service.py
+        Index('ix_cases_is_deleted_id', 'is_deleted', 'id'),
+        # Dashboard ETag (newest change per scope), see services/page_version_service.py
+        Index('ix_cases_updated_at', 'updated_at'),
+        Index('ix_cases_worker_updated_at', 'worker_id', 'updated_at'),
+    )
+
     id = Column(Integer, primary_key=True)
     client_id = Column(Integer, ForeignKey('clients.id'), nullable=False)
     worker_id = Column(Integer, ForeignKey('workers.id'), nullable=False)
@@ -17,6 +33,8 @@ class Case(Base):
     judge_name = Column(String(100))
     created_at = Column(TIMESTAMP, server_default=func.now())
     updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
+    is_deleted = Column(Boolean, nullable=False, default=False, server_default=false())
+    deleted_at = Column(TIMESTAMP, nullable=True)
 
     client = relationship("Client")
     worker = relationship("Worker")
\ No newline at end of file
@@ -0,0 +1,49 @@
+# models/case_repository.py
+from sqlalchemy import false
+from sqlalchemy.orm import joinedload, selectinload, raiseload
+from models.case_model import Case
+from models.client_model import Client
+
+# Named loading profiles. Every relationship a page uses is loaded up front and
+# any other lazy load raises, so a page never issues one query per row and
+# cases stay usable after their session is closed.
+DASHBOARD_LIST = "dashboard_list"
+CASE_DETAIL = "case_detail"
+CASE_DELETE = "case_delete"
+
+# Soft-deleted cases stay in the table until the archiver moves them to
+# case_history, every query for live cases must exclude them
+LIVE_CASES = Case.is_deleted == false()
+
+LOADING_PROFILES = {
+    # One extra SELECT ... IN for the clients of the whole page
+    DASHBOARD_LIST: (
+        selectinload(Case.client).load_only(Client.id, Client.name, Client.last_name),
+        raiseload('*'),
+    ),
+    # Single query with the client and assigned worker joined in
+    CASE_DETAIL: (
+        joinedload(Case.client),
+        joinedload(Case.worker),
+        raiseload('*'),
+    ),
+    # Only the row itself, it is flagged and left for the archiver
+    CASE_DELETE: (
+        raiseload('*'),
+    ),
+}
+
+
+def case_query(db_session, profile):
+    """
+    Returns a query for live (not soft-deleted) cases with the given loading profile applied.
+    """
+    return db_session.query(Case).options(*LOADING_PROFILES[profile]).filter(LIVE_CASES)
+
+
+def get_case(db_session, case_id, profile=CASE_DETAIL):
+    """
+    Returns the case with the given id loaded for the given profile, or None.
+    """
+    return case_query(db_session, profile).filter(Case.id == case_id).one_or_none()
+
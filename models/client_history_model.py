@@ -1,8 +1,13 @@
-from sqlalchemy import Column, Integer, String, Text, TIMESTAMP, func
+# models/client_history_model.py
+from sqlalchemy import Column, Integer, String, Text, TIMESTAMP, func, Index, DDL, event
 from config import Base
 
 class ClientHistory(Base):
     __tablename__ = 'client_history'
+    __table_args__ = (
+        Index('ix_client_history_client_id_archived_at', 'client_id', 'archived_at'),
+        Index('ix_client_history_archived_at', 'archived_at'),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     client_id = Column(Integer, nullable=False)
@@ -14,7 +19,17 @@ class ClientHistory(Base):
     phone = Column(String(25), nullable=False)
     address = Column(Text, nullable=True)
     curp = Column(String(20), nullable=True)
-    archived_at = Column(TIMESTAMP, server_default=func.now())
+    archived_at = Column(TIMESTAMP, nullable=False, server_default=func.now())
 
     def __repr__(self):
-        return f"<ClientHistory(id={self.id}, name='{self.name}', archived_at={self.archived_at})>"
\ No newline at end of file
+        return f"<ClientHistory(id={self.id}, name='{self.name}', archived_at={self.archived_at})>"
+
+
+# Partitioned like case_history, see models/case_history_model.py
+event.listen(ClientHistory.__table__, "after_create", DDL(
+    "ALTER TABLE client_history DROP PRIMARY KEY, ADD PRIMARY KEY (id, archived_at)"
+).execute_if(dialect="mysql"))
+event.listen(ClientHistory.__table__, "after_create", DDL(
+    "ALTER TABLE client_history PARTITION BY RANGE (UNIX_TIMESTAMP(archived_at)) "
+    "(PARTITION p_future VALUES LESS THAN MAXVALUE)"
+).execute_if(dialect="mysql"))
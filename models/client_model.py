@@ -1,9 +1,13 @@
 # models/client_model.py
-from sqlalchemy import Column, Integer, String, Text, TIMESTAMP, func
+from sqlalchemy import Column, Integer, String, Text, TIMESTAMP, func, Index
 from config import Base
 
 class Client(Base):
     __tablename__ = 'clients'
+    __table_args__ = (
+        # Newest client change, part of the dashboard ETag
+        Index('ix_clients_updated_at', 'updated_at'),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String(100), nullable=False)
@@ -0,0 +1,157 @@
+# services/archiver_service.py
+
+import logging
+import os
+import threading
+import time
+from sqlalchemy import select, insert, delete, func, true
+from config import SessionLocal
+from models.case_model import Case
+from models.client_model import Client
+from models.case_history_model import CaseHistory
+from models.client_history_model import ClientHistory
+from services.document_service import delete_documents_for_cases, retry_failed_file_deletes
+from services.fragment_cache_service import invalidate, case_namespace
+
+# delete_case only flags a case, this job moves flagged cases into the history
+# tables and removes their documents, ARCHIVE_BATCH_SIZE cases per transaction
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+ARCHIVER_INTERVAL = float(os.getenv("ARCHIVER_INTERVAL", "60"))
+# Run the archiver in a thread of each app process (otherwise run database/run_archiver.py)
+ARCHIVER_ENABLED = os.getenv("ARCHIVER_ENABLED", "false").strip().lower() in ("1", "true", "yes", "on")
+
+CASE_HISTORY_COLUMNS = ("case_id", "client_id", "worker_id", "case_title", "case_description",
+                        "case_status", "case_type", "court_date", "judge_name", "archived_at")
+CLIENT_HISTORY_COLUMNS = ("client_id", "name", "second_name", "last_name", "second_last_name",
+                          "email", "phone", "address", "curp", "archived_at")
+
+_archiver_thread = None
+_archiver_pid = None
+_archiver_lock = threading.Lock()
+_wake = threading.Event()
+
+
+def archive_batch(db_session, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Archives one batch of soft-deleted cases in a single transaction:
+
+    1. removes their documents from MongoDB and the Space (idempotent, so a
+       batch that fails later is simply retried),
+    2. copies the cases into case_history with one INSERT ... SELECT,
+    3. snapshots clients left without live cases into client_history (keeping
+       one archived copy per client),
+    4. deletes the cases.
+
+    Returns:
+        int: Number of cases archived, 0 when nothing is left.
+    """
+    # SKIP LOCKED lets several archivers (one per app process) share the work on MySQL
+    case_ids = db_session.scalars(
+        select(Case.id).where(Case.is_deleted == true()).order_by(Case.id).limit(batch_size)
+        .with_for_update(skip_locked=True)
+    ).all()
+    if not case_ids:
+        db_session.rollback()
+        return 0
+
+    failed_files = delete_documents_for_cases(case_ids)
+    for file_path, error in failed_files.items():
+        logging.error(f"Failed to delete file {file_path} from DigitalOcean Spaces: {error}")
+
+    # The database clock, like updated_at: the dashboard version compares both with its NOW()
+    archived_at = func.now()
+    db_session.execute(insert(CaseHistory).from_select(
+        CASE_HISTORY_COLUMNS,
+        select(Case.id, Case.client_id, Case.worker_id, Case.case_title, Case.case_description,
+               Case.case_status, Case.case_type, Case.court_date, Case.judge_name, archived_at)
+        .where(Case.id.in_(case_ids))
+    ))
+
+    # Clients whose every remaining case is in this batch
+    client_ids = set(db_session.scalars(select(Case.client_id).where(Case.id.in_(case_ids)).distinct()))
+    still_active = set(db_session.scalars(
+        select(Case.client_id).where(Case.client_id.in_(client_ids), Case.id.not_in(case_ids)).distinct()
+    ))
+    orphaned = client_ids - still_active
+    if orphaned:
+        db_session.execute(delete(ClientHistory).where(ClientHistory.client_id.in_(orphaned)))
+        db_session.execute(insert(ClientHistory).from_select(
+            CLIENT_HISTORY_COLUMNS,
+            select(Client.id, Client.name, Client.second_name, Client.last_name, Client.second_last_name,
+                   Client.email, Client.phone, Client.address, Client.curp, archived_at)
+            .where(Client.id.in_(orphaned))
+        ))
+
+    db_session.execute(delete(Case).where(Case.id.in_(case_ids)))
+    db_session.commit()
+    # The case lists were invalidated when the cases were flagged, their pages may still be cached
+    invalidate(*(case_namespace(case_id) for case_id in case_ids))
+    logging.info(f"Archived {len(case_ids)} cases and {len(orphaned)} clients.")
+    return len(case_ids)
+
+
+def archive_deleted_cases(batch_size=ARCHIVE_BATCH_SIZE, max_batches=None):
+    """
+    Archives soft-deleted cases batch by batch until none are left, then retries
+    file deletions that failed earlier.
+
+    Returns:
+        int: Number of cases archived.
+    """
+    total = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        with SessionLocal() as db_session:
+            archived = archive_batch(db_session, batch_size)
+        if not archived:
+            break
+        total += archived
+        batches += 1
+    failures = retry_failed_file_deletes()
+    if failures:
+        logging.warning(f"{len(failures)} file deletions are still failing, they will be retried on the next run.")
+    return total
+
+
+def request_archive():
+    """
+    Wakes this process's archiver thread, if ARCHIVER_ENABLED, so a deleted case is archived right away.
+    """
+    if ARCHIVER_ENABLED:
+        start_archiver_thread()
+        _wake.set()
+
+
+def _run_archiver(interval):
+    while True:
+        try:
+            archive_deleted_cases()
+        except Exception as e:
+            logging.error(f"Archiver run failed: {e}")
+        _wake.wait(interval)
+        _wake.clear()
+
+
+def start_archiver_thread(interval=ARCHIVER_INTERVAL):
+    """
+    Starts the archiver in a daemon thread of this process. Threads do not
+    survive a fork, so a forked worker starts its own on its first request_archive().
+    """
+    global _archiver_thread, _archiver_pid
+    with _archiver_lock:
+        if _archiver_thread is not None and _archiver_pid == os.getpid() and _archiver_thread.is_alive():
+            return
+        _archiver_thread = threading.Thread(target=_run_archiver, args=(interval,), name="case-archiver", daemon=True)
+        _archiver_thread.start()
+        _archiver_pid = os.getpid()
+
+
+def run_forever(interval=ARCHIVER_INTERVAL, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Runs the archiver in the foreground until interrupted.
+    """
+    while True:
+        started = time.perf_counter()
+        archived = archive_deleted_cases(batch_size)
+        print(f"Archived {archived} cases in {time.perf_counter() - started:.1f}s")
+        time.sleep(interval)
@@ -0,0 +1,447 @@
+# services/backup_service.py
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError
+from config import get_database_url, get_mongo_uri, get_engine, get_mongo_client, MONGO_DB_NAME
+
+# A full backup is a consistent mysqldump plus a mongodump archive, both gzipped
+# while they stream. An incremental backup holds the MySQL binary logs and the
+# MongoDB oplog entries written since the previous backup, so restoring means
+# loading one full backup then replaying its incrementals in order.
+BACKUP_DIR = os.getenv("BACKUP_DIR", "backups")
+BACKUP_KEEP_FULL = int(os.getenv("BACKUP_KEEP_FULL", "7"))  # Full backups (and their incrementals) kept by rotation
+BACKUP_COMPRESSION_LEVEL = int(os.getenv("BACKUP_COMPRESSION_LEVEL", "6"))
+COPY_CHUNK_SIZE = 1024 * 1024
+MANIFEST_NAME = "manifest.json"
+
+MYSQL_DUMP_FILE = "mysql.sql.gz"
+MONGO_DUMP_FILE = "mongo.archive.gz"
+OPLOG_FILE = "oplog.bson.gz"
+BINLOG_FOLDER = "binlog"
+
+# mysqldump --source-data=2 (--master-data=2 before 8.0.26 and on MariaDB) writes the
+# binlog coordinates of the snapshot as a comment near the top
+SOURCE_DATA_SINCE = (8, 0, 26)
+_BINLOG_COORDINATES = re.compile(
+    rb"(?:MASTER|SOURCE)_LOG_FILE='([^']+)',\s*(?:MASTER|SOURCE)_LOG_POS=(\d+)"
+)
+_HEAD_BYTES = 64 * 1024
+
+
+class _HashingWriter:
+    """
+    File-like wrapper that hashes and counts the bytes as they are written.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self.hasher = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.hasher.update(data)
+        self.size += len(data)
+        return self._stream.write(data)
+
+    def flush(self):
+        self._stream.flush()
+
+
+def _file_info(writer):
+    return {"sha256": writer.hasher.hexdigest(), "bytes": writer.size}
+
+
+def mysql_client_args():
+    """
+    Returns the connection arguments shared by the MySQL command line tools and
+    an environment carrying the password (kept out of the process list).
+    """
+    url = make_url(get_database_url())
+    args = [
+        "--protocol=TCP",
+        f"--host={url.host or '127.0.0.1'}",
+        f"--port={url.port or 3306}",
+        f"--user={url.username}",
+    ]
+    env = dict(os.environ, MYSQL_PWD=url.password or "")
+    return args, env, url.database
+
+
+def _compress_command_output(command, path, env=None, keep_head=False):
+    """
+    Runs a command and gzips its standard output into path as it streams.
+
+    Returns:
+        tuple: (file info with sha256 and size, first bytes of the uncompressed output if keep_head)
+
+    Raises:
+        RuntimeError: If the command fails.
+    """
+    stderr_lines = []
+
+    def drain(stream):
+        for line in stream:
+            stderr_lines.append(line.decode(errors="replace").rstrip())
+            del stderr_lines[:-20]
+
+    head = b""
+    with open(path, "wb") as raw, subprocess.Popen(
+        command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env
+    ) as process:
+        stderr_thread = threading.Thread(target=drain, args=(process.stderr,), daemon=True)
+        stderr_thread.start()
+        writer = _HashingWriter(raw)
+        with gzip.GzipFile(fileobj=writer, mode="wb", compresslevel=BACKUP_COMPRESSION_LEVEL) as compressed:
+            while True:
+                chunk = process.stdout.read(COPY_CHUNK_SIZE)
+                if not chunk:
+                    break
+                if keep_head and len(head) < _HEAD_BYTES:
+                    head += chunk[:_HEAD_BYTES - len(head)]
+                compressed.write(chunk)
+        returncode = process.wait()
+        stderr_thread.join()
+    if returncode != 0:
+        raise RuntimeError(f"{command[0]} exited with {returncode}: {' | '.join(stderr_lines[-5:])}")
+    return _file_info(writer), head
+
+
+def _compress_file(source, path):
+    """
+    Gzips a file into path.
+
+    Returns:
+        dict: File info with sha256 and size.
+    """
+    with open(source, "rb") as original, open(path, "wb") as raw:
+        writer = _HashingWriter(raw)
+        with gzip.GzipFile(fileobj=writer, mode="wb", compresslevel=BACKUP_COMPRESSION_LEVEL) as compressed:
+            shutil.copyfileobj(original, compressed, COPY_CHUNK_SIZE)
+    return _file_info(writer)
+
+
+def hash_file(path):
+    """
+    Returns the sha256 hex digest of a file.
+    """
+    hasher = hashlib.sha256()
+    with open(path, "rb") as stream:
+        while True:
+            chunk = stream.read(COPY_CHUNK_SIZE)
+            if not chunk:
+                break
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+# MySQL
+
+def binlog_status():
+    """
+    Returns the current binary log coordinates, {"file": ..., "position": ...}.
+
+    Raises:
+        RuntimeError: If binary logging is disabled.
+    """
+    with get_engine().connect() as connection:
+        # SHOW MASTER STATUS was renamed in MySQL 8.4
+        for statement in ("SHOW BINARY LOG STATUS", "SHOW MASTER STATUS"):
+            try:
+                row = connection.execute(text(statement)).mappings().first()
+            except DBAPIError:
+                continue
+            if row:
+                return {"file": row["File"], "position": int(row["Position"])}
+    raise RuntimeError("Binary logging is disabled on the MySQL server (log_bin), incremental backups need it.")
+
+
+def binlog_files():
+    """
+    Returns the binary log files still on the server, oldest first.
+    """
+    with get_engine().connect() as connection:
+        return [row[0] for row in connection.execute(text("SHOW BINARY LOGS"))]
+
+
+def mysqldump_version():
+    """
+    Returns the version of the installed mysqldump and whether it is MariaDB's.
+
+    Returns:
+        tuple: ((major, minor, patch) or None if it cannot be read, is_mariadb)
+    """
+    output = subprocess.run(["mysqldump", "--version"], capture_output=True, text=True).stdout
+    # "Ver 8.0.36 for Linux", or "Ver 10.13 Distrib 5.7.44," before 8.0 and on MariaDB
+    match = re.search(r"Distrib (\d+)\.(\d+)\.(\d+)", output) or re.search(r"Ver (\d+)\.(\d+)\.(\d+)", output)
+    version = tuple(int(part) for part in match.groups()) if match else None
+    return version, "MariaDB" in output
+
+
+def _mysqldump_options():
+    """
+    Returns the mysqldump options recording the binlog coordinates of the
+    snapshot, none if binary logging is off (the dump would fail), and turning
+    off the GTID statement where the client knows it.
+    """
+    version, mariadb = mysqldump_version()
+    options = [] if mariadb else ["--set-gtid-purged=OFF"]
+    try:
+        binlog_status()
+    except RuntimeError:
+        print("Binary logging is off, the dump records no binlog coordinates.")
+        return options
+    if mariadb or (version is not None and version < SOURCE_DATA_SINCE):
+        return ["--master-data=2", *options]
+    return ["--source-data=2", *options]
+
+
+def dump_mysql(directory):
+    """
+    Dumps the database with mysqldump --single-transaction (a consistent
+    snapshot without locking the tables) and gzips it while it streams.
+
+    Returns:
+        tuple: (files written, binlog coordinates of the snapshot or None if binary logging is off)
+    """
+    args, env, database = mysql_client_args()
+    command = [
+        "mysqldump", *args,
+        "--single-transaction", "--quick", "--routines", "--triggers", "--events", "--hex-blob",
+        *_mysqldump_options(),
+        database,
+    ]
+    info, head = _compress_command_output(command, os.path.join(directory, MYSQL_DUMP_FILE), env, keep_head=True)
+    match = _BINLOG_COORDINATES.search(head)
+    position = {"file": match.group(1).decode(), "position": int(match.group(2))} if match else None
+    return {MYSQL_DUMP_FILE: info}, {"database": database, "end": position}
+
+
+def capture_binlogs(directory, start):
+    """
+    Copies the binary logs from start to the current position off the server
+    with mysqlbinlog --read-from-remote-server --raw, gzipping each file.
+
+    Returns:
+        tuple: (files written, {"start": ..., "end": ...} coordinates)
+
+    Raises:
+        RuntimeError: If the logs since start were already purged from the server.
+    """
+    end = binlog_status()
+    available = binlog_files()
+    if start["file"] not in available:
+        raise RuntimeError(f"Binary log {start['file']} was purged from the server, take a full backup.")
+    needed = [name for name in available if start["file"] <= name <= end["file"]]
+
+    args, env, _ = mysql_client_args()
+    folder = os.path.join(directory, BINLOG_FOLDER)
+    os.makedirs(folder)
+    files = {}
+    with tempfile.TemporaryDirectory(dir=directory) as raw_folder:
+        command = ["mysqlbinlog", *args, "--read-from-remote-server", "--raw",
+                   f"--result-file={raw_folder}{os.sep}", *needed]
+        completed = subprocess.run(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        if completed.returncode != 0:
+            raise RuntimeError(f"mysqlbinlog exited with {completed.returncode}: {completed.stderr.decode(errors='replace')[-500:]}")
+        for name in needed:
+            relative = f"{BINLOG_FOLDER}/{name}.gz"
+            files[relative] = _compress_file(os.path.join(raw_folder, name), os.path.join(directory, relative))
+    return files, {"start": start, "end": end, "binlogs": needed}
+
+
+# MongoDB
+
+def oplog_timestamp(newest=True):
+    """
+    Returns the newest (or oldest) oplog entry timestamp as {"t": seconds, "i": increment}.
+
+    Raises:
+        RuntimeError: If the server has no oplog (not a replica set member).
+    """
+    entry = get_mongo_client().local["oplog.rs"].find_one({}, {"ts": 1}, sort=[("$natural", -1 if newest else 1)])
+    if entry is None:
+        raise RuntimeError("MongoDB has no oplog, run it as a replica set (rs.initiate()) for incremental backups.")
+    return {"t": entry["ts"].time, "i": entry["ts"].inc}
+
+
+def _timestamp_key(timestamp):
+    return timestamp["t"], timestamp["i"]
+
+
+def dump_mongo(directory):
+    """
+    Dumps the documents database as a mongodump archive, gzipped while it
+    streams. mongodump reads collections one after the other, so the oplog
+    position taken before it starts is recorded: replaying the oplog from
+    there (the operations are idempotent) makes the restore consistent.
+
+    Returns:
+        tuple: (files written, {"end": oplog timestamp or None without an oplog})
+    """
+    try:
+        start = oplog_timestamp()
+    except RuntimeError as e:
+        print(f"Warning: {e}")
+        start = None
+    command = ["mongodump", f"--uri={get_mongo_uri()}", f"--db={MONGO_DB_NAME}", "--archive"]
+    info, _ = _compress_command_output(command, os.path.join(directory, MONGO_DUMP_FILE))
+    return {MONGO_DUMP_FILE: info}, {"database": MONGO_DB_NAME, "end": start}
+
+
+def capture_oplog(directory, start):
+    """
+    Dumps the oplog entries of the documents database after start, up to the
+    current newest one, as gzipped BSON (the oplog.bson mongorestore --oplogReplay reads).
+
+    Returns:
+        tuple: (files written, {"start": ..., "end": ...} timestamps)
+
+    Raises:
+        RuntimeError: If the oplog no longer reaches back to start.
+    """
+    end = oplog_timestamp()
+    if _timestamp_key(oplog_timestamp(newest=False)) > _timestamp_key(start):
+        raise RuntimeError("The oplog rolled over since the previous backup, take a full backup.")
+    query = {
+        "ts": {"$gt": {"$timestamp": start}, "$lte": {"$timestamp": end}},
+        "ns": {"$regex": f"^{re.escape(MONGO_DB_NAME)}\\."},
+    }
+    # With a single collection, --out=- writes its BSON to stdout
+    command = ["mongodump", f"--uri={get_mongo_uri()}", "--db=local", "--collection=oplog.rs",
+               f"--query={json.dumps(query)}", "--out=-"]
+    info, _ = _compress_command_output(command, os.path.join(directory, OPLOG_FILE))
+    return {OPLOG_FILE: info}, {"start": start, "end": end}
+
+
+# Backups
+
+def list_backups(backup_dir=BACKUP_DIR):
+    """
+    Returns the manifests of the complete backups in backup_dir, oldest first.
+    """
+    if not os.path.isdir(backup_dir):
+        return []
+    manifests = []
+    for name in os.listdir(backup_dir):
+        if name.endswith(".partial"):
+            continue
+        path = os.path.join(backup_dir, name, MANIFEST_NAME)
+        if os.path.isfile(path):
+            with open(path, encoding="utf-8") as stream:
+                manifests.append(json.load(stream))
+    return sorted(manifests, key=lambda manifest: manifest["created_at"])
+
+
+def create_backup(kind="full", backup_dir=BACKUP_DIR):
+    """
+    Takes a full or incremental backup, MySQL and MongoDB in parallel. The
+    backup is written to <name>.partial and renamed once its manifest (with the
+    sha256 of every file) is written, so an interrupted run leaves no backup
+    that looks complete.
+
+    Args:
+        kind: "full", or "incremental" (continues from the newest backup).
+        backup_dir: Folder holding the backups.
+
+    Returns:
+        dict: The manifest of the new backup.
+    """
+    previous = None
+    if kind == "incremental":
+        backups = list_backups(backup_dir)
+        if not backups:
+            raise RuntimeError("There is no backup to continue from, take a full backup first.")
+        previous = backups[-1]
+        if previous["mysql"]["end"] is None or previous["mongo"]["end"] is None:
+            raise RuntimeError(f"{previous['name']} has no binlog/oplog position, take a full backup.")
+    elif kind != "full":
+        raise ValueError(f"Unknown backup kind {kind!r}")
+
+    created_at = datetime.now(timezone.utc)
+    name = f"{kind}-{created_at:%Y%m%dT%H%M%SZ}"
+    partial = os.path.join(backup_dir, f"{name}.partial")
+    os.makedirs(partial)
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            if previous is None:
+                mysql_job = pool.submit(dump_mysql, partial)
+                mongo_job = pool.submit(dump_mongo, partial)
+            else:
+                mysql_job = pool.submit(capture_binlogs, partial, previous["mysql"]["end"])
+                mongo_job = pool.submit(capture_oplog, partial, previous["mongo"]["end"])
+            mysql_files, mysql = mysql_job.result()
+            mongo_files, mongo = mongo_job.result()
+
+        manifest = {
+            "name": name,
+            "type": kind,
+            "created_at": created_at.isoformat(),
+            "seconds": round(time.perf_counter() - started, 3),
+            "base": name if previous is None else previous["base"],
+            "previous": previous["name"] if previous else None,
+            "mysql": mysql,
+            "mongo": mongo,
+            "files": {**mysql_files, **mongo_files},
+        }
+        with open(os.path.join(partial, MANIFEST_NAME), "w", encoding="utf-8") as stream:
+            json.dump(manifest, stream, indent=2)
+        os.rename(partial, os.path.join(backup_dir, name))
+    except BaseException:
+        shutil.rmtree(partial, ignore_errors=True)
+        raise
+    return manifest
+
+
+def verify_backup(name, backup_dir=BACKUP_DIR):
+    """
+    Checks every file of a backup against the sha256 and size in its manifest.
+
+    Returns:
+        list: Problems found, empty if the backup is intact.
+    """
+    folder = os.path.join(backup_dir, name)
+    with open(os.path.join(folder, MANIFEST_NAME), encoding="utf-8") as stream:
+        manifest = json.load(stream)
+    problems = []
+    for relative, expected in manifest["files"].items():
+        path = os.path.join(folder, relative)
+        if not os.path.isfile(path):
+            problems.append(f"{relative}: missing")
+        elif os.path.getsize(path) != expected["bytes"]:
+            problems.append(f"{relative}: {os.path.getsize(path)} bytes, expected {expected['bytes']}")
+        elif hash_file(path) != expected["sha256"]:
+            problems.append(f"{relative}: sha256 mismatch")
+    return problems
+
+
+def rotate_backups(keep_full=BACKUP_KEEP_FULL, backup_dir=BACKUP_DIR):
+    """
+    Deletes all but the newest keep_full full backups, along with the
+    incrementals that depend on the deleted ones.
+
+    Returns:
+        list: Names of the backups deleted.
+    """
+    backups = list_backups(backup_dir)
+    fulls = [manifest["name"] for manifest in backups if manifest["type"] == "full"]
+    kept = set(fulls[-keep_full:]) if keep_full > 0 else set(fulls)
+    deleted = []
+    for manifest in backups:
+        if manifest["base"] not in kept:
+            shutil.rmtree(os.path.join(backup_dir, manifest["name"]))
+            deleted.append(manifest["name"])
+    return deleted
@@ -0,0 +1,259 @@
+# services/case_service.py
+
+import base64
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from sqlalchemy import and_, or_
+from config import SessionLocal, get_mongo_db
+from models.case_model import Case
+from models.client_model import Client
+from models.case_repository import case_query, get_case, DASHBOARD_LIST, CASE_DETAIL
+from services.document_service import list_case_documents, store_document_file, release_blobs
+
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+
+# Threads shared by all requests for fetching from MySQL and MongoDB in parallel
+CASE_FETCH_THREADS = int(os.getenv("CASE_FETCH_THREADS", "8"))
+_fetch_pool = None
+_fetch_pool_pid = None
+_fetch_pool_lock = threading.Lock()
+
+# Sort key -> (column, descending, cursor value parser). Every sort is paired
+# with Case.id as a tie-breaker and backed by a (worker_id, column, id) index.
+SORT_OPTIONS = {
+    "created_at": (Case.created_at, True, datetime.fromisoformat),
+    "court_date": (Case.court_date, False, date.fromisoformat),
+    "status": (Case.case_status, False, str),
+}
+
+
+def encode_cursor(value, case_id):
+    """
+    Encodes the sort value and id of the last case on a page into an opaque token.
+    """
+    if isinstance(value, (date, datetime)):
+        value = value.isoformat()
+    payload = json.dumps({"v": value, "id": case_id}).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii')
+
+
+def decode_cursor(token, sort):
+    """
+    Decodes a cursor produced by encode_cursor.
+
+    Returns:
+        tuple: (sort value, case id), or None if the token is invalid.
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+        value = payload["v"]
+        if value is not None:
+            value = SORT_OPTIONS[sort][2](value)
+        return value, int(payload["id"])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def _after_cursor(column, descending, value, case_id):
+    # MySQL sorts NULLs first ascending and last descending, mirror that here
+    if descending:
+        if value is None:
+            return and_(column.is_(None), Case.id < case_id)
+        return or_(column < value, and_(column == value, Case.id < case_id), column.is_(None))
+    if value is None:
+        return or_(and_(column.is_(None), Case.id > case_id), column.isnot(None))
+    return or_(column > value, and_(column == value, Case.id > case_id))
+
+
+def scope_cases_for_user(query, user):
+    """
+    Restricts a Case query to what the user may see: admins see every case,
+    lawyers and assistants only the cases assigned to them.
+    """
+    if user.role == 'admin':
+        return query
+    return query.filter(Case.worker_id == user.id)
+
+
+def paginate_cases(db_session, user, sort="created_at", cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Returns one keyset page of the cases visible to the user.
+
+    Args:
+        db_session: SQLAlchemy session.
+        user: The logged-in Worker.
+        sort: One of SORT_OPTIONS (default: newest first).
+        cursor: Token from a previous page's next_cursor, or None for the first page.
+        page_size: Number of cases per page, capped at MAX_PAGE_SIZE.
+
+    Returns:
+        tuple: (list of cases, next_cursor or None when this is the last page)
+    """
+    if sort not in SORT_OPTIONS:
+        sort = "created_at"
+    page_size = max(1, min(page_size or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+    column, descending, _ = SORT_OPTIONS[sort]
+
+    query = scope_cases_for_user(case_query(db_session, DASHBOARD_LIST), user)
+    position = decode_cursor(cursor, sort) if cursor else None
+    if position is not None:
+        query = query.filter(_after_cursor(column, descending, *position))
+
+    if descending:
+        query = query.order_by(column.desc(), Case.id.desc())
+    else:
+        query = query.order_by(column.asc(), Case.id.asc())
+
+    # Fetch one extra row to know whether another page exists
+    cases = query.limit(page_size + 1).all()
+    next_cursor = None
+    if len(cases) > page_size:
+        cases = cases[:page_size]
+        last = cases[-1]
+        next_cursor = encode_cursor(getattr(last, column.key), last.id)
+    return cases, next_cursor
+
+
+def _get_fetch_pool():
+    global _fetch_pool, _fetch_pool_pid
+    # Threads do not survive a fork, so each worker process gets its own pool
+    if _fetch_pool is None or _fetch_pool_pid != os.getpid():
+        with _fetch_pool_lock:
+            if _fetch_pool is None or _fetch_pool_pid != os.getpid():
+                _fetch_pool = ThreadPoolExecutor(max_workers=CASE_FETCH_THREADS, thread_name_prefix="case-fetch")
+                _fetch_pool_pid = os.getpid()
+    return _fetch_pool
+
+
+def _submit_timed(timings, store, fn, *args):
+    def run():
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            timings[store] = time.perf_counter() - started
+    # Run in a copy of the caller's context so per-request state follows the work
+    return _get_fetch_pool().submit(contextvars.copy_context().run, run)
+
+
+def _load_case(case_id):
+    with SessionLocal() as db_session:
+        return get_case(db_session, case_id, CASE_DETAIL)
+
+
+def load_case_detail(user, case_id, with_documents=True):
+    """
+    Fetches a case from MySQL and its documents from MongoDB in parallel. The
+    documents are only returned once the user is known to have access to the case.
+
+    Args:
+        user: The logged-in Worker.
+        case_id: Id of the case.
+        with_documents: False skips MongoDB, e.g. when the document list is cached.
+
+    Returns:
+        tuple: (case, documents), or (None, []) if the case does not exist.
+        documents is None when with_documents is False.
+
+    Raises:
+        PermissionError: If the user may not view the case.
+    """
+    timings = {}
+    started = time.perf_counter()
+    case_future = _submit_timed(timings, "mysql", _load_case, case_id)
+    documents_future = _submit_timed(timings, "mongo", list_case_documents, case_id) if with_documents else None
+    try:
+        case = case_future.result()
+        if case is None:
+            return None, []
+        if user.role != 'admin' and case.worker_id != user.id:
+            raise PermissionError(f"Worker {user.id} may not view case {case_id}")
+        return case, documents_future.result() if documents_future else None
+    finally:
+        if documents_future:
+            documents_future.cancel()
+        logging.info(
+            f"Case {case_id} detail fetch: mysql {timings.get('mysql', 0) * 1000:.1f}ms, "
+            f"mongo {timings.get('mongo', 0) * 1000:.1f}ms, "
+            f"total {(time.perf_counter() - started) * 1000:.1f}ms"
+        )
+
+
+def create_case_with_document(db_session, form, uploaded_file=None, uploaded_by="Admin"):
+    """
+    Creates a case, its client (if new) and its first document with as few
+    round trips as possible: the file is stored first, the client and case are
+    inserted in one MySQL transaction, the document is written once with the
+    final case id, and only then is the transaction committed. If a later step
+    fails, the earlier ones are compensated (document removed, file released).
+
+    Args:
+        db_session: SQLAlchemy session, rolled back on failure.
+        form: Validated CaseForm.
+        uploaded_file: Optional Werkzeug FileStorage for the document.
+        uploaded_by: Value stored in the document's uploaded_by field.
+
+    Returns:
+        Case: The committed case.
+    """
+    # Upload before opening the transaction so no locks are held during the transfer
+    file_fields = store_document_file(uploaded_file) if uploaded_file else {"file_url": None}
+    document_id = None
+    try:
+        client = db_session.query(Client).filter_by(email=form.client_email.data).first()
+        if not client:
+            client = Client(
+                name=form.client_name.data,
+                second_name=form.client_second_name.data,
+                last_name=form.client_last_name.data,
+                second_last_name=form.client_second_last_name.data,
+                email=form.client_email.data,
+                phone=form.client_phone.data,
+                curp=form.client_curp.data,
+                address=form.client_address.data
+            )
+            db_session.add(client)
+
+        new_case = Case(
+            client=client,
+            worker_id=form.lawyer_id.data,
+            case_title=form.case_title.data,
+            case_description=form.case_description.data,
+            case_type=form.case_type.data,
+            court_date=form.court_date.data,
+            judge_name=form.judge_name.data
+        )
+        db_session.add(new_case)
+        db_session.flush()  # INSERTs the client and case, assigning their ids inside the transaction
+
+        now = datetime.utcnow()
+        document_id = get_mongo_db().documents.insert_one({
+            "case_id": new_case.id,
+            "client_id": client.id,
+            "worker_id": form.lawyer_id.data,
+            "document_title": form.document_title.data,
+            "document_description": form.document_description.data,
+            **file_fields,
+            "uploaded_by": uploaded_by,
+            "uploaded_at": now,
+            "last_modified": now,
+            "file_type": uploaded_file.content_type if uploaded_file else "application/octet-stream",
+            "document_tags": ["tag1", "tag2"]
+        }).inserted_id
+
+        db_session.commit()
+        return new_case
+    except Exception:
+        db_session.rollback()
+        if document_id is not None:
+            get_mongo_db().documents.delete_one({"_id": document_id})
+        if file_fields.get("content_hash"):
+            release_blobs([file_fields["content_hash"]])
+        raise
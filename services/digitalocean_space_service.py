@@ -1,73 +1,299 @@
 import os
-import boto3
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
 from botocore.exceptions import NoCredentialsError, ClientError
-from werkzeug.utils import secure_filename
 
 # Load DigitalOcean Spaces credentials from environment variables
 DO_SPACE_ACCESS_KEY = os.getenv("DO_SPACE_ACCESS_KEY")
 DO_SPACE_SECRET_KEY = os.getenv("DO_SPACE_SECRET_KEY")
-DO_SPACE_REGION = "nyc3"  # Adjust if you created it in a different region
-DO_SPACE_NAME = "law-firm-documenting-storage"  # Your Space name
-DO_SPACE_ENDPOINT = f"https://{DO_SPACE_REGION}.digitaloceanspaces.com"
+DO_SPACE_REGION = os.getenv("DO_SPACE_REGION", "nyc3")  # Adjust if you created it in a different region
+DO_SPACE_NAME = os.getenv("DO_SPACE_NAME", "law-firm-documenting-storage")  # Your Space name
+# Point DO_SPACE_ENDPOINT at a local S3 stand-in (MinIO, moto server) for testing
+DO_SPACE_ENDPOINT = os.getenv("DO_SPACE_ENDPOINT", f"https://{DO_SPACE_REGION}.digitaloceanspaces.com")
+MAX_DELETE_BATCH = 1000  # Keys per DeleteObjects request, the S3 API limit
 
-# Initialize the boto3 client
-s3_client = boto3.client(
-    's3',
-    region_name=DO_SPACE_REGION,
-    endpoint_url=DO_SPACE_ENDPOINT,
-    aws_access_key_id=DO_SPACE_ACCESS_KEY,
-    aws_secret_access_key=DO_SPACE_SECRET_KEY
-)
+# Multipart upload tuning, sizes in MB
+SPACES_MULTIPART_THRESHOLD = int(os.getenv("SPACES_MULTIPART_THRESHOLD", "8"))
+SPACES_MULTIPART_CHUNKSIZE = int(os.getenv("SPACES_MULTIPART_CHUNKSIZE", "8"))
+SPACES_MAX_CONCURRENCY = int(os.getenv("SPACES_MAX_CONCURRENCY", "8"))
 
-def upload_file_to_space(file, folder="documents"):
+# Presigned download URLs, seconds. Cached URLs are handed out until
+# PRESIGNED_URL_REFRESH seconds before they expire.
+PRESIGNED_URL_TTL = int(os.getenv("PRESIGNED_URL_TTL", "900"))
+PRESIGNED_URL_REFRESH = int(os.getenv("PRESIGNED_URL_REFRESH", "60"))
+PRESIGNED_URL_CACHE_SIZE = 4096
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Upload totals for throughput reporting
+upload_stats = {"uploads": 0, "bytes": 0, "seconds": 0.0}
+_upload_stats_lock = threading.Lock()
+
+# Called with each new boto3 client, e.g. to register event handlers on it
+s3_client_hooks = []
+
+_presigned_urls = OrderedDict()  # (path, file name) -> (expires_at, url)
+_presigned_urls_lock = threading.Lock()
+
+# The boto3 client is built on first use and rebuilt in forked workers
+_s3_client = None
+_s3_client_pid = None
+_s3_client_lock = threading.Lock()
+
+
+def get_s3_client():
+    """
+    Returns the boto3 client for the Space, creating it on first use.
     """
-    Uploads a file to DigitalOcean Spaces and returns the file's public URL.
+    global _s3_client, _s3_client_pid
+    if _s3_client is None or _s3_client_pid != os.getpid():
+        with _s3_client_lock:
+            if _s3_client is None or _s3_client_pid != os.getpid():
+                import boto3  # Deferred, importing boto3 alone costs a noticeable part of startup
+
+                _s3_client = boto3.client(
+                    's3',
+                    region_name=DO_SPACE_REGION,
+                    endpoint_url=DO_SPACE_ENDPOINT,
+                    aws_access_key_id=DO_SPACE_ACCESS_KEY,
+                    aws_secret_access_key=DO_SPACE_SECRET_KEY
+                )
+                for hook in s3_client_hooks:
+                    hook(_s3_client)
+                _s3_client_pid = os.getpid()
+    return _s3_client
+
+def _transfer_config():
+    from boto3.s3.transfer import TransferConfig
+
+    return TransferConfig(
+        multipart_threshold=SPACES_MULTIPART_THRESHOLD * 1024 * 1024,
+        multipart_chunksize=SPACES_MULTIPART_CHUNKSIZE * 1024 * 1024,
+        max_concurrency=SPACES_MAX_CONCURRENCY,
+        use_threads=True
+    )
+
+def upload_stream_to_space(stream, file_path, content_type=None, extra_args=None):
+    """
+    Streams a file-like object to DigitalOcean Spaces. Large files are sent as
+    concurrent multipart uploads, read chunk by chunk instead of all at once.
 
     Args:
-        file: File object to upload.
-        folder: Folder name inside the Space (default: "documents").
+        stream: Readable binary file-like object.
+        file_path: Path of the file inside the Space.
+        content_type: Optional MIME type stored with the object.
+        extra_args: Optional extra arguments for the upload (e.g. Metadata).
+
+    Returns:
+        dict: Bytes sent, seconds taken and throughput in MB/s.
+    """
+    args = dict(extra_args or {})
+    if content_type:
+        args["ContentType"] = content_type
+
+    sent = [0]
+    sent_lock = threading.Lock()
+
+    def on_progress(chunk_bytes):
+        # Called from the transfer threads
+        with sent_lock:
+            sent[0] += chunk_bytes
+
+    started = time.perf_counter()
+    get_s3_client().upload_fileobj(
+        stream,
+        DO_SPACE_NAME,
+        file_path,
+        ExtraArgs=args,
+        Config=_transfer_config(),
+        Callback=on_progress
+    )
+    seconds = time.perf_counter() - started
+    mbps = sent[0] / (1024 * 1024) / seconds if seconds > 0 else 0.0
+    with _upload_stats_lock:
+        upload_stats["uploads"] += 1
+        upload_stats["bytes"] += sent[0]
+        upload_stats["seconds"] += seconds
+    print(f"Uploaded '{file_path}': {sent[0]} bytes in {seconds:.2f}s ({mbps:.2f} MB/s).")
+    return {"bytes": sent[0], "seconds": seconds, "mbps": mbps}
+
+class _HashingReader:
+    """
+    File-like wrapper that hashes and counts the bytes as they are read.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self.hasher = hashlib.sha256()
+        self.size = 0
+
+    def read(self, size=-1):
+        data = self._stream.read(size)
+        self.hasher.update(data)
+        self.size += len(data)
+        return data
+
+def content_key(digest, folder="documents"):
+    """
+    Returns the content-addressed path of a file with the given SHA-256 digest.
+    """
+    return f"{folder}/sha256/{digest}"
+
+def hash_stream(stream):
+    """
+    Computes the SHA-256 digest and size of a seekable stream, then rewinds it.
 
     Returns:
-        str: Public URL of the uploaded file or None if an error occurs.
+        tuple: (hex digest, size in bytes)
+    """
+    hasher = hashlib.sha256()
+    size = 0
+    stream.seek(0)
+    for chunk in iter(lambda: stream.read(HASH_CHUNK_SIZE), b""):
+        hasher.update(chunk)
+        size += len(chunk)
+    stream.seek(0)
+    return hasher.hexdigest(), size
+
+def object_exists(file_path):
+    """
+    Returns True if a file exists at the given path in the Space.
     """
     try:
-        # Secure the file name and create a path in the Space
-        file_name = secure_filename(file.filename)
-        file_path = f"{folder}/{file_name}"
-
-        # Upload the file to DigitalOcean Spaces
-        s3_client.upload_fileobj(
-            file,
-            DO_SPACE_NAME,
-            file_path,
-            ExtraArgs={"ACL": "public-read"}  # Make the file publicly accessible
-        )
-
-        # Return the public URL
-        file_url = f"{DO_SPACE_ENDPOINT}/{DO_SPACE_NAME}/{file_path}"
-        return file_url
-
-    except NoCredentialsError:
-        print("DigitalOcean Spaces credentials are not available.")
-        return None
+        get_s3_client().head_object(Bucket=DO_SPACE_NAME, Key=file_path)
+        return True
     except ClientError as e:
-        print(f"An error occurred while uploading the file: {e}")
-        return None
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return False
+        raise
+
+def stage_stream_to_space(stream, content_type=None, folder="documents"):
+    """
+    Uploads a non-seekable stream to a temporary path, hashing it on the way.
+    Follow up with promote_staged_file() once the digest is known.
+
+    Returns:
+        tuple: (staging path, hex digest, size in bytes)
+    """
+    staging_path = f"{folder}/staging/{uuid.uuid4().hex}"
+    reader = _HashingReader(stream)
+    upload_stream_to_space(reader, staging_path, content_type=content_type)
+    return staging_path, reader.hasher.hexdigest(), reader.size
+
+def promote_staged_file(staging_path, file_path):
+    """
+    Moves a staged upload to its final path (server-side copy), unless a file is
+    already there, and removes the staged copy.
+    """
+    client = get_s3_client()
+    if not object_exists(file_path):
+        client.copy({"Bucket": DO_SPACE_NAME, "Key": staging_path}, DO_SPACE_NAME, file_path, Config=_transfer_config())
+    client.delete_object(Bucket=DO_SPACE_NAME, Key=staging_path)
+
+def file_url_for_key(file_path):
+    return f"{DO_SPACE_ENDPOINT}/{DO_SPACE_NAME}/{file_path}"
+
+def file_url_to_key(file_url):
+    """
+    Converts a stored file_url (see file_url_for_key) back into its key in the Space.
+    """
+    prefix = f"{DO_SPACE_ENDPOINT}/{DO_SPACE_NAME}/"
+    if file_url.startswith(prefix):
+        return file_url[len(prefix):]
+    return file_url
 
-def delete_file_from_space(file_path):
+def delete_files_from_space(file_paths):
     """
-    Deletes a file from DigitalOcean Spaces.
+    Deletes many files from DigitalOcean Spaces with batched DeleteObjects requests.
 
     Args:
-        file_path: Path of the file inside the Space (e.g., "documents/example.txt").
+        file_paths: Iterable of paths inside the Space.
 
     Returns:
-        bool: True if the file was deleted successfully, False otherwise.
+        dict: Error message per path that could not be deleted, empty if all succeeded.
     """
+    failures = {}
+    keys = list(dict.fromkeys(file_paths))  # Drop duplicates, keep order
+    for start in range(0, len(keys), MAX_DELETE_BATCH):
+        batch = keys[start:start + MAX_DELETE_BATCH]
+        try:
+            response = get_s3_client().delete_objects(
+                Bucket=DO_SPACE_NAME,
+                Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True}
+            )
+        except (ClientError, NoCredentialsError) as e:
+            print(f"An error occurred while deleting {len(batch)} files: {e}")
+            failures.update({key: str(e) for key in batch})
+            continue
+        for error in response.get("Errors", []):
+            failures[error["Key"]] = f"{error.get('Code')}: {error.get('Message')}"
+    print(f"Deleted {len(keys) - len(failures)} of {len(keys)} files from the Space.")
+    return failures
+
+def get_download_url(file_path, file_name=None):
+    """
+    Returns a presigned GET URL for a private file, reusing a cached URL while
+    it still has more than PRESIGNED_URL_REFRESH seconds left.
+
+    Args:
+        file_path: Path of the file inside the Space.
+        file_name: Optional name offered to the browser when saving the file.
+    """
+    cache_key = (file_path, file_name)
+    now = time.time()
+    with _presigned_urls_lock:
+        cached = _presigned_urls.get(cache_key)
+        if cached and cached[0] - PRESIGNED_URL_REFRESH > now:
+            _presigned_urls.move_to_end(cache_key)
+            return cached[1]
+
+    params = {"Bucket": DO_SPACE_NAME, "Key": file_path}
+    if file_name:
+        params["ResponseContentDisposition"] = f'inline; filename="{file_name}"'
+    url = get_s3_client().generate_presigned_url("get_object", Params=params, ExpiresIn=PRESIGNED_URL_TTL)
+    with _presigned_urls_lock:
+        _presigned_urls[cache_key] = (now + PRESIGNED_URL_TTL, url)
+        _presigned_urls.move_to_end(cache_key)
+        while len(_presigned_urls) > PRESIGNED_URL_CACHE_SIZE:
+            _presigned_urls.popitem(last=False)
+    return url
+
+def open_file_from_space(file_path, byte_range=None, if_none_match=None, if_modified_since=None):
+    """
+    Opens a file in the Space for streaming, passing Range and conditional
+    headers through to the GetObject request.
+
+    Args:
+        file_path: Path of the file inside the Space.
+        byte_range: Optional HTTP Range header value (e.g. "bytes=0-1023").
+        if_none_match: Optional If-None-Match header value.
+        if_modified_since: Optional datetime for If-Modified-Since.
+
+    Returns:
+        tuple: (HTTP status, GetObject response or None). The status is 304,
+        404 or 416 when there is no body to send.
+    """
+    params = {"Bucket": DO_SPACE_NAME, "Key": file_path}
+    if byte_range:
+        params["Range"] = byte_range
+    if if_none_match:
+        params["IfNoneMatch"] = if_none_match
+    if if_modified_since:
+        params["IfModifiedSince"] = if_modified_since
     try:
-        s3_client.delete_object(Bucket=DO_SPACE_NAME, Key=file_path)
-        print(f"File '{file_path}' successfully deleted from the Space.")
-        return True
+        response = get_s3_client().get_object(**params)
     except ClientError as e:
-        print(f"An error occurred while deleting the file: {e}")
-        return False
\ No newline at end of file
+        code = e.response.get("Error", {}).get("Code")
+        status = e.response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+        if status == 304 or code == "304":
+            return 304, None
+        if code in ("NoSuchKey", "404"):
+            return 404, None
+        if code == "InvalidRange":
+            return 416, None
+        raise
+    return response["ResponseMetadata"]["HTTPStatusCode"], response
@@ -0,0 +1,310 @@
+# services/document_service.py
+
+import os
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from pymongo import ASCENDING, DESCENDING, TEXT, UpdateOne, ReturnDocument
+from werkzeug.utils import secure_filename
+from config import get_mongo_db
+from services.digitalocean_space_service import (
+    delete_files_from_space, file_url_to_key, file_url_for_key, content_key, hash_stream, object_exists,
+    upload_stream_to_space, stage_stream_to_space, promote_staged_file
+)
+
+# Longest wait, in seconds, for a concurrent release of the same file to finish before uploading it again
+BLOB_RELEASE_WAIT = float(os.getenv("BLOB_RELEASE_WAIT", "30"))
+# A blob referenced more recently than this may belong to an upload whose document is not written yet
+RECONCILE_AFTER = timedelta(hours=1)
+
+# Only the fields view_case_details.html renders
+DOCUMENT_LIST_PROJECTION = {
+    "document_title": 1,
+    "document_description": 1,
+    "uploaded_by": 1,
+    "uploaded_at": 1,
+}
+
+# Indexes for the documents collection, (keys, options)
+DOCUMENT_INDEXES = [
+    ([("case_id", ASCENDING), ("uploaded_at", ASCENDING)], {"name": "case_id_uploaded_at"}),
+    ([("worker_id", ASCENDING)], {"name": "worker_id"}),
+    # Documents still using a file, see _reconcile_files()
+    ([("content_hash", ASCENDING)], {"name": "content_hash"}),
+    # Newest change per case, for the case page's ETag (see services/page_version_service.py)
+    ([("case_id", ASCENDING), ("last_modified", DESCENDING)], {"name": "case_id_last_modified"}),
+    # Search, see services/search_service.py
+    ([("document_title", TEXT), ("document_description", TEXT), ("document_tags", TEXT)],
+     {"name": "document_text", "weights": {"document_title": 10, "document_tags": 5, "document_description": 1}}),
+]
+
+
+def ensure_document_indexes(db=None):
+    """
+    Creates the documents collection indexes. Safe to run repeatedly,
+    create_index is a no-op for an index that already exists.
+
+    Returns:
+        list: Names of the indexes.
+    """
+    db = db if db is not None else get_mongo_db()
+    return [db.documents.create_index(keys, **options) for keys, options in DOCUMENT_INDEXES]
+
+
+def list_case_documents(case_id, projection=DOCUMENT_LIST_PROJECTION):
+    """
+    Returns the documents of a case, oldest first, with _id converted to a string.
+
+    Args:
+        case_id: MySQL id of the case.
+        projection: Fields to fetch (default: the fields the case page renders).
+    """
+    documents = []
+    cursor = get_mongo_db().documents.find({"case_id": case_id}, projection).sort("uploaded_at", ASCENDING)
+    for doc in cursor:
+        doc["_id"] = str(doc["_id"])  # Convert ObjectId to string
+        documents.append(doc)
+    return documents
+
+
+def store_document_file(file, folder="documents"):
+    """
+    Stores an uploaded file under its content-addressed path and takes a
+    reference on it in the blobs collection. Identical files are uploaded once.
+
+    Args:
+        file: Werkzeug FileStorage from the request.
+        folder: Folder name inside the Space (default: "documents").
+
+    Returns:
+        dict: File fields to merge into the document metadata.
+    """
+    stream = file.stream
+    staging_path = None
+    if stream.seekable():
+        digest, size = hash_stream(stream)
+    else:
+        staging_path, digest, size = stage_stream_to_space(stream, file.mimetype, folder)
+    file_path = content_key(digest, folder)
+
+    # Take the reference before checking the Space so a concurrent release keeps the file
+    previous = get_mongo_db().blobs.find_one_and_update(
+        {"_id": digest},
+        {"$inc": {"ref_count": 1},
+         "$set": {"referenced_at": datetime.utcnow()},
+         "$setOnInsert": {"key": file_path, "size": size, "created_at": datetime.utcnow()}},
+        upsert=True,
+        return_document=ReturnDocument.BEFORE
+    )
+    try:
+        if previous is not None and previous.get("deleting"):
+            # A release claimed the file before this reference was taken and may
+            # still delete it, check the Space only once it is done
+            _wait_for_release(digest)
+        if staging_path:
+            promote_staged_file(staging_path, file_path)
+        elif previous is None or not object_exists(file_path):
+            # A new blob row means nobody else references the file, upload it without asking
+            upload_stream_to_space(stream, file_path, content_type=file.mimetype)
+        else:
+            print(f"File '{file_path}' already stored, skipping upload.")
+    except Exception:
+        release_blobs([digest])
+        raise
+
+    return {
+        "file_url": file_url_for_key(file_path),
+        "file_key": file_path,
+        "file_name": secure_filename(file.filename),
+        "file_size": size,
+        "content_hash": digest,
+    }
+
+
+def _wait_for_release(digest):
+    db = get_mongo_db()
+    deadline = time.monotonic() + BLOB_RELEASE_WAIT
+    while db.blobs.count_documents({"_id": digest, "deleting": True}, limit=1):
+        if time.monotonic() > deadline:
+            print(f"Release of blob {digest} still running after {BLOB_RELEASE_WAIT}s, storing the file anyway.")
+            return
+        time.sleep(0.1)
+
+
+def release_blobs(digests):
+    """
+    Drops one reference per digest and deletes the files nobody references anymore.
+
+    An unreferenced blob is flagged as deleting while its file is removed, and
+    its row is only dropped if no upload took a reference in the meantime. Such
+    an upload waits for the flag to clear (see store_document_file) and then
+    stores the file again, so it never points at a file deleted under it.
+
+    Returns:
+        dict: Error message per file key that could not be deleted.
+    """
+    counts = Counter(digests)
+    if not counts:
+        return {}
+    db = get_mongo_db()
+    db.blobs.bulk_write([UpdateOne({"_id": digest}, {"$inc": {"ref_count": -n}}) for digest, n in counts.items()])
+    return _delete_unreferenced_blobs(db, counts)
+
+
+def _delete_unreferenced_blobs(db, digests):
+    """
+    Deletes the files of the blobs that have no reference left.
+
+    Returns:
+        dict: Error message per file key that could not be deleted. The blob
+        row of such a file is kept, so a retry goes through here again.
+    """
+    # Claim each unreferenced blob atomically, a concurrent release of the same blob skips it
+    claimed = {}
+    for digest in digests:
+        blob = db.blobs.find_one_and_update(
+            {"_id": digest, "ref_count": {"$lte": 0}, "deleting": {"$ne": True}},
+            {"$set": {"deleting": True}}
+        )
+        if blob:
+            claimed[digest] = blob["key"]
+    if not claimed:
+        return {}
+
+    failures = {key: "Release interrupted" for key in claimed.values()}
+    try:
+        failures = delete_files_from_space(claimed.values())
+    finally:
+        for digest, key in claimed.items():
+            # The row goes only once its file is gone and nobody referenced it again meanwhile
+            if key in failures or not db.blobs.delete_one({"_id": digest, "ref_count": {"$lte": 0}}).deleted_count:
+                db.blobs.update_one({"_id": digest}, {"$unset": {"deleting": ""}})
+    return failures
+
+
+def delete_documents_for_cases(case_ids):
+    """
+    Deletes every document of the given cases: the metadata first, with a
+    single delete_many, then their files in batches (content-addressed files
+    are released and deleted once no other document uses them). Files that
+    could not be deleted are recorded in the failed_file_deletes collection
+    for retry_failed_file_deletes(). Safe to repeat for the same cases: a
+    document's references are only dropped by the call that deleted it, so
+    an interrupted call can leave a file behind but never release it twice.
+
+    Returns:
+        dict: Error message per file key that could not be deleted.
+    """
+    case_ids = list(case_ids)
+    if not case_ids:
+        return {}
+    db = get_mongo_db()
+    documents = list(db.documents.find({"case_id": {"$in": case_ids}}, {"case_id": 1, "file_url": 1, "content_hash": 1}))
+    if not documents:
+        return {}
+    # Delete by _id, a document added to one of the cases meanwhile keeps its file
+    deleted = db.documents.delete_many({"_id": {"$in": [doc["_id"] for doc in documents]}}).deleted_count
+    if deleted != len(documents):
+        # A concurrent call deleted some of them and releases their files. Which
+        # ones is unknown, so none are released here (never twice): they are
+        # recorded for retry_failed_file_deletes() to release once unused
+        print(f"Documents of cases {case_ids} deleted concurrently, their files are left to reconcile.")
+        now = datetime.utcnow()
+        db.failed_file_deletes.insert_many([
+            {"key": file_url_to_key(doc["file_url"]), "file_url": doc["file_url"], "content_hash": doc.get("content_hash"),
+             "case_id": doc["case_id"], "error": "Deleted concurrently", "reconcile": True, "failed_at": now}
+            for doc in documents if doc.get("file_url")
+        ])
+        return {}
+
+    digests = []
+    keys = []
+    key_cases = {}
+    for doc in documents:
+        if doc.get("content_hash"):
+            digests.append(doc["content_hash"])
+        elif doc.get("file_url"):
+            key = file_url_to_key(doc["file_url"])
+            keys.append(key)
+            key_cases[key] = doc["case_id"]
+    failures = release_blobs(digests)
+    if keys:
+        failures.update(delete_files_from_space(keys))
+    if failures:
+        now = datetime.utcnow()
+        db.failed_file_deletes.insert_many([
+            {"key": key, "case_id": key_cases.get(key, case_ids[0] if len(case_ids) == 1 else None),
+             "error": error, "failed_at": now}
+            for key, error in failures.items()
+        ])
+    return failures
+
+
+def retry_failed_file_deletes(limit=1000):
+    """
+    Retries file deletions recorded by delete_documents_for_cases().
+
+    Returns:
+        dict: Error message per key that failed again.
+    """
+    db = get_mongo_db()
+    pending = list(db.failed_file_deletes.find({}, {"key": 1, "file_url": 1, "content_hash": 1, "reconcile": 1}).limit(limit))
+    if not pending:
+        return {}
+    failures, done = _reconcile_files([doc for doc in pending if doc.get("reconcile")])
+    pending = [doc for doc in pending if not doc.get("reconcile")]
+
+    # Content-addressed files are released again through their blob row, which
+    # skips the ones an upload has referenced since the failure
+    keys = {doc["key"] for doc in pending}
+    blobs = {blob["key"]: blob["_id"] for blob in db.blobs.find({"key": {"$in": list(keys)}}, {"key": 1})}
+    failures.update(_delete_unreferenced_blobs(db, blobs.values()))
+    other_keys = [key for key in keys if key not in blobs]
+    if other_keys:
+        failures.update(delete_files_from_space(other_keys))
+    done += [doc["_id"] for doc in pending if doc["key"] not in failures]
+    if done:
+        db.failed_file_deletes.delete_many({"_id": {"$in": done}})
+    return failures
+
+
+def _reconcile_files(records):
+    """
+    Releases the files left by a delete_documents_for_cases() call that raced
+    with another one, once no document uses them. A blob's reference from the
+    lost race is dropped by resetting its ref_count, unless an upload took a
+    reference within RECONCILE_AFTER (its document may not be written yet).
+
+    Returns:
+        tuple: (error message per key that could not be deleted, ids of the settled records)
+    """
+    if not records:
+        return {}, []
+    db = get_mongo_db()
+    cutoff = datetime.utcnow() - RECONCILE_AFTER
+    settled = []
+    blob_records = []
+    file_records = {}
+    for record in records:
+        digest = record.get("content_hash")
+        if digest:
+            # Still used: settled by a later retry, once its last document is deleted
+            if not db.documents.count_documents({"content_hash": digest}, limit=1):
+                db.blobs.update_one(
+                    {"_id": digest, "ref_count": {"$gt": 0},
+                     "$or": [{"referenced_at": {"$lt": cutoff}}, {"referenced_at": {"$exists": False}}]},
+                    {"$set": {"ref_count": 0}}
+                )
+                blob_records.append(record)
+        elif not db.documents.count_documents({"file_url": record["file_url"]}, limit=1):
+            file_records.setdefault(record["key"], []).append(record["_id"])
+
+    digests = list({record["content_hash"] for record in blob_records})
+    failures = _delete_unreferenced_blobs(db, digests)
+    remaining = {blob["_id"] for blob in db.blobs.find({"_id": {"$in": digests}}, {"_id": 1})}
+    settled += [record["_id"] for record in blob_records if record["content_hash"] not in remaining]
+    if file_records:
+        file_failures = delete_files_from_space(file_records)
+        failures.update(file_failures)
+        settled += [record_id for key, ids in file_records.items() if key not in file_failures for record_id in ids]
+    return failures, settled
@@ -0,0 +1,110 @@
+# services/export_service.py
+
+import csv
+import io
+import os
+from datetime import date, timedelta
+from sqlalchemy import select, exists
+from config import SessionLocal
+from models.case_model import Case
+from models.client_model import Client
+from models.case_history_model import CaseHistory
+from models.client_history_model import ClientHistory
+from models.case_repository import LIVE_CASES
+
+# Rows fetched from the server-side cursor (and written to the response) at a time
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+# Export name -> (model, exported columns, column the date range filters on)
+EXPORTS = {
+    "cases": (Case, ("id", "client_id", "worker_id", "case_title", "case_description", "case_status",
+                     "case_type", "court_date", "judge_name", "created_at", "updated_at"), "created_at"),
+    "clients": (Client, ("id", "name", "second_name", "last_name", "second_last_name", "email", "phone",
+                         "curp", "address", "created_at", "updated_at"), "created_at"),
+    "case_history": (CaseHistory, ("id", "case_id", "client_id", "worker_id", "case_title", "case_description",
+                                   "case_status", "case_type", "court_date", "judge_name", "archived_at"), "archived_at"),
+    "client_history": (ClientHistory, ("id", "client_id", "name", "second_name", "last_name", "second_last_name",
+                                       "email", "phone", "curp", "address", "archived_at"), "archived_at"),
+}
+
+
+def build_export_query(kind, worker_id=None, status=None, case_type=None, date_from=None, date_to=None):
+    """
+    Builds the SELECT for an export. Filters that don't apply to the table are ignored.
+
+    Args:
+        kind: One of EXPORTS.
+        worker_id: Only rows of this worker's cases (clients: clients with a case of the worker).
+        status: Case status (cases and case_history).
+        case_type: Case type (cases and case_history).
+        date_from: First day included, on created_at or archived_at.
+        date_to: Last day included.
+
+    Returns:
+        Select: A Core select of the exported columns, ordered by id.
+    """
+    model, columns, date_column = EXPORTS[kind]
+    query = select(*(getattr(model, column) for column in columns)).order_by(model.id)
+    if model is Case:
+        query = query.where(LIVE_CASES)
+
+    if worker_id is not None:
+        if hasattr(model, "worker_id"):
+            query = query.where(model.worker_id == worker_id)
+        elif model is Client:
+            query = query.where(exists().where(Case.client_id == Client.id, Case.worker_id == worker_id, LIVE_CASES))
+        else:
+            query = query.where(exists().where(
+                CaseHistory.client_id == ClientHistory.client_id, CaseHistory.worker_id == worker_id
+            ))
+    if status and hasattr(model, "case_status"):
+        query = query.where(model.case_status == status)
+    if case_type and hasattr(model, "case_type"):
+        query = query.where(model.case_type == case_type)
+    if date_from:
+        query = query.where(getattr(model, date_column) >= date_from)
+    if date_to:
+        query = query.where(getattr(model, date_column) < date_to + timedelta(days=1))
+    return query
+
+
+def iter_export_rows(kind, batch_size=EXPORT_BATCH_SIZE, **filters):
+    """
+    Yields the rows of an export in batches from a server-side cursor, so memory
+    use does not depend on the table size. The session (and its connection) is
+    held until the generator is exhausted or closed.
+
+    Yields:
+        list: Up to batch_size Row tuples.
+    """
+    with SessionLocal() as db_session:
+        result = db_session.execute(
+            build_export_query(kind, **filters).execution_options(stream_results=True, yield_per=batch_size)
+        )
+        for partition in result.partitions():
+            yield partition
+
+
+def iter_export_csv(kind, batch_size=EXPORT_BATCH_SIZE, **filters):
+    """
+    Yields an export as CSV text, a header line then one chunk per batch of rows.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORTS[kind][1])
+    yield buffer.getvalue()
+    for rows in iter_export_rows(kind, batch_size, **filters):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue()
+
+
+def parse_date(value):
+    """
+    Parses a YYYY-MM-DD filter value, returns None for an empty value.
+
+    Raises:
+        ValueError: If the value is not a valid date.
+    """
+    return date.fromisoformat(value) if value else None
@@ -0,0 +1,330 @@
+# services/fragment_cache_service.py
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from markupsafe import Markup
+
+# Rendered HTML fragments (the dashboard case list, the case page document
+# list), reused until a route that changes them invalidates their namespace.
+# "memory" keeps them in each worker process, "sqlite" in a file shared by all
+# the workers of a host (and by the archiver/import scripts), "none" disables caching.
+FRAGMENT_CACHE_BACKEND = os.getenv("FRAGMENT_CACHE_BACKEND", "memory").strip().lower()
+FRAGMENT_CACHE_MAX_MB = float(os.getenv("FRAGMENT_CACHE_MAX_MB", "32"))
+FRAGMENT_CACHE_TTL = float(os.getenv("FRAGMENT_CACHE_TTL", "300"))  # Seconds, bounds a missed invalidation
+FRAGMENT_CACHE_PATH = os.getenv("FRAGMENT_CACHE_PATH", "fragment_cache.sqlite3")
+
+# Namespace every key depends on, bumped by invalidate_all()
+GLOBAL_NAMESPACE = "*"
+ALL_CASES_NAMESPACE = "cases:all"
+
+# A namespace generation is the time of its last invalidation, in nanoseconds,
+# so a value is never reused. Generations older than the TTL plus this margin
+# (for renders still in flight) only guard expired fragments and are pruned.
+GENERATION_GRACE = 60
+# The sqlite backend records a hit in used_at at most this often per fragment
+USED_AT_RESOLUTION = min(60.0, FRAGMENT_CACHE_TTL / 10)
+
+# Fragment name -> [hits, misses], read by the /metrics endpoint
+fragment_cache_stats = {}
+_stats_lock = threading.Lock()
+
+
+class MemoryBackend:
+    """
+    LRU of fragments in this process, evicting the least recently used ones
+    beyond max_bytes. Namespace generations are kept alongside.
+    """
+
+    def __init__(self, max_bytes, ttl):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (html, size, expires_at)
+        self._generations = {}
+        self._bytes = 0
+        self._pruned_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[2] < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, html):
+        size = len(html.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (html, size, time.monotonic() + self.ttl)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        self._bytes -= self._entries.pop(key)[1]
+
+    def generations(self, namespaces):
+        with self._lock:
+            return tuple(self._generations.get(namespace, 0) for namespace in namespaces)
+
+    def bump(self, namespaces):
+        with self._lock:
+            for namespace in namespaces:
+                self._generations[namespace] = max(time.time_ns(), self._generations.get(namespace, 0) + 1)
+            if time.monotonic() - self._pruned_at > GENERATION_GRACE:
+                self._prune_generations()
+
+    def _prune_generations(self):
+        cutoff = time.time_ns() - int((self.ttl + GENERATION_GRACE) * 1e9)
+        self._generations = {namespace: generation for namespace, generation in self._generations.items() if generation >= cutoff}
+        self._pruned_at = time.monotonic()
+
+    def size(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "generations": len(self._generations)}
+
+
+class SqliteBackend:
+    """
+    Fragments in a local SQLite file shared by every process on the host, so
+    an invalidation in one worker applies to all of them. Least recently used
+    fragments are deleted beyond max_bytes.
+    """
+
+    def __init__(self, path, max_bytes, ttl):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._local = threading.local()
+        self._pruned_at = time.monotonic()
+        with self._connect() as connection:
+            connection.executescript(
+                "CREATE TABLE IF NOT EXISTS fragments ("
+                " key TEXT PRIMARY KEY, html TEXT NOT NULL, size INTEGER NOT NULL,"
+                " expires_at REAL NOT NULL, used_at REAL NOT NULL);"
+                "CREATE INDEX IF NOT EXISTS ix_fragments_used_at ON fragments (used_at);"
+                "CREATE TABLE IF NOT EXISTS generations (namespace TEXT PRIMARY KEY, generation INTEGER NOT NULL);"
+            )
+
+    def _connect(self):
+        # One connection per thread and process, sqlite3 connections must not be shared across either
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def get(self, key):
+        connection = self._connect()
+        row = connection.execute("SELECT html, expires_at, used_at FROM fragments WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if row[1] < now:
+            connection.execute("DELETE FROM fragments WHERE key = ?", (key,))
+            return None
+        # Reads stay reads: eviction order only needs used_at to USED_AT_RESOLUTION
+        if now - row[2] > USED_AT_RESOLUTION:
+            connection.execute("UPDATE fragments SET used_at = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def set(self, key, html):
+        size = len(html.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        connection = self._connect()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute(
+                "INSERT OR REPLACE INTO fragments (key, html, size, expires_at, used_at) VALUES (?, ?, ?, ?, ?)",
+                (key, html, size, now + self.ttl, now)
+            )
+            total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM fragments").fetchone()[0]
+            if total > self.max_bytes:
+                connection.execute("DELETE FROM fragments WHERE expires_at < ?", (now,))
+                rows = connection.execute("SELECT key, size FROM fragments ORDER BY used_at").fetchall()
+                total = sum(row_size for _, row_size in rows)
+                evicted = []
+                for row_key, row_size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    evicted.append((row_key,))
+                    total -= row_size
+                connection.executemany("DELETE FROM fragments WHERE key = ?", evicted)
+
+    def generations(self, namespaces):
+        placeholders = ", ".join("?" for _ in namespaces)
+        found = dict(self._connect().execute(
+            f"SELECT namespace, generation FROM generations WHERE namespace IN ({placeholders})", tuple(namespaces)
+        ).fetchall())
+        return tuple(found.get(namespace, 0) for namespace in namespaces)
+
+    def bump(self, namespaces):
+        connection = self._connect()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.executemany(
+                "INSERT INTO generations (namespace, generation) VALUES (?, ?) "
+                "ON CONFLICT (namespace) DO UPDATE SET generation = MAX(excluded.generation, generation + 1)",
+                [(namespace, time.time_ns()) for namespace in namespaces]
+            )
+            if time.monotonic() - self._pruned_at > GENERATION_GRACE:
+                cutoff = time.time_ns() - int((self.ttl + GENERATION_GRACE) * 1e9)
+                connection.execute("DELETE FROM generations WHERE generation < ?", (cutoff,))
+                self._pruned_at = time.monotonic()
+
+    def size(self):
+        connection = self._connect()
+        entries, size = connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM fragments").fetchone()
+        generations = connection.execute("SELECT COUNT(*) FROM generations").fetchone()[0]
+        return {"entries": entries, "bytes": size, "generations": generations}
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """
+    Returns the configured backend, created on first use, or None if caching is disabled.
+    """
+    global _backend
+    if _backend is None and FRAGMENT_CACHE_BACKEND != "none":
+        with _backend_lock:
+            if _backend is None:
+                max_bytes = int(FRAGMENT_CACHE_MAX_MB * 1024 * 1024)
+                if FRAGMENT_CACHE_BACKEND == "sqlite":
+                    _backend = SqliteBackend(FRAGMENT_CACHE_PATH, max_bytes, FRAGMENT_CACHE_TTL)
+                else:
+                    _backend = MemoryBackend(max_bytes, FRAGMENT_CACHE_TTL)
+    return _backend
+
+
+def _count(fragment, hit):
+    with _stats_lock:
+        counts = fragment_cache_stats.setdefault(fragment, [0, 0])
+        counts[0 if hit else 1] += 1
+
+
+def get_stats():
+    """
+    Returns a copy of the hit and miss counts of this process, per fragment name.
+    """
+    with _stats_lock:
+        return {fragment: list(counts) for fragment, counts in fragment_cache_stats.items()}
+
+
+def worker_namespace(worker_id):
+    return f"worker:{worker_id}"
+
+
+def case_namespace(case_id):
+    return f"case:{case_id}"
+
+
+def get_fragment(fragment, namespaces, variant):
+    """
+    Looks a fragment up, for callers that skip loading its data on a hit.
+
+    Args:
+        fragment: Fragment name, e.g. "case_list".
+        namespaces: Namespaces the fragment depends on; invalidating any of them
+            makes every fragment stored under it stale.
+        variant: Anything else the HTML depends on (role, page parameters...).
+
+    Returns:
+        tuple: (key to pass to store_fragment, Markup or None on a miss).
+        The key is None when caching is disabled.
+    """
+    backend = get_backend()
+    if backend is None:
+        return None, None
+    namespaces = (GLOBAL_NAMESPACE, *namespaces)
+    generations = backend.generations(namespaces)
+    key = f"{fragment}|" + "|".join(f"{namespace}@{generation}" for namespace, generation in zip(namespaces, generations))
+    key += f"|{variant!r}"
+    html = backend.get(key)
+    _count(fragment, html is not None)
+    return key, Markup(html) if html is not None else None
+
+
+def store_fragment(key, html):
+    """
+    Stores a fragment rendered after a get_fragment miss.
+
+    Returns:
+        Markup: The HTML, safe to insert in a template.
+    """
+    backend = get_backend()
+    if key is not None and backend is not None:
+        backend.set(key, str(html))
+    return Markup(html)
+
+
+def cached_fragment(fragment, namespaces, variant, render):
+    """
+    Returns a rendered fragment from the cache, rendering and storing it on a miss.
+
+    Args:
+        fragment: Fragment name, e.g. "case_list".
+        namespaces: Namespaces the fragment depends on.
+        variant: Anything else the HTML depends on.
+        render: Callable returning the HTML, called on a miss.
+
+    Returns:
+        Markup: The HTML, safe to insert in a template.
+    """
+    key, html = get_fragment(fragment, namespaces, variant)
+    if html is not None:
+        return html
+    return store_fragment(key, render())
+
+
+def invalidate(*namespaces):
+    """
+    Makes every fragment stored under any of the namespaces stale. Stale
+    fragments are never read again and age out of the LRU.
+    """
+    backend = get_backend()
+    if backend is not None and namespaces:
+        backend.bump(namespaces)
+
+
+def invalidate_case(case_id, worker_id=None):
+    """
+    Invalidates the document list of a case and, with its worker, the case
+    lists it appears in (the worker's and the admins').
+    """
+    namespaces = [case_namespace(case_id)]
+    if worker_id is not None:
+        namespaces += [worker_namespace(worker_id), ALL_CASES_NAMESPACE]
+    invalidate(*namespaces)
+
+
+def invalidate_all():
+    """
+    Invalidates every fragment, e.g. after a bulk import.
+    """
+    invalidate(GLOBAL_NAMESPACE)
+
+
+def cache_size():
+    """
+    Returns the number of fragments, bytes and namespace generations held by the backend.
+    """
+    backend = get_backend()
+    return backend.size() if backend is not None else {"entries": 0, "bytes": 0, "generations": 0}
@@ -0,0 +1,304 @@
+# services/history_retention_service.py
+
+import csv
+import gzip
+import io
+import os
+import tempfile
+from datetime import datetime
+from sqlalchemy import text
+from config import get_engine
+from services.digitalocean_space_service import upload_stream_to_space, get_s3_client, DO_SPACE_NAME
+
+# case_history and client_history are range-partitioned by archived_at on MySQL:
+# one pYYYYMM partition per month, older months merged into one yYYYY partition
+# per year, and p_future (MAXVALUE) catching anything beyond the last month.
+HISTORY_TABLES = ("case_history", "client_history")
+HISTORY_PARTITIONS_AHEAD = int(os.getenv("HISTORY_PARTITIONS_AHEAD", "3"))  # Months created in advance
+HISTORY_COMPACT_AFTER_MONTHS = int(os.getenv("HISTORY_COMPACT_AFTER_MONTHS", "12"))
+# Partitions older than this are moved to the Space and dropped, 0 keeps everything
+HISTORY_RETENTION_MONTHS = int(os.getenv("HISTORY_RETENTION_MONTHS", "84"))
+HISTORY_COLD_STORAGE_FOLDER = os.getenv("HISTORY_COLD_STORAGE_FOLDER", "history-archive")
+COLD_STORAGE_BATCH_SIZE = 5000  # Rows fetched from the server-side cursor at a time
+
+FUTURE_PARTITION = "p_future"
+FIRST_PARTITION = "p_start"  # Holds everything archived before partitioning was set up
+
+
+def _month_start(moment):
+    return datetime(moment.year, moment.month, 1)
+
+
+def _add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def _bound(moment):
+    return f"UNIX_TIMESTAMP('{moment:%Y-%m-%d %H:%M:%S}')"
+
+
+def is_partitioned(connection):
+    """
+    Returns whether the history tables are partitioned on this database (MySQL only).
+    """
+    return connection.dialect.name == "mysql"
+
+
+def unpartitioned_tables(connection):
+    """
+    Returns the history tables without partitions, e.g. created before
+    partitioning was added to the models (it is only applied on create).
+    """
+    return [table for table in HISTORY_TABLES if not list_partitions(connection, table)]
+
+
+def _report_unpartitioned(tables):
+    for table in tables:
+        print(f"{table} is not partitioned, skipping it. Partition it once with "
+              f"'python database/history_retention.py --partition-existing'.")
+
+
+def partition_existing_tables(connection):
+    """
+    Partitions the history tables created unpartitioned, like the models do on
+    create: the primary key becomes (id, archived_at) and every row goes into
+    p_future, which ensure_future_partitions() then splits. Each ALTER copies
+    the table and blocks writes to it meanwhile, so run it off-hours.
+
+    Returns:
+        list: Names of the tables partitioned.
+    """
+    tables = unpartitioned_tables(connection)
+    for table in tables:
+        primary_key = connection.execute(text(
+            "SELECT COUNT(*) FROM information_schema.KEY_COLUMN_USAGE "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND CONSTRAINT_NAME = 'PRIMARY'"
+        ), {"table": table}).scalar()
+        # A run interrupted between the two ALTERs already changed the key
+        if primary_key == 1:
+            print(f"{table}: changing the primary key to (id, archived_at)")
+            connection.execute(text(f"ALTER TABLE {table} DROP PRIMARY KEY, ADD PRIMARY KEY (id, archived_at)"))
+        print(f"{table}: partitioning by archived_at")
+        connection.execute(text(
+            f"ALTER TABLE {table} PARTITION BY RANGE (UNIX_TIMESTAMP(archived_at)) "
+            f"(PARTITION {FUTURE_PARTITION} VALUES LESS THAN MAXVALUE)"
+        ))
+    return tables
+
+
+def list_partitions(connection, table):
+    """
+    Lists the partitions of a history table in order.
+
+    Returns:
+        list: (name, upper bound as a datetime or None for MAXVALUE, approximate row count) tuples.
+    """
+    rows = connection.execute(text(
+        "SELECT PARTITION_NAME, "
+        "CASE WHEN PARTITION_DESCRIPTION = 'MAXVALUE' THEN NULL ELSE FROM_UNIXTIME(PARTITION_DESCRIPTION) END, "
+        "TABLE_ROWS "
+        "FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND PARTITION_NAME IS NOT NULL "
+        "ORDER BY PARTITION_ORDINAL_POSITION"
+    ), {"table": table}).all()
+    return [(name, upper, table_rows or 0) for name, upper, table_rows in rows]
+
+
+def ensure_future_partitions(connection, table, months_ahead=HISTORY_PARTITIONS_AHEAD, now=None):
+    """
+    Splits p_future so that monthly partitions exist up to months_ahead months
+    from now. Run regularly, p_future then stays empty and the split is instant.
+
+    Returns:
+        list: Names of the partitions created.
+    """
+    partitions = list_partitions(connection, table)
+    current = _month_start(now or datetime.utcnow())
+    bounds = [upper for _, upper, _ in partitions if upper is not None]
+    definitions = []
+    created = []
+    if bounds:
+        month = bounds[-1]
+    else:
+        # First run: everything already archived goes into one partition
+        definitions.append(f"PARTITION {FIRST_PARTITION} VALUES LESS THAN ({_bound(current)})")
+        created.append(FIRST_PARTITION)
+        month = current
+    last = _add_months(current, months_ahead + 1)
+    while month < last:
+        name = f"p{month:%Y%m}"
+        definitions.append(f"PARTITION {name} VALUES LESS THAN ({_bound(_add_months(month, 1))})")
+        created.append(name)
+        month = _add_months(month, 1)
+    if not definitions:
+        return []
+
+    definitions.append(f"PARTITION {FUTURE_PARTITION} VALUES LESS THAN MAXVALUE")
+    connection.execute(text(
+        f"ALTER TABLE {table} REORGANIZE PARTITION {FUTURE_PARTITION} INTO ({', '.join(definitions)})"
+    ))
+    return created
+
+
+def compact_partitions(connection, table, older_than_months=HISTORY_COMPACT_AFTER_MONTHS, now=None):
+    """
+    Merges the monthly partitions older than older_than_months into one yYYYY
+    partition per year. REORGANIZE rebuilds the merged rows, so this also
+    defragments them, and keeps the partition count (open files, metadata) small.
+
+    Returns:
+        list: Names of the yearly partitions written.
+    """
+    cutoff = _add_months(_month_start(now or datetime.utcnow()), -older_than_months)
+    years = {}
+    for name, upper, _ in list_partitions(connection, table):
+        if upper is None:
+            continue
+        if name.startswith("y") or (name.startswith("p") and name[1:].isdigit() and upper <= cutoff):
+            years.setdefault(name[1:5], []).append((name, upper))
+
+    compacted = []
+    for year, group in sorted(years.items()):
+        # A year already compacted and without new months is left alone
+        if all(name.startswith("y") for name, _ in group):
+            continue
+        names = ", ".join(name for name, _ in group)
+        connection.execute(text(
+            f"ALTER TABLE {table} REORGANIZE PARTITION {names} INTO "
+            f"(PARTITION y{year} VALUES LESS THAN ({_bound(group[-1][1])}))"
+        ))
+        compacted.append(f"y{year}")
+    return compacted
+
+
+def _write_partition_csv(connection, table, partition, output):
+    """
+    Streams the rows of one partition as gzipped CSV into output.
+
+    Returns:
+        int: Rows written.
+    """
+    result = connection.execute(
+        text(f"SELECT * FROM {table} PARTITION ({partition}) ORDER BY id"),
+        execution_options={"stream_results": True, "yield_per": COLD_STORAGE_BATCH_SIZE}
+    )
+    written = 0
+    with gzip.GzipFile(fileobj=output, mode="wb") as compressed:
+        text_output = io.TextIOWrapper(compressed, encoding="utf-8", newline="")
+        writer = csv.writer(text_output)
+        writer.writerow(result.keys())
+        for rows in result.partitions():
+            writer.writerows(rows)
+            written += len(rows)
+        text_output.flush()
+        text_output.detach()
+    return written
+
+
+def move_partition_to_cold_storage(connection, table, partition):
+    """
+    Uploads a partition to the Space as gzipped CSV, checks the upload, then drops the partition.
+
+    Returns:
+        tuple: (object key in the Space, rows moved)
+
+    Raises:
+        RuntimeError: If the upload does not match the partition, which is then kept.
+    """
+    expected = connection.execute(text(f"SELECT COUNT(*) FROM {table} PARTITION ({partition})")).scalar()
+    key = f"{HISTORY_COLD_STORAGE_FOLDER}/{table}/{partition}.csv.gz"
+    with tempfile.TemporaryFile() as spool:
+        written = _write_partition_csv(connection, table, partition, spool)
+        if written != expected:
+            raise RuntimeError(f"{table} {partition}: exported {written} rows, expected {expected}")
+        size = spool.tell()
+        spool.seek(0)
+        upload_stream_to_space(spool, key, content_type="application/gzip",
+                               extra_args={"Metadata": {"rows": str(written)}})
+
+    stored = get_s3_client().head_object(Bucket=DO_SPACE_NAME, Key=key)
+    if stored["ContentLength"] != size:
+        raise RuntimeError(f"{table} {partition}: uploaded {stored['ContentLength']} bytes, expected {size}")
+    connection.execute(text(f"ALTER TABLE {table} DROP PARTITION {partition}"))
+    return key, written
+
+
+def expire_partitions(connection, table, retention_months=HISTORY_RETENTION_MONTHS, now=None):
+    """
+    Moves every partition entirely older than retention_months to cold storage.
+
+    Returns:
+        list: (object key, rows moved) for each partition moved.
+    """
+    if retention_months <= 0:
+        return []
+    cutoff = _add_months(_month_start(now or datetime.utcnow()), -retention_months)
+    moved = []
+    for name, upper, _ in list_partitions(connection, table):
+        if upper is None or upper > cutoff:
+            break
+        moved.append(move_partition_to_cold_storage(connection, table, name))
+    return moved
+
+
+def ensure_history_partitions(months_ahead=HISTORY_PARTITIONS_AHEAD, partition_existing=False):
+    """
+    Creates the upcoming monthly partitions of every history table. Does nothing outside MySQL.
+
+    Args:
+        months_ahead: Monthly partitions created in advance.
+        partition_existing: Partition the history tables created unpartitioned
+            first (see partition_existing_tables), instead of skipping them.
+    """
+    with get_engine().connect() as connection:
+        if not is_partitioned(connection):
+            return
+        if partition_existing:
+            partition_existing_tables(connection)
+        unpartitioned = unpartitioned_tables(connection)
+        _report_unpartitioned(unpartitioned)
+        for table in HISTORY_TABLES:
+            if table in unpartitioned:
+                continue
+            created = ensure_future_partitions(connection, table, months_ahead)
+            if created:
+                print(f"{table}: created partitions {', '.join(created)}")
+
+
+def run_retention(months_ahead=HISTORY_PARTITIONS_AHEAD, compact_after_months=HISTORY_COMPACT_AFTER_MONTHS,
+                  retention_months=HISTORY_RETENTION_MONTHS, now=None, partition_existing=False):
+    """
+    Runs the whole retention job on every history table: moves expired
+    partitions to cold storage, compacts old months into years and creates the
+    upcoming months. Partition DDL commits implicitly, so each step stands alone
+    and an interrupted run is simply resumed by the next one. Tables that are
+    not partitioned are skipped with a message, unless partition_existing is
+    set (see partition_existing_tables).
+
+    Returns:
+        dict: Per table, the partitions moved, compacted and created.
+    """
+    summary = {}
+    with get_engine().connect() as connection:
+        if not is_partitioned(connection):
+            print(f"History partitioning is only used on MySQL, nothing to do on {connection.dialect.name}.")
+            return summary
+        if partition_existing:
+            partition_existing_tables(connection)
+        unpartitioned = unpartitioned_tables(connection)
+        _report_unpartitioned(unpartitioned)
+        for table in HISTORY_TABLES:
+            if table in unpartitioned:
+                continue
+            moved = expire_partitions(connection, table, retention_months, now)
+            for key, rows in moved:
+                print(f"{table}: moved {rows} rows to {key}")
+            compacted = compact_partitions(connection, table, compact_after_months, now)
+            if compacted:
+                print(f"{table}: compacted into {', '.join(compacted)}")
+            created = ensure_future_partitions(connection, table, months_ahead, now)
+            if created:
+                print(f"{table}: created partitions {', '.join(created)}")
+            summary[table] = {"moved": moved, "compacted": compacted, "created": created}
+    return summary
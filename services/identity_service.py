@@ -0,0 +1,84 @@
+# services/identity_service.py
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from flask import g, session
+from sqlalchemy import event
+from config import SessionLocal
+from models.worker_model import Worker
+
+# Process-wide cache of logged-in workers. Updates made in this process evict
+# the entry right away; other worker processes pick them up within the TTL.
+WORKER_CACHE_TTL = float(os.getenv("WORKER_CACHE_TTL", "60"))
+WORKER_CACHE_SIZE = int(os.getenv("WORKER_CACHE_SIZE", "1024"))
+
+_worker_cache = OrderedDict()  # worker_id -> (expires_at, detached Worker)
+_worker_cache_lock = threading.Lock()
+_MISSING = object()
+
+
+def _load_worker(worker_id):
+    with SessionLocal() as db_session:
+        worker = db_session.get(Worker, worker_id)
+        if worker is not None:
+            # Detach with every column loaded so it can outlive the session
+            db_session.expunge(worker)
+        return worker
+
+
+def get_worker(worker_id):
+    """
+    Returns the Worker with the given id, served from the TTL cache when possible.
+
+    Args:
+        worker_id: Primary key of the worker.
+
+    Returns:
+        Worker: A detached Worker instance, or None if it does not exist.
+    """
+    now = time.monotonic()
+    with _worker_cache_lock:
+        entry = _worker_cache.get(worker_id)
+        if entry is not None and entry[0] > now:
+            _worker_cache.move_to_end(worker_id)
+            return entry[1]
+
+    worker = _load_worker(worker_id)
+    if worker is not None:
+        with _worker_cache_lock:
+            _worker_cache[worker_id] = (now + WORKER_CACHE_TTL, worker)
+            _worker_cache.move_to_end(worker_id)
+            while len(_worker_cache) > WORKER_CACHE_SIZE:
+                _worker_cache.popitem(last=False)
+    return worker
+
+
+def get_current_worker():
+    """
+    Returns the logged-in Worker, resolved at most once per request.
+
+    Returns:
+        Worker: The current worker, or None if nobody is logged in.
+    """
+    worker = g.get('_current_worker', _MISSING)
+    if worker is _MISSING:
+        worker_id = session.get('user')
+        worker = get_worker(worker_id) if worker_id is not None else None
+        g._current_worker = worker
+    return worker
+
+
+def invalidate_worker(worker_id):
+    """
+    Drops a worker from the cache, call it after changing a worker's role or profile.
+    """
+    with _worker_cache_lock:
+        _worker_cache.pop(worker_id, None)
+
+
+@event.listens_for(Worker, "after_update")
+@event.listens_for(Worker, "after_delete")
+def _evict_changed_worker(mapper, connection, target):
+    invalidate_worker(target.id)
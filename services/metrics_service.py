@@ -0,0 +1,227 @@
+# services/metrics_service.py
+
+import contextvars
+import hmac
+import os
+import threading
+import time
+from flask import Response, g, request
+from pymongo import monitoring
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import config
+from services import digitalocean_space_service, fragment_cache_service
+
+# Instrumentation is opt-in, nothing is registered unless METRICS_ENABLED is set
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").strip().lower() in ("1", "true", "yes", "on")
+# Bearer token the scraper sends to /metrics. Without one, only local, unproxied requests may read it.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+LOCAL_ADDRESSES = ("127.0.0.1", "::1")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+_route_latency = {}  # (endpoint, method, status) -> [bucket counts..., sum, count]
+_store_calls = {}  # (store, label value) -> [count, seconds]
+
+# Store -> (label name, help text)
+STORES = {
+    "sql_statements": ("verb", "SQL statements"),
+    "mongo_commands": ("command", "MongoDB commands"),
+    "s3_calls": ("operation", "Spaces API calls"),
+}
+
+# Per-request totals, shared with the threads the request hands work to through a
+# copied context. Calls from threads that don't copy it (boto3 transfer workers)
+# still reach the process-wide counters, just not the request's Server-Timing.
+_request_totals = contextvars.ContextVar("request_totals", default=None)
+
+
+class _RequestTotals:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def add(self, store, seconds):
+        with self.lock:
+            count, total = self.values.get(store, (0, 0.0))
+            self.values[store] = (count + 1, total + seconds)
+
+
+def _record(store, label, seconds):
+    with _lock:
+        calls = _store_calls.setdefault((store, label), [0, 0.0])
+        calls[0] += 1
+        calls[1] += seconds
+    totals = _request_totals.get()
+    if totals is not None:
+        totals.add(store, seconds)
+
+
+def _observe_route(endpoint, method, status, seconds):
+    key = (endpoint, method, status)
+    with _lock:
+        series = _route_latency.setdefault(key, [0] * len(LATENCY_BUCKETS) + [0.0, 0])
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                series[i] += 1
+        series[-2] += seconds
+        series[-1] += 1
+
+
+# SQLAlchemy: time every statement on any engine
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _record_statement(conn, statement)
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute, pop its start time here
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("metrics_started"):
+        _record_statement(conn, exception_context.statement or "")
+
+
+def _record_statement(conn, statement):
+    started = conn.info["metrics_started"].pop()
+    verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+    _record("sql_statements", verb, time.perf_counter() - started)
+
+
+# pymongo: command monitoring reports the duration itself
+class _MongoCommandListener(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        _record("mongo_commands", event.command_name, event.duration_micros / 1e6)
+
+    def failed(self, event):
+        _record("mongo_commands", event.command_name, event.duration_micros / 1e6)
+
+
+# boto3: the per-call context dict carries the start time from before-call to after-call
+def _s3_before_call(context, **kwargs):
+    context["metrics_started"] = time.perf_counter()
+
+
+def _s3_after_call(context, model, **kwargs):
+    started = context.get("metrics_started")
+    if started is not None:
+        _record("s3_calls", model.name, time.perf_counter() - started)
+
+
+def _instrument_s3_client(client):
+    client.meta.events.register("before-call.s3", _s3_before_call)
+    client.meta.events.register("after-call.s3", _s3_after_call)
+
+
+def _before_request():
+    g.metrics_started = time.perf_counter()
+    g.metrics_totals = _RequestTotals()
+    g.metrics_token = _request_totals.set(g.metrics_totals)
+
+
+def _after_request(response):
+    started = g.get("metrics_started")
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    _observe_route(request.endpoint or "unknown", request.method, response.status_code, elapsed)
+
+    timings = [f"app;dur={elapsed * 1000:.2f}"]
+    for store, (count, seconds) in sorted(g.metrics_totals.values.items()):
+        name, kind = store.split("_", 1)
+        timings.append(f'{name};desc="{count} {kind}";dur={seconds * 1000:.2f}')
+    response.headers.add("Server-Timing", ", ".join(timings))
+    return response
+
+
+def _teardown_request(exception=None):
+    token = g.pop("metrics_token", None)
+    if token is not None:
+        _request_totals.reset(token)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def render_metrics():
+    """
+    Returns every collected metric in the Prometheus text exposition format.
+    """
+    lines = [
+        "# HELP http_request_duration_seconds Route latency.",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    with _lock:
+        route_latency = {key: list(series) for key, series in _route_latency.items()}
+        store_calls = {key: list(calls) for key, calls in _store_calls.items()}
+    for (endpoint, method, status), series in sorted(route_latency.items()):
+        labels = f'endpoint="{_escape(endpoint)}",method="{method}",status="{status}"'
+        for bound, count in zip(LATENCY_BUCKETS, series):
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+        lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {series[-1]}')
+        lines.append(f"http_request_duration_seconds_sum{{{labels}}} {series[-2]:.6f}")
+        lines.append(f"http_request_duration_seconds_count{{{labels}}} {series[-1]}")
+
+    for store, (label_name, help_text) in STORES.items():
+        series = sorted((label, calls) for (name, label), calls in store_calls.items() if name == store)
+        lines.append(f"# HELP {store}_total Number of {help_text}.")
+        lines.append(f"# TYPE {store}_total counter")
+        for label, (count, _) in series:
+            lines.append(f'{store}_total{{{label_name}="{_escape(label)}"}} {count}')
+        lines.append(f"# HELP {store}_seconds_total Seconds spent in {help_text}.")
+        lines.append(f"# TYPE {store}_seconds_total counter")
+        for label, (_, seconds) in series:
+            lines.append(f'{store}_seconds_total{{{label_name}="{_escape(label)}"}} {seconds:.6f}')
+
+    fragment_stats = sorted(fragment_cache_service.get_stats().items())
+    for index, kind in enumerate(("hits", "misses")):
+        lines.append(f"# HELP fragment_cache_{kind}_total Fragment cache {kind}.")
+        lines.append(f"# TYPE fragment_cache_{kind}_total counter")
+        for fragment, counts in fragment_stats:
+            lines.append(f'fragment_cache_{kind}_total{{fragment="{_escape(fragment)}"}} {counts[index]}')
+
+    gauges = {f"db_pool_{key}": value for key, value in config.get_pool_stats().items()}
+    gauges.update({f"fragment_cache_{key}": value for key, value in fragment_cache_service.cache_size().items()})
+    gauges.update({f"ssh_tunnel_{key}": value for key, value in config.tunnel_stats.items()})
+    gauges.update({f"spaces_upload_{key}": value for key, value in digitalocean_space_service.upload_stats.items()})
+    for name, value in sorted(gauges.items()):
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def _metrics_view():
+    if METRICS_TOKEN:
+        scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not hmac.compare_digest(token.strip().encode(), METRICS_TOKEN.encode()):
+            return Response("Unauthorized\n", status=401, mimetype="text/plain",
+                            headers={"WWW-Authenticate": 'Bearer realm="metrics"'})
+    elif request.remote_addr not in LOCAL_ADDRESSES or "X-Forwarded-For" in request.headers:
+        # Behind a reverse proxy on this host every request looks local, refuse the proxied ones
+        return Response("Forbidden\n", status=403, mimetype="text/plain")
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+
+def init_app(app):
+    """
+    Registers the request hooks, store instrumentation and the /metrics route,
+    if METRICS_ENABLED is set. Call it before the first request. /metrics
+    requires METRICS_TOKEN as a bearer token, or a local request if it is unset.
+    """
+    if not METRICS_ENABLED:
+        return
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(Engine, "handle_error", _handle_error)
+    monitoring.register(_MongoCommandListener())  # Applies to MongoClients created afterwards
+    digitalocean_space_service.s3_client_hooks.append(_instrument_s3_client)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    app.add_url_rule("/metrics", "metrics", _metrics_view)
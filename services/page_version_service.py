@@ -0,0 +1,168 @@
+# services/page_version_service.py
+
+import hashlib
+import os
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from flask import request, session, Response
+from sqlalchemy import select, func
+from config import SessionLocal, get_mongo_db
+from models.case_model import Case
+from models.client_model import Client
+from models.worker_model import Worker
+from models.case_history_model import CaseHistory
+from models.case_repository import LIVE_CASES
+
+# ETag/Last-Modified on the dashboard and case pages: a refresh of an unchanged
+# page is answered 304 after one small indexed query per store, without
+# loading the cases or rendering the template
+CONDITIONAL_GET_ENABLED = os.getenv("CONDITIONAL_GET_ENABLED", "true").strip().lower() in ("1", "true", "yes", "on")
+
+# MySQL TIMESTAMPs have second resolution: a page whose data changed within the
+# last second could change again without its version changing, so it gets no validators
+FRESH_CHANGE_WINDOW = timedelta(seconds=1)
+
+PageVersion = namedtuple("PageVersion", ["etag", "last_modified"])
+
+_TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates")
+_templates_version = None
+
+
+def _get_templates_version():
+    # A deploy that changes the templates must not be answered with 304
+    global _templates_version
+    if _templates_version is None:
+        mtimes = [entry.stat().st_mtime_ns for entry in os.scandir(_TEMPLATES_DIR) if entry.is_file()]
+        _templates_version = max(mtimes, default=0)
+    return _templates_version
+
+
+def _version(user, now, *parts):
+    """
+    Builds a PageVersion from the data a page depends on, or None when it
+    changed too recently (or validators are disabled).
+    """
+    if not CONDITIONAL_GET_ENABLED:
+        return None
+    timestamps = [part for part in parts if isinstance(part, datetime)]
+    last_modified = max(timestamps, default=None)
+    if last_modified and now and last_modified > now - FRESH_CHANGE_WINDOW:
+        return None
+    key = repr((_get_templates_version(), user.id, user.role, user.name, request.query_string, *parts))
+    etag = hashlib.sha1(key.encode("utf-8")).hexdigest()
+    # The database returns naive timestamps, read as UTC for the header
+    return PageVersion(etag, last_modified.replace(tzinfo=timezone.utc) if last_modified else None)
+
+
+def dashboard_version(db_session, user):
+    """
+    Returns the version of the user's dashboard: newest updated_at of the cases
+    in their scope, newest archived_at of the cases archived from it, and newest
+    client update (client names are listed). One query of three MAX lookups,
+    each answered by one seek on the (worker_id, updated_at), (worker_id,
+    archived_at) or updated_at/archived_at indexes.
+
+    Args:
+        db_session: SQLAlchemy session.
+        user: The logged-in Worker.
+
+    Returns:
+        PageVersion: or None if no validators should be sent.
+    """
+    # The dashboard shows flashed messages, a later 304 would leave them pending
+    if not CONDITIONAL_GET_ENABLED or "_flashes" in session:
+        return None
+    # Soft-deleting a case bumps its updated_at. Once the archiver deletes the
+    # row the newest updated_at can fall back to an older version's value, the
+    # archived_at of its case_history copy keeps the version moving forward.
+    archived = select(func.max(CaseHistory.archived_at))
+    query = select(func.max(Case.updated_at))
+    if user.role != 'admin':
+        archived = archived.where(CaseHistory.worker_id == user.id)
+        query = query.where(Case.worker_id == user.id)
+    query = query.add_columns(
+        archived.scalar_subquery(),
+        select(func.max(Client.updated_at)).scalar_subquery(),
+        func.now(),
+    )
+    cases_updated_at, archived_at, clients_updated_at, now = db_session.execute(query).one()
+    return _version(user, now, cases_updated_at, archived_at, clients_updated_at)
+
+
+def case_version(user, case_id):
+    """
+    Returns the version of a case page: updated_at of the case, its client and
+    its assigned worker (one primary key join), plus the newest last_modified
+    and number of its documents (one aggregate on the (case_id, last_modified) index).
+
+    Args:
+        user: The logged-in Worker.
+        case_id: Id of the case.
+
+    Returns:
+        PageVersion: or None if the case does not exist, the user may not view
+        it (the page itself reports that) or no validators should be sent.
+    """
+    # The case page shows flashed messages, a later 304 would show them again
+    if not CONDITIONAL_GET_ENABLED or "_flashes" in session:
+        return None
+    with SessionLocal() as db_session:
+        row = db_session.execute(
+            select(Case.worker_id, Case.updated_at, Client.updated_at, Worker.updated_at, func.now())
+            .join(Client, Case.client_id == Client.id)
+            .join(Worker, Case.worker_id == Worker.id)
+            .where(Case.id == case_id, LIVE_CASES)
+        ).first()
+    if row is None:
+        return None
+    worker_id, case_updated_at, client_updated_at, worker_updated_at, now = row
+    if user.role != 'admin' and worker_id != user.id:
+        return None
+
+    summary = next(get_mongo_db().documents.aggregate([
+        {"$match": {"case_id": case_id}},
+        {"$group": {"_id": None, "last_modified": {"$max": "$last_modified"}, "count": {"$sum": 1}}},
+    ]), {"last_modified": None, "count": 0})
+    version = _version(user, now, case_updated_at, client_updated_at, worker_updated_at)
+    if version is None:
+        return None
+    # Document timestamps have millisecond resolution, they only go into the ETag
+    documents = f"{summary['last_modified']}:{summary['count']}"
+    etag = hashlib.sha1(f"{version.etag}:{documents}".encode("utf-8")).hexdigest()
+    last_modified = version.last_modified
+    if summary["last_modified"] is not None:
+        document_modified = summary["last_modified"].replace(tzinfo=timezone.utc, microsecond=0)
+        last_modified = max(filter(None, (last_modified, document_modified)))
+    return PageVersion(etag, last_modified)
+
+
+def not_modified(version):
+    """
+    Returns a 304 response if the request's If-None-Match (or, without it,
+    If-Modified-Since) matches the version, otherwise None.
+    """
+    if version is None:
+        return None
+    if request.if_none_match:
+        matched = request.if_none_match.contains_weak(version.etag)
+    elif request.if_modified_since and version.last_modified:
+        matched = version.last_modified <= request.if_modified_since
+    else:
+        matched = False
+    if not matched:
+        return None
+    return add_version_headers(Response(status=304), version)
+
+
+def add_version_headers(response, version):
+    """
+    Sets ETag and Last-Modified on a page response. The page is per user and
+    must be revalidated on every use, hence private, no-cache.
+    """
+    if version is None:
+        return response
+    response.set_etag(version.etag, weak=True)
+    if version.last_modified:
+        response.last_modified = version.last_modified
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
@@ -0,0 +1,121 @@
+# services/profiler_service.py
+
+import cProfile
+import os
+import random
+import re
+import threading
+import time
+from datetime import datetime
+from flask import g, request
+from services.identity_service import get_current_worker
+
+# Sampling profiler for slow routes. Unless PROFILER_ENABLED is set no hooks are
+# registered at all, so a disabled profiler costs nothing per request.
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "false").strip().lower() in ("1", "true", "yes", "on")
+PROFILER_SAMPLE_RATE = float(os.getenv("PROFILER_SAMPLE_RATE", "0.01"))
+PROFILE_ENDPOINTS = {name.strip() for name in os.getenv("PROFILE_ENDPOINTS", "").split(",") if name.strip()}
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "profiles"))
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "50"))
+
+# cProfile can only run one profiler per process at a time, so requests that
+# overlap a profiled one are simply not profiled
+_profiler_lock = threading.Lock()
+_ring_lock = threading.Lock()
+_PROFILE_NAME = re.compile(r"^[\w.-]+\.prof$")
+
+
+def _should_profile():
+    if PROFILE_ENDPOINTS and request.endpoint not in PROFILE_ENDPOINTS:
+        return False
+    if random.random() < PROFILER_SAMPLE_RATE:
+        return True
+    # Admins can ask for a specific request to be profiled with ?profile=1
+    if request.args.get("profile") == "1":
+        user = get_current_worker()
+        return user is not None and user.role == 'admin'
+    return False
+
+
+def _start_profile():
+    if not _should_profile() or not _profiler_lock.acquire(blocking=False):
+        return
+    profiler = cProfile.Profile()
+    g.profiler = profiler
+    g.profile_started = time.perf_counter()
+    profiler.enable()
+
+
+def _finish_profile(exception=None):
+    profiler = g.pop("profiler", None)
+    if profiler is None:
+        return
+    try:
+        profiler.disable()
+        elapsed_ms = (time.perf_counter() - g.profile_started) * 1000
+        _write_profile(profiler, request.endpoint or "unknown", request.method, elapsed_ms)
+    except OSError as e:
+        print(f"Error writing profile: {e}")
+    finally:
+        _profiler_lock.release()
+
+
+def _write_profile(profiler, endpoint, method, elapsed_ms):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+    file_name = f"{stamp}-{endpoint}-{method}-{elapsed_ms:.0f}ms.prof"
+    profiler.dump_stats(os.path.join(PROFILE_DIR, file_name))
+    print(f"Profiled {method} {endpoint} ({elapsed_ms:.0f}ms) to {file_name}")
+
+    # Keep only the newest PROFILE_MAX_FILES profiles
+    with _ring_lock:
+        for old in list_profiles()[PROFILE_MAX_FILES:]:
+            try:
+                os.remove(os.path.join(PROFILE_DIR, old["name"]))
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles():
+    """
+    Returns the stored profiles, newest first.
+
+    Returns:
+        list: Dicts with name, size (bytes) and created (datetime).
+    """
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for entry in os.scandir(PROFILE_DIR):
+        if entry.is_file() and _PROFILE_NAME.match(entry.name):
+            stat = entry.stat()
+            profiles.append({
+                "name": entry.name,
+                "size": stat.st_size,
+                "created": datetime.fromtimestamp(stat.st_mtime),
+            })
+    profiles.sort(key=lambda profile: profile["name"], reverse=True)
+    return profiles
+
+
+def profile_path(name):
+    """
+    Returns the path of a stored profile, or None if the name is not a profile file.
+    """
+    if not _PROFILE_NAME.match(name):
+        return None
+    path = os.path.join(PROFILE_DIR, name)
+    return path if os.path.isfile(path) else None
+
+
+def init_app(app):
+    """
+    Registers the profiling hooks if PROFILER_ENABLED is set. Each sampled
+    request (or an admin request with ?profile=1) is profiled with cProfile and
+    written to PROFILE_DIR as a .prof file for pstats/snakeviz. Only the request
+    thread is profiled, work handed to other threads shows up as waiting.
+    """
+    if not PROFILER_ENABLED:
+        return
+    app.before_request(_start_profile)
+    app.teardown_request(_finish_profile)
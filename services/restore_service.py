@@ -0,0 +1,409 @@
+# services/restore_service.py
+
+import gzip
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from config import get_mongo_uri, MONGO_DB_NAME
+from services.backup_service import (
+    list_backups, verify_backup, mysql_client_args, BACKUP_DIR, COPY_CHUNK_SIZE,
+    MYSQL_DUMP_FILE, MONGO_DUMP_FILE, OPLOG_FILE
+)
+from services.document_service import ensure_document_indexes
+
+# Parallel mysql clients / mongorestore workers used by a restore
+RESTORE_THREADS = int(os.getenv("RESTORE_THREADS", "4"))
+# Table data is split into files of about this many MB, loaded concurrently
+RESTORE_CHUNK_MB = int(os.getenv("RESTORE_CHUNK_MB", "64"))
+
+# Secondary indexes and foreign keys are left out of CREATE TABLE and added
+# once the rows are loaded, which is much faster than maintaining them per row
+_DEFERRED_LINE = re.compile(rb"^\s*(KEY|FULLTEXT KEY|SPATIAL KEY|CONSTRAINT) ")
+_TABLE_STRUCTURE = re.compile(rb"^-- Table structure for table `([^`]+)`")
+_TABLE_DATA = re.compile(rb"^-- Dumping data for table `([^`]+)`")
+
+# Prepended to every file loaded in parallel
+_LOAD_SETTINGS = (
+    b"SET SESSION foreign_key_checks = 0;\n"
+    b"SET SESSION unique_checks = 0;\n"
+    b"SET SESSION autocommit = 0;\n"
+)
+
+
+class _PhaseTimer:
+    """
+    Wall-clock seconds per restore phase, filled from several threads.
+    """
+
+    def __init__(self):
+        self.seconds = {}
+        self._lock = threading.Lock()
+
+    def run(self, phase, function, *args):
+        started = time.perf_counter()
+        result = function(*args)
+        with self._lock:
+            self.seconds[phase] = round(time.perf_counter() - started, 3)
+        print(f"{phase}: {self.seconds[phase]:.1f}s")
+        return result
+
+
+def parse_time(value):
+    """
+    Parses an ISO 8601 time, read as UTC when it has no offset.
+    """
+    moment = datetime.fromisoformat(value)
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+def restore_plan(backup_dir=BACKUP_DIR, name=None, until=None):
+    """
+    Picks the full backup and the incrementals to apply.
+
+    Args:
+        backup_dir: Folder holding the backups.
+        name: Full backup to start from (default: the newest one taken before until).
+        until: Optional aware datetime to recover to.
+
+    Returns:
+        tuple: (full backup manifest, incremental manifests in order)
+    """
+    backups = list_backups(backup_dir)
+    fulls = [manifest for manifest in backups if manifest["type"] == "full"]
+    if name:
+        fulls = [manifest for manifest in fulls if manifest["name"] == name]
+    elif until:
+        fulls = [manifest for manifest in fulls if parse_time(manifest["created_at"]) <= until]
+    if not fulls:
+        raise RuntimeError("No full backup matches, see `backup.py list`.")
+    full = fulls[-1]
+
+    incrementals = []
+    for manifest in backups:
+        if manifest["type"] != "incremental" or manifest["base"] != full["name"]:
+            continue
+        incrementals.append(manifest)
+        # The first incremental taken after the target time already contains it
+        if until and parse_time(manifest["created_at"]) >= until:
+            break
+    return full, incrementals
+
+
+def _run_mysql(path, database=None):
+    args, env, default_database = mysql_client_args()
+    command = ["mysql", *args, "--default-character-set=utf8mb4", database or default_database]
+    with open(path, "rb") as stream:
+        completed = subprocess.run(command, stdin=stream, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if completed.returncode != 0:
+        raise RuntimeError(f"mysql exited with {completed.returncode} on {os.path.basename(path)}: "
+                           f"{completed.stderr.decode(errors='replace')[-500:]}")
+
+
+def split_mysql_dump(dump_path, work_dir, chunk_bytes=None):
+    """
+    Splits a gzipped mysqldump into files that can be loaded in parallel:
+    the table definitions (without secondary indexes and foreign keys), data
+    chunks of about chunk_bytes of INSERT statements, and what comes after the
+    data (triggers, routines, views).
+
+    Returns:
+        dict: "schema" and "footer" paths, "chunks" as (table, path) pairs, and
+        "deferred" mapping each table to its index and foreign key definitions.
+    """
+    chunk_bytes = chunk_bytes or RESTORE_CHUNK_MB * 1024 * 1024
+    header = []
+    deferred = {}
+    chunks = []
+    schema = open(os.path.join(work_dir, "schema.sql"), "wb")
+    footer = open(os.path.join(work_dir, "footer.sql"), "wb")
+    chunk = None
+    chunk_size = 0
+    section = "header"
+    table = None
+    create_body = None
+
+    def close_chunk():
+        nonlocal chunk
+        if chunk is not None:
+            chunk.write(b"COMMIT;\n")
+            chunk.close()
+            chunk = None
+
+    try:
+        with gzip.open(dump_path, "rb") as dump:
+            for line in dump:
+                structure = _TABLE_STRUCTURE.match(line)
+                data = _TABLE_DATA.match(line)
+                if structure or line.startswith(b"-- Temporary view structure"):
+                    if section == "header":
+                        schema.writelines(header)
+                        footer.writelines(header)
+                    close_chunk()
+                    section, table = "schema", structure.group(1).decode() if structure else None
+                elif data:
+                    section, table = "data", data.group(1).decode()
+                    chunk_size = chunk_bytes  # Start a new chunk for each table
+                elif line.startswith(b"-- Final view structure") or line.startswith(b"-- Dumping routines") \
+                        or line.startswith(b"-- Dumping events"):
+                    close_chunk()
+                    section = "footer"
+
+                if section == "header":
+                    header.append(line)
+                elif section == "schema":
+                    if create_body is not None:
+                        if line.startswith(b")"):
+                            kept = [body.rstrip(b",\n") for body in create_body if not _DEFERRED_LINE.match(body)]
+                            deferred.setdefault(table, []).extend(
+                                body.strip().rstrip(b",").decode() for body in create_body if _DEFERRED_LINE.match(body)
+                            )
+                            schema.write(b",\n".join(kept) + b"\n")
+                            schema.write(line)
+                            create_body = None
+                        else:
+                            create_body.append(line)
+                    else:
+                        schema.write(line)
+                        if line.startswith(b"CREATE TABLE"):
+                            create_body = []
+                elif section == "data":
+                    if line.startswith(b"INSERT INTO"):
+                        if chunk_size >= chunk_bytes:
+                            close_chunk()
+                            path = os.path.join(work_dir, f"{table}.{len(chunks):05d}.sql")
+                            chunk = open(path, "wb")
+                            chunk.writelines(header)
+                            chunk.write(_LOAD_SETTINGS)
+                            chunks.append((table, path))
+                            chunk_size = 0
+                        chunk.write(line)
+                        chunk_size += len(line)
+                    elif line.startswith(b"UNLOCK TABLES"):
+                        close_chunk()
+                        section = "footer"  # Triggers of the table follow its data
+                else:
+                    footer.write(line)
+    finally:
+        close_chunk()
+        schema.close()
+        footer.close()
+    return {
+        "schema": os.path.join(work_dir, "schema.sql"),
+        "footer": os.path.join(work_dir, "footer.sql"),
+        "chunks": chunks,
+        "deferred": deferred,
+    }
+
+
+def _index_statements(table, definitions):
+    """
+    Builds the ALTER TABLE statements that add back the deferred definitions of
+    a table: the plain indexes in one statement, each FULLTEXT index on its own
+    (InnoDB builds one at a time), then the foreign keys.
+    """
+    keys = [definition for definition in definitions if definition.startswith(("KEY", "SPATIAL KEY"))]
+    fulltext = [definition for definition in definitions if definition.startswith("FULLTEXT KEY")]
+    constraints = [definition for definition in definitions if definition.startswith("CONSTRAINT")]
+    statements = []
+    if keys:
+        statements.append(f"ALTER TABLE `{table}` " + ", ".join(f"ADD {key}" for key in keys) + ";")
+    statements.extend(f"ALTER TABLE `{table}` ADD {key};" for key in fulltext)
+    if constraints:
+        statements.append(f"ALTER TABLE `{table}` " + ", ".join(f"ADD {key}" for key in constraints) + ";")
+    return statements
+
+
+def restore_mysql(full, backup_dir, work_dir, timer, threads=RESTORE_THREADS):
+    """
+    Restores the MySQL part of a full backup: tables created first, rows loaded
+    by threads concurrent mysql clients, then indexes and foreign keys rebuilt
+    table by table in parallel.
+    """
+    args, env, database = mysql_client_args()
+    completed = subprocess.run(
+        ["mysql", *args, "-e", f"CREATE DATABASE IF NOT EXISTS `{database}`"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"mysql exited with {completed.returncode}: {completed.stderr.decode(errors='replace')}")
+
+    folder = os.path.join(work_dir, "mysql")
+    os.makedirs(folder)
+    parts = timer.run("mysql split", split_mysql_dump, os.path.join(backup_dir, full["name"], MYSQL_DUMP_FILE), folder)
+    timer.run("mysql schema", _run_mysql, parts["schema"])
+
+    def load():
+        # Largest chunks first, so a big table does not finish last on its own
+        paths = sorted((path for _, path in parts["chunks"]), key=os.path.getsize, reverse=True)
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(_run_mysql, paths))
+
+    timer.run("mysql load", load)
+
+    def rebuild_indexes():
+        scripts = []
+        for table, definitions in parts["deferred"].items():
+            if not table or not definitions:
+                continue
+            path = os.path.join(folder, f"{table}.indexes.sql")
+            with open(path, "w", encoding="utf-8") as stream:
+                stream.write("SET SESSION foreign_key_checks = 0;\n")
+                stream.write("\n".join(_index_statements(table, definitions)) + "\n")
+            scripts.append(path)
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(_run_mysql, scripts))
+
+    timer.run("mysql indexes", rebuild_indexes)
+    timer.run("mysql triggers and routines", _run_mysql, parts["footer"])
+
+
+def replay_binlogs(full, incrementals, backup_dir, work_dir, until=None):
+    """
+    Replays the binary logs of the incrementals with mysqlbinlog, from the
+    position of the full backup up to the last incremental, or until (UTC).
+    """
+    # A binlog file that was still being written appears in two incrementals, the later copy is complete
+    files = {}
+    for manifest in incrementals:
+        for name in manifest["mysql"]["binlogs"]:
+            files[name] = os.path.join(backup_dir, manifest["name"], "binlog", f"{name}.gz")
+    start = full["mysql"]["end"]
+    names = [name for name in sorted(files) if name >= start["file"]]
+    if not names:
+        return
+
+    folder = os.path.join(work_dir, "binlog")
+    os.makedirs(folder)
+    for name in names:
+        with gzip.open(files[name], "rb") as source, open(os.path.join(folder, name), "wb") as target:
+            shutil.copyfileobj(source, target, COPY_CHUNK_SIZE)
+
+    args, env, database = mysql_client_args()
+    command = ["mysqlbinlog", "--skip-gtids", f"--database={database}", f"--start-position={start['position']}"]
+    if until:
+        command.append(f"--stop-datetime={until:%Y-%m-%d %H:%M:%S}")
+    else:
+        command.append(f"--stop-position={incrementals[-1]['mysql']['end']['position']}")
+    command.extend(os.path.join(folder, name) for name in names)
+
+    # TZ=UTC makes mysqlbinlog read --stop-datetime as UTC
+    with subprocess.Popen(command, stdout=subprocess.PIPE, env=dict(env, TZ="UTC")) as binlog:
+        completed = subprocess.run(["mysql", *args, database], stdin=binlog.stdout, env=env,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        binlog.stdout.close()
+        binlog_code = binlog.wait()
+    if binlog_code != 0 or completed.returncode != 0:
+        raise RuntimeError(f"Binlog replay failed (mysqlbinlog {binlog_code}, mysql {completed.returncode}): "
+                           f"{completed.stderr.decode(errors='replace')[-500:]}")
+
+
+def restore_mongo(full, backup_dir, timer, threads=RESTORE_THREADS):
+    """
+    Restores the documents database from the full backup's archive with
+    mongorestore --drop --noIndexRestore, then builds the indexes once with
+    ensure_document_indexes.
+    """
+    def load():
+        command = [
+            "mongorestore", f"--uri={get_mongo_uri()}", "--archive", "--drop", "--noIndexRestore",
+            f"--nsInclude={MONGO_DB_NAME}.*", f"--numParallelCollections={threads}",
+            f"--numInsertionWorkersPerCollection={threads}",
+        ]
+        # mongorestore logs progress constantly, a file keeps its stderr from filling up and blocking it
+        with tempfile.TemporaryFile() as log, subprocess.Popen(
+            command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=log
+        ) as process:
+            try:
+                with gzip.open(os.path.join(backup_dir, full["name"], MONGO_DUMP_FILE), "rb") as archive:
+                    shutil.copyfileobj(archive, process.stdin, COPY_CHUNK_SIZE)
+            finally:
+                process.stdin.close()
+            returncode = process.wait()
+            log.seek(0)
+            stderr = log.read()
+        if returncode != 0:
+            raise RuntimeError(f"mongorestore exited with {returncode}: {stderr.decode(errors='replace')[-500:]}")
+
+    timer.run("mongo load", load)
+    timer.run("mongo indexes", ensure_document_indexes)
+
+
+def replay_oplog(incrementals, backup_dir, work_dir, until=None):
+    """
+    Replays the oplog entries of the incrementals with mongorestore
+    --oplogReplay, stopping before until when given.
+    """
+    folder = os.path.join(work_dir, "oplog")
+    os.makedirs(folder)
+    with open(os.path.join(folder, "oplog.bson"), "wb") as oplog:
+        for manifest in incrementals:
+            with gzip.open(os.path.join(backup_dir, manifest["name"], OPLOG_FILE), "rb") as source:
+                shutil.copyfileobj(source, oplog, COPY_CHUNK_SIZE)
+
+    command = ["mongorestore", f"--uri={get_mongo_uri()}", "--oplogReplay"]
+    if until:
+        command.append(f"--oplogLimit={int(until.timestamp())}:0")
+    command.append(folder)
+    completed = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if completed.returncode != 0:
+        raise RuntimeError(f"mongorestore exited with {completed.returncode}: "
+                           f"{completed.stderr.decode(errors='replace')[-500:]}")
+
+
+def restore_backup(backup_dir=BACKUP_DIR, name=None, until=None, threads=RESTORE_THREADS, work_dir=None, replay=True):
+    """
+    Restores MySQL and MongoDB in parallel from a full backup, then replays
+    the binlog/oplog of its incrementals, up to until if given. The files of
+    every backup used are checked against their manifest first.
+
+    Args:
+        backup_dir: Folder holding the backups.
+        name: Full backup to restore (default: the newest, or the newest before until).
+        until: Optional point in time (ISO 8601, UTC unless an offset is given).
+        threads: Parallel loaders for each database.
+        work_dir: Folder for the temporary files (default: inside backup_dir).
+        replay: Whether to replay the incrementals, False restores the full backup only.
+
+    Returns:
+        dict: Backups used and seconds taken per phase and in total.
+    """
+    until = parse_time(until) if isinstance(until, str) else until
+    full, incrementals = restore_plan(backup_dir, name, until)
+    if not replay:
+        incrementals = []
+    for manifest in [full, *incrementals]:
+        problems = verify_backup(manifest["name"], backup_dir)
+        if problems:
+            raise RuntimeError(f"{manifest['name']} is damaged: {'; '.join(problems)}")
+
+    timer = _PhaseTimer()
+    started = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix="restore-", dir=work_dir or backup_dir) as work:
+        def mysql():
+            restore_mysql(full, backup_dir, work, timer, threads)
+            if incrementals:
+                timer.run("mysql binlog replay", replay_binlogs, full, incrementals, backup_dir, work, until)
+
+        def mongo():
+            restore_mongo(full, backup_dir, timer, threads)
+            if incrementals:
+                timer.run("mongo oplog replay", replay_oplog, incrementals, backup_dir, work, until)
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            jobs = [pool.submit(mysql), pool.submit(mongo)]
+            for job in jobs:
+                job.result()
+
+    return {
+        "full": full["name"],
+        "incrementals": [manifest["name"] for manifest in incrementals],
+        "until": until.isoformat() if until else None,
+        "phases": timer.seconds,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
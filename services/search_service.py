@@ -0,0 +1,130 @@
+# services/search_service.py
+
+import os
+import re
+from collections import defaultdict
+from pymongo.errors import OperationFailure
+from sqlalchemy import or_
+from sqlalchemy.dialects.mysql import match
+from config import get_mongo_db
+from models.case_model import Case
+from models.case_repository import case_query, DASHBOARD_LIST, LIVE_CASES
+from services.case_service import scope_cases_for_user
+
+SEARCH_PAGE_SIZE = 20
+# Hits taken from each store before merging. Bounds the work per search no
+# matter how many cases match, deeper pages than this are not served.
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", "200"))
+# How much a matching document counts next to a match on the case itself
+DOCUMENT_MATCH_WEIGHT = 0.5
+
+SEARCH_DOCUMENT_FIELDS = ("document_title", "document_description", "document_tags")
+
+
+def _terms(query_text):
+    return [term for term in re.split(r"\s+", query_text.strip()) if term][:10]
+
+
+def _like_pattern(term):
+    return "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def _search_case_rows(db_session, user, query_text, limit):
+    # MySQL: ranked by the FULLTEXT index on title, description and judge name
+    if db_session.get_bind().dialect.name == "mysql":
+        score = match(Case.case_title, Case.case_description, Case.judge_name, against=query_text).in_natural_language_mode()
+        query = db_session.query(Case.id, score.label("score")).filter(score > 0, LIVE_CASES)
+        query = scope_cases_for_user(query, user).order_by(score.desc(), Case.id.desc())
+        return [(case_id, float(rank)) for case_id, rank in query.limit(limit)]
+
+    # Other databases (local SQLite): every term must appear in one of the columns, newest first
+    columns = (Case.case_title, Case.case_description, Case.judge_name)
+    conditions = [or_(*(column.ilike(_like_pattern(term), escape="\\") for column in columns)) for term in _terms(query_text)]
+    query = scope_cases_for_user(db_session.query(Case.id).filter(LIVE_CASES, *conditions), user)
+    return [(case_id, 1.0) for case_id, in query.order_by(Case.id.desc()).limit(limit)]
+
+
+def _search_documents(query_text, limit):
+    # Not scoped here: search_cases keeps the hits on cases the user may see,
+    # with one MySQL query over at most `limit` case ids
+    documents = get_mongo_db().documents
+    try:
+        return list(documents.aggregate([
+            {"$match": {"$text": {"$search": query_text}}},
+            {"$sort": {"score": {"$meta": "textScore"}}},
+            {"$limit": limit},
+            {"$project": {"case_id": 1, "document_title": 1, "score": {"$meta": "textScore"}}},
+        ]))
+    except OperationFailure:
+        # No text index: fall back to unranked regex matching
+        conditions = [
+            {"$or": [{field: {"$regex": re.escape(term), "$options": "i"}} for field in SEARCH_DOCUMENT_FIELDS]}
+            for term in _terms(query_text)
+        ]
+        cursor = documents.find({"$and": conditions}, {"case_id": 1, "document_title": 1}).limit(limit)
+        return [dict(document, score=1.0) for document in cursor]
+
+
+def search_cases(db_session, user, query_text, page=1, page_size=SEARCH_PAGE_SIZE):
+    """
+    Searches the cases the user may see, by their own text in MySQL and by their
+    documents' titles, descriptions and tags in MongoDB, and merges both into one
+    ranked list. Scores are normalised per store, so a case matching in both ranks
+    above one matching in either.
+
+    Args:
+        db_session: SQLAlchemy session.
+        user: The logged-in Worker.
+        query_text: Words to search for.
+        page: 1-based page number.
+        page_size: Results per page.
+
+    Returns:
+        dict: results (list of dicts with case, score and matching document titles),
+              page, page_size, total and has_next.
+    """
+    page = max(1, page)
+    if not _terms(query_text):
+        return {"results": [], "page": page, "page_size": page_size, "total": 0, "has_next": False}
+
+    scores = defaultdict(float)
+    case_rows = _search_case_rows(db_session, user, query_text, SEARCH_MAX_RESULTS)
+    best_case_score = max((rank for _, rank in case_rows), default=0) or 1
+    for case_id, rank in case_rows:
+        scores[case_id] += rank / best_case_score
+
+    documents = _search_documents(query_text, SEARCH_MAX_RESULTS)
+    # Cases found only through their documents still have to be live and pass
+    # the role filter (documents follow their case, whoever uploaded them)
+    visible = set(scores)
+    document_only = {document["case_id"] for document in documents} - visible
+    if document_only:
+        query = scope_cases_for_user(db_session.query(Case.id).filter(Case.id.in_(document_only), LIVE_CASES), user)
+        visible |= {case_id for case_id, in query}
+    documents = [document for document in documents if document["case_id"] in visible]
+
+    best_document_score = max((document["score"] for document in documents), default=0) or 1
+    matched_documents = defaultdict(list)
+    document_scores = defaultdict(float)
+    for document in documents:
+        case_id = document["case_id"]
+        matched_documents[case_id].append(document.get("document_title"))
+        document_scores[case_id] = max(document_scores[case_id], document["score"] / best_document_score)
+    for case_id, rank in document_scores.items():
+        scores[case_id] += DOCUMENT_MATCH_WEIGHT * rank
+
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+    start = (page - 1) * page_size
+    page_ids = [case_id for case_id, _ in ranked[start:start + page_size]]
+    cases = {case.id: case for case in case_query(db_session, DASHBOARD_LIST).filter(Case.id.in_(page_ids))} if page_ids else {}
+
+    return {
+        "results": [
+            {"case": cases[case_id], "score": scores[case_id], "documents": matched_documents.get(case_id, [])}
+            for case_id in page_ids if case_id in cases
+        ],
+        "page": page,
+        "page_size": page_size,
+        "total": len(ranked),
+        "has_next": start + page_size < len(ranked),
+    }
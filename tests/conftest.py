@@ -0,0 +1,59 @@
+"""
+Runs the app against the benchmark stand-ins (SQLite, mongomock, moto), see
+benchmarks/stand_ins.py, seeded once per test session. Needs the packages in
+benchmarks/requirements.txt.
+"""
+import os
+import pytest
+
+# Pages are measured without their validators and fragment cache, tests that
+# need them switch them on
+os.environ["CONDITIONAL_GET_ENABLED"] = "false"
+os.environ["FRAGMENT_CACHE_BACKEND"] = "none"
+
+# Before the test modules are collected: config and the services read their
+# settings from the environment when they are first imported
+from benchmarks.stand_ins import boot  # noqa: E402
+
+_app = boot()
+
+
+@pytest.fixture(scope="session")
+def app():
+    return _app
+
+
+@pytest.fixture(scope="session")
+def data(app):
+    from benchmarks.seed import seed
+    return seed(workers=6, clients=20, cases=60, documents_per_case=2, distinct_files=3)
+
+
+@pytest.fixture
+def login(app, data):
+    """
+    Returns a function giving a test client logged in as the given worker. The
+    worker is resolved once up front, so its lookup is not counted in the page.
+    """
+    def logged_in(worker_id):
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['user'] = worker_id
+        client.get('/dashboard')
+        return client
+    return logged_in
+
+
+@pytest.fixture(scope="session")
+def cases_by_worker(data):
+    """
+    Seeded case ids per lawyer, for tests that need cases of different workers.
+    """
+    from config import SessionLocal
+    from models.case_model import Case
+
+    cases = {}
+    with SessionLocal() as db_session:
+        for worker_id, case_id in db_session.query(Case.worker_id, Case.id).order_by(Case.id):
+            cases.setdefault(worker_id, []).append(case_id)
+    return cases
@@ -0,0 +1,41 @@
+"""
+Helpers shared by the tests and the benchmarks.
+"""
+from contextlib import contextmanager
+from sqlalchemy import event
+from config import get_engine
+
+
+@contextmanager
+def count_statements(engine=None):
+    """
+    Counts the SQL statements executed on the engine inside the block, e.g.
+
+        with count_statements() as statements:
+            client.get('/dashboard')
+        assert len(statements) <= 3, statements
+
+    Yields:
+        list: The executed statements, filled as they run.
+    """
+    engine = engine or get_engine()
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+@contextmanager
+def assert_max_statements(limit, engine=None):
+    """
+    Fails with AssertionError if the block runs more than `limit` SQL statements.
+    """
+    with count_statements(engine) as statements:
+        yield statements
+    assert len(statements) <= limit, f"Expected at most {limit} statements, ran {len(statements)}:\n" + "\n".join(statements)
@@ -0,0 +1,49 @@
+"""
+Deleting cases (services/archiver_service.py): delete_case only flags them, so
+they leave the dashboard and search at once, and the archiver later moves them
+into case_history and removes their documents.
+"""
+import hashlib
+import io
+from sqlalchemy import select
+from config import SessionLocal, get_mongo_db
+from models.case_model import Case
+from models.case_history_model import CaseHistory
+from services.archiver_service import archive_deleted_cases
+from services.digitalocean_space_service import content_key, object_exists
+from tests.test_search import _search
+
+
+def test_deleted_cases_are_hidden_then_archived(login, data, cases_by_worker):
+    worker_id = list(cases_by_worker)[-2]
+    case_ids = [case_id for case_id in cases_by_worker[worker_id][1:] if case_id != data["case_ids"][0]][-2:]
+    content = b"quokka affidavit"
+    client = login(worker_id)
+    for case_id in case_ids:
+        client.post(f'/upload_document/{case_id}', content_type='multipart/form-data', data={
+            "document_title": "Quokka affidavit",
+            "document_description": "Sworn statement",
+            "document": (io.BytesIO(content), "quokka.txt"),
+        })
+    assert sorted(_search(worker_id, "quokka")) == sorted(case_ids)
+
+    for case_id in case_ids:
+        assert client.post(f'/delete_case/{case_id}').status_code == 302
+    dashboard = client.get('/dashboard').get_data(as_text=True)
+    for case_id in case_ids:
+        assert f'/view_case/{case_id}"' not in dashboard
+    assert _search(worker_id, "quokka") == []
+    assert _search(data["admin_id"], "quokka") == []
+
+    assert archive_deleted_cases(batch_size=10, max_batches=1) == len(case_ids)
+    with SessionLocal() as db_session:
+        assert db_session.scalars(select(Case.id).where(Case.id.in_(case_ids))).all() == []
+        archived = db_session.scalars(select(CaseHistory.case_id).where(CaseHistory.case_id.in_(case_ids))).all()
+        assert sorted(archived) == sorted(case_ids)
+    assert get_mongo_db().documents.count_documents({"case_id": {"$in": case_ids}}) == 0
+    assert not object_exists(content_key(hashlib.sha256(content).hexdigest(), "documents"))
+
+    # Nothing is left to archive
+    assert archive_deleted_cases(batch_size=10) == 0
+    with SessionLocal() as db_session:
+        assert db_session.query(CaseHistory).filter(CaseHistory.case_id.in_(case_ids)).count() == len(case_ids)
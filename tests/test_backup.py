@@ -0,0 +1,35 @@
+"""
+The mysqldump command of services/backup_service.py, which must match the
+client version and the server's binary logging.
+"""
+import pytest
+from services import backup_service
+
+
+def _binlog_off():
+    raise RuntimeError("Binary logging is disabled")
+
+
+@pytest.mark.parametrize("version, binlog_on, expected", [
+    (((8, 0, 36), False), True, ["--source-data=2", "--set-gtid-purged=OFF"]),
+    (((8, 0, 25), False), True, ["--master-data=2", "--set-gtid-purged=OFF"]),
+    (((5, 7, 44), False), True, ["--master-data=2", "--set-gtid-purged=OFF"]),
+    (((10, 11, 6), True), True, ["--master-data=2"]),
+    (((8, 0, 36), False), False, ["--set-gtid-purged=OFF"]),
+])
+def test_dump_mysql_options(tmp_path, monkeypatch, version, binlog_on, expected):
+    commands = []
+
+    def compress(command, path, env=None, keep_head=False):
+        commands.append(command)
+        return {"sha256": "", "bytes": 0}, b""
+
+    monkeypatch.setattr(backup_service, "mysqldump_version", lambda: version)
+    monkeypatch.setattr(backup_service, "binlog_status",
+                        (lambda: {"file": "binlog.000001", "position": 4}) if binlog_on else _binlog_off)
+    monkeypatch.setattr(backup_service, "_compress_command_output", compress)
+    files, coordinates = backup_service.dump_mysql(str(tmp_path))
+
+    options = [arg for arg in commands[0] if "-data=" in arg or "gtid" in arg]
+    assert options == expected
+    assert coordinates["end"] is None
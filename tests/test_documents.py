@@ -0,0 +1,65 @@
+"""
+Content-addressed document files (services/document_service.py): identical
+uploads share one file in the Space, referenced from the blobs collection, and
+the file is deleted with the last document that uses it.
+"""
+import hashlib
+import io
+import mongomock
+from config import get_mongo_db
+from services.digitalocean_space_service import content_key, object_exists
+from services.document_service import delete_documents_for_cases
+
+
+def _upload(client, case_id, content, title="Shared exhibit"):
+    return client.post(f'/upload_document/{case_id}', content_type='multipart/form-data', data={
+        "document_title": title,
+        "document_description": "Exhibit",
+        "document": (io.BytesIO(content), "exhibit.txt"),
+    })
+
+
+def _blob(content):
+    digest = hashlib.sha256(content).hexdigest()
+    return digest, get_mongo_db().blobs.find_one({"_id": digest})
+
+
+def test_shared_file_is_deleted_with_its_last_document(login, data, cases_by_worker):
+    worker_id = list(cases_by_worker)[-1]
+    first, second = cases_by_worker[worker_id][:2]
+    content = b"exhibit shared by two cases"
+    client = login(worker_id)
+    _upload(client, first, content)
+    _upload(client, second, content)
+
+    digest, blob = _blob(content)
+    assert blob["ref_count"] == 2
+    assert get_mongo_db().documents.count_documents({"content_hash": digest}) == 2
+    key = blob["key"]
+    assert key == content_key(digest, "documents")
+
+    assert delete_documents_for_cases([first]) == {}
+    assert _blob(content)[1]["ref_count"] == 1
+    assert object_exists(key)
+
+    assert delete_documents_for_cases([second]) == {}
+    assert _blob(content)[1] is None
+    assert not object_exists(key)
+
+
+def test_failed_document_insert_releases_the_file(login, data, cases_by_worker, monkeypatch):
+    def insert_fails(self, *args, **kwargs):
+        raise RuntimeError("insert failed")
+
+    worker_id = list(cases_by_worker)[-1]
+    case_id = cases_by_worker[worker_id][2]
+    content = b"exhibit whose document is never written"
+    client = login(worker_id)
+    monkeypatch.setattr(mongomock.collection.Collection, "insert_one", insert_fails)
+    response = _upload(client, case_id, content)
+    assert response.status_code == 302
+
+    digest, blob = _blob(content)
+    assert blob is None
+    assert not object_exists(content_key(digest, "documents"))
+    assert get_mongo_db().documents.count_documents({"content_hash": digest}) == 0
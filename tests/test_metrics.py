@@ -0,0 +1,36 @@
+"""
+The instrumentation of services/metrics_service.py, which the app only
+registers with METRICS_ENABLED: access to /metrics and the SQL statement timer.
+"""
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
+from services import metrics_service
+
+
+@pytest.mark.parametrize("token, headers, remote_addr, status", [
+    ("", {}, "127.0.0.1", 200),
+    ("", {}, "10.0.0.5", 403),
+    ("", {"X-Forwarded-For": "203.0.113.7"}, "127.0.0.1", 403),
+    ("s3cret", {}, "127.0.0.1", 401),
+    ("s3cret", {"Authorization": "Bearer wrong"}, "10.0.0.5", 401),
+    ("s3cret", {"Authorization": "Bearer s3cret"}, "10.0.0.5", 200),
+])
+def test_metrics_access(app, monkeypatch, token, headers, remote_addr, status):
+    monkeypatch.setattr(metrics_service, "METRICS_TOKEN", token)
+    with app.test_request_context('/metrics', headers=headers, environ_base={"REMOTE_ADDR": remote_addr}):
+        response = metrics_service._metrics_view()
+    assert response.status_code == status
+
+
+def test_failed_statement_is_timed_and_popped():
+    engine = create_engine("sqlite://")
+    event.listen(engine, "before_cursor_execute", metrics_service._before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", metrics_service._after_cursor_execute)
+    event.listen(engine, "handle_error", metrics_service._handle_error)
+    with engine.connect() as conn:
+        with pytest.raises(OperationalError):
+            conn.execute(text("SELECT * FROM missing_table"))
+        assert conn.info["metrics_started"] == []
+        conn.execute(text("SELECT 1"))
+        assert conn.info["metrics_started"] == []
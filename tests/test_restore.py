@@ -0,0 +1,213 @@
+"""
+Splitting a mysqldump for the parallel restore (services/restore_service.py):
+table definitions without their deferred indexes, data chunks, and the
+triggers, routines and views left for the end.
+"""
+import gzip
+from services.restore_service import split_mysql_dump, _index_statements, _LOAD_SETTINGS
+
+HEADER = b"""-- MySQL dump 10.13  Distrib 8.0.36, for Linux (x86_64)
+--
+-- Host: 127.0.0.1    Database: law_firm
+-- ------------------------------------------------------
+/*!40101 SET @OLD_CHARACTER_SET_CLIENT=@@CHARACTER_SET_CLIENT */;
+/*!40014 SET @OLD_FOREIGN_KEY_CHECKS=@@FOREIGN_KEY_CHECKS, FOREIGN_KEY_CHECKS=0 */;
+
+--
+-- Position to start replication or point-in-time recovery from
+--
+
+-- CHANGE REPLICATION SOURCE TO SOURCE_LOG_FILE='binlog.000042', SOURCE_LOG_POS=157;
+
+"""
+
+DUMP = HEADER + b"""--
+-- Table structure for table `cases`
+--
+
+DROP TABLE IF EXISTS `cases`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+CREATE TABLE `cases` (
+  `id` int NOT NULL AUTO_INCREMENT,
+  `client_id` int NOT NULL,
+  `case_title` varchar(255) NOT NULL,
+  `case_description` text,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `uq_cases_title` (`client_id`,`case_title`),
+  KEY `ix_cases_client_id` (`client_id`),
+  FULLTEXT KEY `ft_cases_text` (`case_title`,`case_description`),
+  CONSTRAINT `cases_ibfk_1` FOREIGN KEY (`client_id`) REFERENCES `clients` (`id`)
+) ENGINE=InnoDB AUTO_INCREMENT=3 DEFAULT CHARSET=utf8mb4;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Dumping data for table `cases`
+--
+
+LOCK TABLES `cases` WRITE;
+/*!40000 ALTER TABLE `cases` DISABLE KEYS */;
+INSERT INTO `cases` VALUES (1,1,'Case 1','First');
+INSERT INTO `cases` VALUES (2,1,'Case 2','Second');
+/*!40000 ALTER TABLE `cases` ENABLE KEYS */;
+UNLOCK TABLES;
+/*!50003 SET @saved_sql_mode       = @@sql_mode */ ;
+DELIMITER ;;
+/*!50003 CREATE*/ /*!50017 DEFINER=`app`@`%`*/ /*!50003 TRIGGER `cases_touch` BEFORE UPDATE ON `cases` FOR EACH ROW SET NEW.case_title = TRIM(NEW.case_title) */;;
+DELIMITER ;
+/*!50003 SET sql_mode              = @saved_sql_mode */ ;
+
+--
+-- Table structure for table `case_history`
+--
+
+DROP TABLE IF EXISTS `case_history`;
+CREATE TABLE `case_history` (
+  `id` int NOT NULL AUTO_INCREMENT,
+  `case_id` int NOT NULL,
+  `archived_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`id`,`archived_at`),
+  KEY `ix_case_history_case_id_archived_at` (`case_id`,`archived_at`),
+  KEY `ix_case_history_archived_at` (`archived_at`)
+) ENGINE=InnoDB AUTO_INCREMENT=2 DEFAULT CHARSET=utf8mb4
+/*!50100 PARTITION BY RANGE (unix_timestamp(`archived_at`))
+(PARTITION p202601 VALUES LESS THAN (1769904000) ENGINE = InnoDB,
+ PARTITION p_future VALUES LESS THAN MAXVALUE ENGINE = InnoDB) */;
+
+--
+-- Dumping data for table `case_history`
+--
+
+LOCK TABLES `case_history` WRITE;
+INSERT INTO `case_history` VALUES (1,7,'2026-01-15 10:00:00');
+UNLOCK TABLES;
+
+--
+-- Temporary view structure for view `open_cases`
+--
+
+DROP TABLE IF EXISTS `open_cases`;
+/*!50001 DROP VIEW IF EXISTS `open_cases`*/;
+/*!50001 CREATE VIEW `open_cases` AS SELECT
+ 1 AS `id`,
+ 1 AS `case_title`*/;
+
+--
+-- Dumping routines for database 'law_firm'
+--
+
+--
+-- Final view structure for view `open_cases`
+--
+
+/*!50001 DROP VIEW IF EXISTS `open_cases`*/;
+/*!50001 CREATE ALGORITHM=UNDEFINED VIEW `open_cases` AS select `cases`.`id` AS `id`,`cases`.`case_title` AS `case_title` from `cases` */;
+/*!40014 SET FOREIGN_KEY_CHECKS=@OLD_FOREIGN_KEY_CHECKS */;
+
+-- Dump completed on 2026-10-18 02:00:00
+"""
+
+
+def _split(tmp_path, chunk_bytes):
+    dump_path = tmp_path / "mysql.sql.gz"
+    with gzip.open(dump_path, "wb") as dump:
+        dump.write(DUMP)
+    work_dir = tmp_path / "work"
+    work_dir.mkdir()
+    return split_mysql_dump(str(dump_path), str(work_dir), chunk_bytes)
+
+
+def _read(path):
+    with open(path, "rb") as stream:
+        return stream.read()
+
+
+def test_schema_keeps_the_tables_without_deferred_definitions(tmp_path):
+    parts = _split(tmp_path, chunk_bytes=1024)
+    schema = _read(parts["schema"])
+
+    assert schema.startswith(HEADER)
+    assert (
+        b"CREATE TABLE `cases` (\n"
+        b"  `id` int NOT NULL AUTO_INCREMENT,\n"
+        b"  `client_id` int NOT NULL,\n"
+        b"  `case_title` varchar(255) NOT NULL,\n"
+        b"  `case_description` text,\n"
+        b"  PRIMARY KEY (`id`),\n"
+        b"  UNIQUE KEY `uq_cases_title` (`client_id`,`case_title`)\n"
+        b") ENGINE=InnoDB AUTO_INCREMENT=3 DEFAULT CHARSET=utf8mb4;\n"
+    ) in schema
+    assert (
+        b"  PRIMARY KEY (`id`,`archived_at`)\n"
+        b") ENGINE=InnoDB AUTO_INCREMENT=2 DEFAULT CHARSET=utf8mb4\n"
+        b"/*!50100 PARTITION BY RANGE (unix_timestamp(`archived_at`))\n"
+        b"(PARTITION p202601 VALUES LESS THAN (1769904000) ENGINE = InnoDB,\n"
+        b" PARTITION p_future VALUES LESS THAN MAXVALUE ENGINE = InnoDB) */;\n"
+    ) in schema
+    # The placeholder of the view is created with the tables, its definition at the end
+    assert b"CREATE VIEW `open_cases` AS SELECT\n" in schema
+    for absent in (b"INSERT INTO", b"TRIGGER", b"CREATE ALGORITHM", b"LOCK TABLES", b"ix_cases_client_id"):
+        assert absent not in schema
+
+    assert parts["deferred"] == {
+        "cases": [
+            "KEY `ix_cases_client_id` (`client_id`)",
+            "FULLTEXT KEY `ft_cases_text` (`case_title`,`case_description`)",
+            "CONSTRAINT `cases_ibfk_1` FOREIGN KEY (`client_id`) REFERENCES `clients` (`id`)",
+        ],
+        "case_history": [
+            "KEY `ix_case_history_case_id_archived_at` (`case_id`,`archived_at`)",
+            "KEY `ix_case_history_archived_at` (`archived_at`)",
+        ],
+    }
+
+
+def test_footer_holds_the_triggers_routines_and_views(tmp_path):
+    footer = _read(_split(tmp_path, chunk_bytes=1024)["footer"])
+
+    assert footer.startswith(HEADER)
+    assert b"TRIGGER `cases_touch` BEFORE UPDATE ON `cases`" in footer
+    assert b"DELIMITER ;;\n" in footer
+    assert b"-- Dumping routines for database 'law_firm'\n" in footer
+    assert b"CREATE ALGORITHM=UNDEFINED VIEW `open_cases`" in footer
+    assert footer.rstrip().endswith(b"-- Dump completed on 2026-10-18 02:00:00")
+    for absent in (b"INSERT INTO", b"CREATE TABLE", b"UNLOCK TABLES"):
+        assert absent not in footer
+
+
+def test_data_is_chunked_per_table(tmp_path):
+    # One chunk per table while they are small
+    chunks = _split(tmp_path, chunk_bytes=1024)["chunks"]
+    assert [table for table, _ in chunks] == ["cases", "case_history"]
+    content = _read(chunks[0][1])
+    assert content.startswith(HEADER)
+    assert content.endswith(
+        _LOAD_SETTINGS
+        + b"INSERT INTO `cases` VALUES (1,1,'Case 1','First');\n"
+        + b"INSERT INTO `cases` VALUES (2,1,'Case 2','Second');\n"
+        + b"COMMIT;\n"
+    )
+
+
+def test_data_chunks_are_bounded(tmp_path):
+    chunks = _split(tmp_path, chunk_bytes=1)["chunks"]
+    assert [table for table, _ in chunks] == ["cases", "cases", "case_history"]
+    assert _read(chunks[1][1]).endswith(b"INSERT INTO `cases` VALUES (2,1,'Case 2','Second');\nCOMMIT;\n")
+
+
+def test_index_statements():
+    definitions = [
+        "KEY `ix_cases_client_id` (`client_id`)",
+        "FULLTEXT KEY `ft_cases_title` (`case_title`)",
+        "SPATIAL KEY `sp_cases_location` (`location`)",
+        "FULLTEXT KEY `ft_cases_description` (`case_description`)",
+        "CONSTRAINT `cases_ibfk_1` FOREIGN KEY (`client_id`) REFERENCES `clients` (`id`)",
+        "CONSTRAINT `cases_ibfk_2` FOREIGN KEY (`worker_id`) REFERENCES `workers` (`id`)",
+    ]
+    assert _index_statements("cases", definitions) == [
+        "ALTER TABLE `cases` ADD KEY `ix_cases_client_id` (`client_id`), ADD SPATIAL KEY `sp_cases_location` (`location`);",
+        "ALTER TABLE `cases` ADD FULLTEXT KEY `ft_cases_title` (`case_title`);",
+        "ALTER TABLE `cases` ADD FULLTEXT KEY `ft_cases_description` (`case_description`);",
+        "ALTER TABLE `cases` ADD CONSTRAINT `cases_ibfk_1` FOREIGN KEY (`client_id`) REFERENCES `clients` (`id`), "
+        "ADD CONSTRAINT `cases_ibfk_2` FOREIGN KEY (`worker_id`) REFERENCES `workers` (`id`);",
+    ]
+    assert _index_statements("cases", []) == []
@@ -0,0 +1,35 @@
+"""
+/search over the case text (MySQL, LIKE on SQLite) and the document metadata
+(MongoDB, regex fallback on the stand-in, which has no $text).
+"""
+import io
+from config import SessionLocal
+from models.worker_model import Worker
+from services.search_service import search_cases
+
+
+def _search(worker_id, query_text):
+    with SessionLocal() as db_session:
+        user = db_session.get(Worker, worker_id)
+        return [result["case"].id for result in search_cases(db_session, user, query_text)["results"]]
+
+
+def test_search_page_renders(login, data):
+    response = login(data["admin_id"]).get('/search', query_string={"q": "Benchmark"})
+    assert response.status_code == 200
+    assert "Case " in response.get_data(as_text=True)
+
+
+def test_uploaded_document_is_found_in_its_case_scope(login, data, cases_by_worker):
+    owner, other = list(cases_by_worker)[:2]
+    case_id = cases_by_worker[owner][0]
+    response = login(owner).post(f'/upload_document/{case_id}', content_type='multipart/form-data', data={
+        "document_title": "Zebra deposition",
+        "document_description": "Transcript",
+        "document": (io.BytesIO(b"zebra transcript"), "zebra.txt"),
+    })
+    assert response.status_code == 302
+
+    assert _search(owner, "zebra") == [case_id]
+    assert _search(data["admin_id"], "zebra") == [case_id]
+    assert _search(other, "zebra") == []
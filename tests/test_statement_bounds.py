@@ -0,0 +1,85 @@
+"""
+Statement bounds of the pages served through the case repository's loading
+profiles (models/case_repository.py): the dashboard runs one query for the
+page of cases and one for their clients, a case page a single joined query.
+"""
+from datetime import timedelta
+import pytest
+from config import SessionLocal
+from models.case_model import Case
+from tests.support import assert_max_statements
+
+
+def _lawyer_case(lawyer_ids):
+    with SessionLocal() as db_session:
+        return db_session.query(Case.worker_id, Case.id).filter(Case.worker_id.in_(lawyer_ids)).first()
+
+
+@pytest.mark.parametrize("sort", ["created_at", "court_date", "status"])
+def test_dashboard_runs_at_most_two_statements(login, data, sort):
+    for worker_id in (data["admin_id"], data["lawyer_ids"][0]):
+        client = login(worker_id)
+        with assert_max_statements(2):
+            response = client.get('/dashboard', query_string={"sort": sort})
+        assert response.status_code == 200
+
+
+def test_dashboard_next_page_runs_at_most_two_statements(login, data):
+    client = login(data["admin_id"])
+    first = client.get('/dashboard', query_string={"page_size": 10}).get_data(as_text=True)
+    after = first.split("after=", 1)[1].split('"', 1)[0]
+    with assert_max_statements(2):
+        response = client.get('/dashboard', query_string={"page_size": 10, "after": after})
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize("path", ["/view_case/{}", "/cases/{}/edit", "/confirm_delete/{}"])
+def test_case_pages_run_one_statement(login, data, path):
+    worker_id, case_id = _lawyer_case(data["lawyer_ids"])
+    for viewer in (data["admin_id"], worker_id):
+        client = login(viewer)
+        with assert_max_statements(1):
+            response = client.get(path.format(case_id))
+        assert response.status_code == 200
+
+
+def test_cached_case_list_skips_the_case_queries(login, data, monkeypatch):
+    from services import fragment_cache_service
+
+    monkeypatch.setattr(fragment_cache_service, "_backend", fragment_cache_service.MemoryBackend(1024 * 1024, 60))
+    client = login(data["lawyer_ids"][0])
+    client.get('/dashboard')
+    with assert_max_statements(0):
+        response = client.get('/dashboard')
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize("path", ["/dashboard", "/view_case/{}"])
+def test_unchanged_page_is_answered_after_one_statement(login, data, monkeypatch, path):
+    from services import page_version_service
+
+    monkeypatch.setattr(page_version_service, "CONDITIONAL_GET_ENABLED", True)
+    # The seeded clients were just written, do not wait out the window before validators are sent
+    monkeypatch.setattr(page_version_service, "FRESH_CHANGE_WINDOW", timedelta(0))
+    client = login(data["admin_id"])
+    path = path.format(data["case_ids"][0])
+    etag = client.get(path).headers["ETag"]
+    with assert_max_statements(1):
+        response = client.get(path, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+
+def test_dashboard_with_pending_flashes_is_rendered(login, data, monkeypatch):
+    from services import page_version_service
+
+    monkeypatch.setattr(page_version_service, "CONDITIONAL_GET_ENABLED", True)
+    monkeypatch.setattr(page_version_service, "FRESH_CHANGE_WINDOW", timedelta(0))
+    client = login(data["admin_id"])
+    etag = client.get('/dashboard').headers["ETag"]
+    with client.session_transaction() as sess:
+        sess['_flashes'] = [("danger", "Case not found.")]
+    response = client.get('/dashboard', headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert "Case not found." in response.get_data(as_text=True)
+    with client.session_transaction() as sess:
+        assert '_flashes' not in sess